@@ -150,24 +150,45 @@ Part 2, Division 2, Subdivision 15 Earthworks, retaining walls and structural su
 """
 
 # Import necessary libraries
-from flask import Flask, request, jsonify, render_template
-from flask import render_template_string
-from assessment_db import AssessmentDB
+from flask import Flask, request, jsonify, render_template, g
+from flask import Response, stream_with_context
+from assessment_db import AssessmentDB, STATS_COLUMNS, input_fields
+from assessment_logger import ASSESSMENT_LOGGER
+from assessment_cache import ASSESSMENT_CACHE
+from assessment_export import export_assessments, EXPORT_FORMATS, EXPORT_MEDIA_TYPES
 import sqlite3
-import json
 import os
+from json_codec import dumps, loads
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+import rate_limit_storage  # registers the sqlite:// limiter storage shared by the worker processes
+from concurrent.futures import TimeoutError as FuturesTimeout
+import logging
+
+# Structured logging through a background writer thread (see structured_logging.py for the LOG_* settings)
+from structured_logging import configure_logging, logging_stats
+configure_logging()
+log = logging.getLogger(__name__)
+
+# Table-driven SEPP rules for each development type
+import sepp_rules
 
 #### GIS Proxy required for geocoding
-from GISProxy import geocode_address
+from GISProxy import geocode_address, GEOCODE_CACHE
+from geocode_cache import NO_CANDIDATES
+from property_profile import PROPERTY_PROFILES
+from parcel_table import PARCEL_TABLE
+from address_index import ADDRESS_SUGGESTER
+from work_scheduler import WorkScheduler, Overloaded, Deadline, check_deadline, deadline_scope
+from request_metrics import METRICS
+from time import perf_counter
 
 # Some constants and helper functions
+from input_schemas import SCHEMAS, missing_field_error
 from assessment_help import get_shed_help, get_patio_help, get_retain_wall_help, html_table_template
 
-# URL for SEPP legislation reference
-SEPP_URL = "https://legislation.nsw.gov.au/view/html/inforce/current/epi-2008-0572#"
+# URL for SEPP legislation reference (the rule-set's links are built from it once, in the reason catalog)
+SEPP_URL = sepp_rules.SEPP_URL
 
 # HTML template for embedded SEPP link in results
 SEPP_link_template = """<a href="{{ SEPP_URL_link }}" 
@@ -175,463 +196,54 @@ SEPP_link_template = """<a href="{{ SEPP_URL_link }}"
                           target="_blank" 
                           rel="noopener noreferrer">SEPP</a>"""
 
-# Helper function for input validation of numeric inputs
-def parse_float(value, default=0.0):
-    """ This function provides input validation for numeric inputs """
-    try:
-        return float(value)
-    except (TypeError, ValueError):
-        return default
-
-# Patio assessment function
-def patio_check(attributes):
-    """ This function provides the rule-set for Exempt Development of a Patio under the SEPP
-        returning a strings indicating if the proposed development is Exempt or if not, returning
-        a list of strings indicating reasons for Not Exempt under SEPP"""
-    
-    print("\n🔧 Patio Development Check")
-    # Initialise a results list for NON-EXEMPT reasons and a list for relevant sections in SEPP for reference
-    results = [] 
-    relevant_sections = []
-    # Initialise an assessment context variable for database logging
-    # Possible values: "Exempt", "Non-Exempt", "Invalid"
-    context = "Invalid"
-    
-    try:
-        # Clause Part 1, Division 2 Exempt and complying development - Zoning check
-        if attributes["zoning"] not in ["R1", "R2", "R3", "R4", "R5", "RU1", "RU2", "RU3", "RU4", "RU6"]:
-            results.append("This tool does not currently support your zone type.  Please contact Albury City Council for further assistance.")
-            relevant_sections.append("")
-
-        else:
-            # Clause 2.11 and 2.12 - Patio
-            # Replacement patio
-            # Clause 2.11 (b) - Replacement patio standards
-            if attributes["structure_type"] == "replacement":
-                if attributes["height_existing"] > 1000:
-                    results.append("The proposed structure cannot replace an existing structure that is higher than 1m above ground level. Please refer to the State Environmental Planning Policy legislation for height restrictions:")
-                    relevant_sections.append("sec.2.11 (b)")
-
-                # Clause 2.12 (2)(a) - Replacement patio standards
-                if attributes["material_quality"] == "no":
-                    results.append("The replacement must use materials of equal or better quality. Please refer to the State Environmental Planning Policy legislation for material quality restrictions:")
-                    relevant_sections.append("sec.2.12 (2)(a)")
-        
-                # clause 2.12 (2)(b) - Replacement patio standards
-                if attributes["same_size"] == "no":
-                    results.append("The replacement must be the same size and height as the existing structure. Please refer to the State Environmental Planning Policy legislation for size and height restrictions:")
-                    relevant_sections.append("sec.2.12 (2)(b)")
-
-            # New patio
-            # Clause 2.11 (a) - Heritage item
-            if attributes["heritage"] == "yes":
-                results.append("The property is a heritage item. Please refer to the State Environmental Planning Policy legislation for heritage item restrictions:")
-                relevant_sections.append("sec.2.11 (a)")
-
-            # Clause 2.11 (b) - Foreshore area
-            if attributes["foreshore"] == "yes":
-                results.append("The property is located in a foreshore area. Please refer to the State Environmental Planning Policylegislation for foreshore area restrictions:")
-                relevant_sections.append("sec.2.11 (b)")
-
-            # Clause 2.11 (b) - Environmentally sensitive area
-            if attributes["area"] > 25:
-                results.append("The structure floor area is more than 25 m². Please refer to the State Environmental Planning Policy legislation for floor area restrictions:")
-                relevant_sections.append("sec.2.12 (1)(b)")
-            else:
-                # Clause 2.12 (1)(c) - Total floor area of all such structures on the lot (for lot size greater than 300m2)
-                if attributes["land_size"] > 300:
-                    if attributes["total_structures_area"] > 0.15 * attributes["land_size"]:
-                        results.append("The combined floor area of similar structures is over the limit for this lot size. Please refer to the State Environmental Planning Policy legislation for total floor area restrictions:")
-                        relevant_sections.append("sec.2.12 (1)(c)(i)")
-
-                else:
-                    # Clause 2.12 (1)(c)(ii) - Total floor area of all such structures on the lot (for lot 300m2 or less)
-                    if attributes["total_structures_area"] > 25:
-                        results.append("The combined floor area of similar structures is over the limit for this lot size. Please refer to the State Environmental Planning Policy legislation for total floor area restrictions:")
-                        relevant_sections.append("sec.2.12 (1)(c)(ii)") 
-
-            # Clause 2.12 (1)(d) - Wall height
-            if attributes["wall_height"] == "yes":
-                results.append("The wall height exceeds 1.4m. Please refer to the State Environmental Planning Policy legislation for wall height restrictions:")
-                relevant_sections.append("sec.2.12 (1)(d)") 
-
-            # Clause 2.12 (1)(e) - Building line
-            if attributes["behind_building_line"] == "no":
-                results.append("The structure must be behind the front building line of road frontage. Please refer to the State Environmental Planning Policy legislation for building line restrictions:")
-                relevant_sections.append("sec.2.12 (1)(e)")
-
-            # Clause 2.12 (1)(f)(ii) - Boundary distance
-            if attributes["zoning"] in ["R1", "R2", "R3", "R4"] and attributes["boundary_distance"] < 900:
-                results.append("The structure must be at least 900mm from any lot boundary for this zone type. Please refer to the State Environmental Planning Policy legislation for boundary distance restrictions:")
-                relevant_sections.append("sec.2.12 (1)(f)(ii)")
-
-            # Clause 2.12 (1)(f)(i) - Boundary distance
-            if attributes["zoning"] in ["R5", "RU1", "RU2", "RU3", "RU4", "RU6"] and attributes["boundary_distance"] < 5000:
-                results.append("The structure must be at least 5000mm from any lot boundary for this zone type. Please refer to the State Environmental Planning Policy legislation for boundary distance restrictions:")
-                relevant_sections.append("sec.2.12 (1)(f)(i)")
-
-            # Clause 2.12 (1)(h) - Metal components
-            if attributes["metal"] == "yes":
-                if attributes["reflective"] == "no":
-                    results.append("The metal components must be low-reflective and factory pre-coloured. Please refer to the State Environmental Planning Policy legislation for metal component restrictions:")
-                    relevant_sections.append("sec.2.12 (1)(h)")
-
-            # Clause 2.12 (1)(i) - Floor height
-            if attributes["floor_height"] > 1000:
-                results.append("The floor height exceeds 1m above ground level. Please refer to the State Environmental Planning Policy legislation for floor height restrictions:")
-                relevant_sections.append("sec.2.12 (1)(i)")
-
-            # Clause 2.12 (1)(i1) - Roof overhang
-            if attributes["roof"] == "yes":
-                if attributes["overhang"] > 600:
-                    results.append("The roof overhang exceeds 600mm. Please refer to the State Environmental Planning Policy legislation for roof overhang restrictions:")
-                    relevant_sections.append("sec.2.12 (1)(i1)")
-
-                # Clause 2.12 (1)(j) - Attached roof
-                if attributes["attached"] == "yes":
-                    if attributes["above_gutter"] == "yes":
-                        results.append("The roof must not extend above the dwelling’s gutter line. Please refer to the State Environmental Planning Policy legislation for roof height restrictions:")
-                        relevant_sections.append("sec.2.12 (1)(j)")
-
-                    # Clause 2.12 (1)(k) - Fascia connection
-                    if attributes["fascia_connection"] == "yes":
-                        if attributes["engineer_spec"] == "no":
-                            results.append("The fascia connection is not compliant with professional specifications. Please refer to the State Environmental Planning Policy legislation for fascia connection restrictions:")
-                            relevant_sections.append("sec.2.12 (1)(k)")
-
-                # Clause 2.12 (1)(j1) - Roof height (based on https://www.planningportal.nsw.gov.au/development-and-assessment/planning-approval-pathways/exempt-development/balconies-decks-and-patios)
-                if attributes["roof_height"] > 3:
-                    results.append("The roof’s highest point is over 3m above ground level. Please refer to the State Environmental Planning Policy legislation for roof height restrictions:")
-                    relevant_sections.append("sec.2.12 (1)(j1)")
-
-                # Clause 2.12 (1)(l) - Stormwater disposal
-                if attributes["stormwater"] == "no":
-                    results.append("The roofwater does not dispose into an stormwater drainage system. Please refer to the State Environmental Planning Policy legislation for stormwater disposal restrictions:")
-                    relevant_sections.append("sec.2.12 (1)(l)")
-
-            # Clause 2.12 (1)(m) - Drainage interference
-            if attributes["drainage"] == "yes":
-                results.append("The proposed development interferes with existing drainage fixtures or flow paths. Please refer to the State Environmental Planning Policy legislation for drainage restrictions:")
-                relevant_sections.append("sec.2.12 (1)(m)") 
-
-            # Clause 2.12 (1)(n) - Bushfire prone land
-            if attributes["bushfire"] == "yes":
-                if attributes["distance_dwelling"] < 5:
-                    if attributes["non_combustible"] == "no":
-                        results.append("The bushfire material standards are not met. Please refer to the State Environmental Planning Policy legislation for bushfire restrictions:")
-                        relevant_sections.append("sec.2.12 (1)(n)")
-
-        # Check if any NON-EXEMPT reasons were found and prepare final output
-        if len(results) > 0:
-            results.insert(0,"The proposed structure DOES NOT qualify for exempt development for the following reasons:")
-            relevant_sections.insert(0, "")
-            context = "Non-Exempt"
-        else:
-            # No NON-EXEMPT reasons found, so development is Exempt
-            results.append("The proposed structure qualifies for exempt development. For more information, please refer to the State Environmental Planning Policy legislation:")
-            relevant_sections.append("pt.2-div.1-sdiv.6")
-            context = "Exempt"
-        
-        # Return results, relevant sections and context
-        return results, relevant_sections, context
-    
-    except Exception:
-        # Catch any exceptions and return an error message
-        results.append("Missing or invalid input data. Please check all required fields are provided and valid.")
-        relevant_sections.append(f"Attributes File: {attributes}")
-        return results, relevant_sections, context
-
-
-# Shed assessment function
-def shed_check(attributes):
-    """ This function provides the rule-set for Exempt Development of a Shed under the SEPP
-        returning a strings indicating if the proposed development is Exempt or if not, returning
-        a list of strings indicating reasons for Not Exempt under SEPP"""
-
-    print("\n🔧 Shed Development Check")
-    # Initialise a results list for NON-EXEMPT reasons and a list for relevant sections in SEPP for reference
-    results = [] 
-    relevant_sections = [] 
-    # Initialise an assessment context variable for database logging
-    # Possible values: "Exempt", "Non-Exempt", "Invalid"
-    context = "Invalid"
-    
-    try:
-        # Clause Part 1, Division 2 Exempt and complying development - Zoning check
-        if attributes["zoning"] not in ["R1", "R2", "R3", "R4", "R5", "RU1", "RU2", "RU3", "RU4", "RU6"]:
-            results.append("This tool does not currently support your zone type.  Please contact Albury City Council for further assistance.")
-            relevant_sections.append("")
-        
-        else:
-            # Clause 2.17 and 2.18 - Shed
-            # Clause 2.17 (a) - Heritage item   
-            if attributes["heritage"] == "yes":
-                results.append("The property is a heritage item. Please refer to the State Environmental Planning Policy legislation for heritage item restrictions:")
-                relevant_sections.append("sec.2.17 (a)")    
-
-            # Clause 2.17 (b) - Foreshore area
-            if attributes["foreshore"] == "yes":
-                results.append("The property is located in a foreshore area. Please refer to the State Environmental Planning Policy legislation for foreshore area restrictions:")
-                relevant_sections.append("sec.2.17 (b)")
-
-            # Clause 2.17 (b) - Environmentally sensitive area
-            if attributes["sensitive_area"] == "yes":
-                results.append("The property is located in an environmentally sensitive area. Please refer to the State Environmental Planning Policy legislation for environmentally sensitive area restrictions:")
-                relevant_sections.append("sec.2.17 (b)")
-
-            # Clause 2.18 (1)(b)(ii) - Floor area for zones R1, R2, R3, R4
-            if attributes["zoning"] in ["R1", "R2", "R3", "R4"] and attributes ["area"] > 20:
-                results.append("The proposed structure's floor area exceeds the limit of 20m². Please refer to the State Environmental Planning Policy legislation for floor area restrictions:")
-                relevant_sections.append("sec.2.18 (1)(b)(ii)")
-
-            # Clause 2.18 (1)(b)(i) - Floor area for zones R5, RU1, RU2, RU3, RU4, RU6
-            if attributes["zoning"] in ["R5", "RU1", "RU2", "RU3", "RU4", "RU6"] and attributes ["area"] > 50:
-                results.append("The proposed structure's floor area exceeds the limit of 50m². Please refer to the State Environmental Planning Policy legislation for floor area restrictions:")
-                relevant_sections.append("sec.2.18 (1)(b)(i)")
-
-            # Clause 2.18 (1)(c) - Height restriction
-            if attributes["height"] > 3:
-                results.append("The proposed structure is higher than 3m above ground level. Please refer to the State Environmental Planning Policy legislation for height restrictions:")
-                relevant_sections.append("sec.2.18 (1)(c)")
-
-            # Clause 2.18 (1)(d)(ii) - Boundary distance for zones R1, R2, R3, R4
-            if attributes["zoning"] in ["R1", "R2", "R3", "R4"] and attributes["boundary_distance"] < 900:
-                results.append("The structure must be at least 900mm from any lot boundary. Please refer to the State Environmental Planning Policy legislation for boundary distance restrictions:")
-                relevant_sections.append("sec.2.18 (1)(d)(ii)")
-        
-            # Clause 2.18 (1)(d)(i) - Boundary distance for zones R5, RU1, RU2, RU3, RU4, RU6
-            if attributes["zoning"] in ["R5", "RU1", "RU2", "RU3", "RU4", "RU6"] and attributes["boundary_distance"] < 5000:
-                results.append("The structure must be at least 5000mm from any lot boundary. Please refer to the State Environmental Planning Policy legislation for boundary distance restrictions:")
-                relevant_sections.append("sec.2.18 (1)(d)(i)")
-
-            # Clause 2.18 (1)(e) - Building line
-            if attributes["building_line"] == "no":
-                if attributes["zoning"] not in ["RU1", "RU2", "RU3", "RU4", "RU6"]:
-                    results.append("The structure must be behind the building line of road frontage. Please refer to the State Environmental Planning Policy legislation for building line restrictions:")
-                    relevant_sections.append("sec.2.18 (1)(e)")
-
-            # Clause 2.18 (1)(f) - Shipping container
-            if attributes["shipping_container"] == "yes":
-                results.append("Shipping containers are not allowed. Please refer to the State Environmental Planning Policy legislation for shipping container restrictions:")
-                relevant_sections.append("sec.2.18 (1)(f)")
-
-            # Clause 2.18 (1)(g) - Stormwater disposal
-            if attributes["stormwater"] == "no":
-                results.append("The roofwater disposal may affect your neighbours. Please refer to the State Environmental Planning Policy legislation for stormwater disposal restrictions:")
-                relevant_sections.append("sec.2.18 (1)(g)")
-
-            # Clause 2.18 (1)(h) - Metal components
-            if attributes["metal"] == "yes":
-                if attributes["reflective"] == "no":
-                    results.append("The metal components are not compliant. Please refer to the State Environmental Planning Policy legislation for metal component restrictions:")
-                    relevant_sections.append("sec.2.18 (1)(h)")
-
-            # Clause 2.18 (1)(i) - Bushfire prone land
-            if attributes["bushfire"] == "yes":
-                if attributes["distance_dwelling"] < 5:
-                    if attributes["non_combustible"] == "no":
-                        results.append("The bushfire material standards are not met. Please refer to the State Environmental Planning Policy legislation for bushfire restrictions:")
-                        relevant_sections.append("sec.2.18 (1)(i)")
-
-            # Clause 2.18 (1)(j) - Heritage conservation area
-            # Check if heritage_conserv and rear_yard attributes exists to avoid key error (for backward compatibility)
-            if "heritage_conserv" in attributes and "rear_yard" in attributes:
-                if attributes["heritage_conserv"] == "yes":
-                    if attributes["rear_yard"] == "no":
-                        results.append("The structure must be in the rear yard if in a heritage conservation area. Please refer to the State Environmental Planning Policy legislation for heritage conservation area restrictions:")
-                        relevant_sections.append("sec.2.18 (1)(j)")
-
-            # Clause 2.18 (1)(k) - Distance from dwelling
-            if attributes["adjacent_building"] == "yes":
-                if attributes["interfere"] == "yes":
-                    results.append("The structure interferes with building access or safety. Please refer to the State Environmental Planning Policy legislation for adjacent building restrictions:")
-                    relevant_sections.append("sec.2.18 (1)(k)")
-
-            # Clause 2.18 (1)(l) - Habitable buildings
-            if attributes["habitable"] == "yes":
-                results.append("The proposed structure cannot be used as habitable buildings. Please refer to the State Environmental Planning Policy legislation for habitable building restrictions:")
-                relevant_sections.append("sec.2.18 (1)(l)")
-
-            # Clause 2.18 (1)(m) - Easements
-            if attributes["easement"] == "yes":
-                results.append("The proposed structure must be at least 1m from any easement. Please refer to the State Environmental Planning Policy legislation for easement restrictions:")
-                relevant_sections.append("sec.2.18 (1)(m)")
-
-            # Clause 2.18 (1)(n) - Services
-            if attributes["services"] == "yes":
-                results.append("Service connections are not allowed. Please refer to the State Environmental Planning Policy legislation for service connection restrictions:")
-                relevant_sections.append("sec.2.18 (1)(n) ")
-
-            # Clause 2.18 (2) - Existing structures
-            if attributes["existing_structures"] == "yes":
-                results.append("More than two similar structures already exist on the property. Please refer to the State Environmental Planning Policy legislation for existing structure restrictions:")
-                relevant_sections.append("sec.2.18 (2)")
-
-        # Check if any NON-EXEMPT reasons were found and prepare final output
-        if len(results) > 0:
-            results.insert(0,"The proposed structure DOES NOT qualify for exempt development for the following reasons:")
-            relevant_sections.insert(0, "")
-            context = "Non-Exempt"
-        else:
-            # No NON-EXEMPT reasons found, so development is Exempt
-            results.append("The proposed structure qualifies for exempt development. For more information, please refer to the State Environmental Planning Policy legislation:")
-            relevant_sections.append("pt.2-div.1-sdiv.9")
-            context = "Exempt"
-
-        # Return results, relevant sections and context
-        return results, relevant_sections, context
-    
-    except Exception:
-        # Catch any exceptions and return an error message
-        results.append("Missing or invalid input data. Please check all required fields are provided and valid.")
-        relevant_sections.append(f"Attributes File: {attributes}")
-        return results, relevant_sections, context
-
-
-# Retaining Wall assessment function
-def retain_wall_check(attributes):
-    """ This function provides the rule-set for Exempt Development of a retaining wall under the SEPP
-    returning a strings indicating if the proposed development is Exempt or if not, returning
-    a list of strings indicating reasons for Not Exempt under SEPP"""
-
-    print("\n🔧 Retaining Wall Development Check")
-    # Initialise a results list for NON-EXEMPT reasons and a list for relevant sections in SEPP for reference
-    results = [] 
-    relevant_sections = [] 
-    # Initialise an assessment context variable for database logging
-    # Possible values: "Exempt", "Non-Exempt", "Invalid"
-    context = "Invalid"
-    
-    try:
-        # Clause Part 1, Division 2 Exempt and complying development - Zoning check
-        if attributes["zoning"] not in ["R1", "R2", "R3", "R4", "R5", "RU1", "RU2", "RU3", "RU4", "RU6"]:
-            results.append("This tool does not currently support your zone type.  Please contact Albury City Council for further assistance.")
-            relevant_sections.append("")
-        
-        else:
-            # Clause 2.29 - Heritage item
-            if attributes["heritage"] == "yes":
-                results.append("The property is a heritage item. Please refer to the State Environmental Planning Policy legislation for heritage item restrictions:")
-                relevant_sections.append("sec.2.29")    
-
-            # Clause 2.29 - Foreshore area
-            if attributes["foreshore"] == "yes":
-                results.append("The property is located in a foreshore area. Please refer to the State Environmental Planning Policy legislation for foreshore area restrictions:")
-                relevant_sections.append("sec.2.29")
-
-            # Clause 2.29 - Flood control lot
-            if attributes["flood_control_lot"] == "yes":
-                results.append("The property is located in an flood control lot. Please refer to the State Environmental Planning Policy legislation for flood control lot restrictions:")
-                relevant_sections.append("sec.2.29")
-
-            # Clause 2.30(a) - Cut or fill depth
-            if attributes["cut_or_fill"] > 600:
-                results.append("Cut or Fill of Retaining Wall exceeds 600mm.  Please refer to the State Environmental Planning Policy legislation for cut and fill restrictions:")
-                relevant_sections.append("sec.2.30 (a)")
-
-            # Clause 2.30(b) - Boundary distance
-            if attributes["boundary_distance"] < 1000:
-                results.append("The Retaining Wall must be at least 1000mm from any lot boundary. Please refer to the State Environmental Planning Policy legislation for boundary distance restrictions:")
-                relevant_sections.append("sec.2.30 (b)")
-
-            # Clause 2.30(c) - Heritage conservation area
-            if attributes["heritage_conserv"] == "yes":
-                if attributes["rear_yard"] == "no":
-                    results.append("For a property in a heritage conservation area, development must be in rear yard. Please refer to the State Environmental Planning Policy legislation for heritage conservation area restrictions:")
-                    relevant_sections.append("sec.2.30 (c)") 
-
-            # Clause 2.30(d) - Natural waterbody
-            if attributes["waterbody_within_40m"] == "yes":
-                results.append("The retaining wall is less than 40m from a natural waterbody. Please refer to the State Environmental Planning Policy legislation for natural waterbody restrictions:")
-                relevant_sections.append("sec.2.30 (d)")
-
-            # Clause 2.30(e) - Sediment transfer
-            if attributes["sediment_transfer"] == "yes":
-                results.append("The retaining wall may causes sediment transfer to adjoining property. Please refer to the State Environmental Planning Policy legislation for water flow restrictions:")
-                relevant_sections.append("sec.2.30 (e)")
-
-            # Clause 2.30(f)(i) - Height restriction
-            if attributes["height"] > 600:
-                results.append("The retaining wall exceeds 600mm in height. Please refer to the State Environmental Planning Policy legislation for retaining wall height restrictions:")
-                relevant_sections.append("sec.2.30 (f)(i)")
-
-            # Clause 2.30(f)(ii) - Distance to other structural support
-            if attributes["distance_other"] < 2000:
-                results.append("The retaining wall is less than 2000mm from another structural support. Please refer to the State Environmental Planning Policy legislation for structural support distance restrictions:")
-                relevant_sections.append("sec.2.30 (f)(ii)")
-
-            # Clause 2.30(f)(iii) - Distance to easement or services main
-            if attributes["distance_easement"] < 1000:
-                results.append("The retaining wall is less than 1000mm from a registered easement or services main. Please refer to the State Environmental Planning Policy legislation for easement and services main distance restrictions:")
-                relevant_sections.append("sec.2.30 (f)(iii)")
-
-            # Clause 2.30(f)(iv) - Stormwater disposal
-            if attributes["stormwater"] == "no":
-                results.append("The retaining wall does not dispose of stormwater adequately. Please refer to the State Environmental Planning Policy legislation for stormwater disposal restrictions:")
-                relevant_sections.append("sec.2.30 (f)(iv)")
-
-            # Clause 2.30(g) - Fill depth and area
-            if attributes["fill_depth"] > 150:
-                if attributes["fill_area"] > 0.25 * attributes["land_size"]:
-                    results.append("The fill exceeds 150mm and occupies more than 25% of the lot area. Please refer to the State Environmental Planning Policy legislation for fill restrictions:")
-                    relevant_sections.append("sec.2.30 (g)")
-
-            # Clause 2.30(h) - Imported fill
-            if attributes["imported_fill"] == "yes":
-                if attributes["venm"] == "no":
-                    results.append("Imported fill must be VENM (virgin excavated natural material. Please refer to the State Environmental Planning Policy legislation for imported fill restrictions:")
-                    relevant_sections.append("sec.2.30 (h)")
-
-            # Clause 2.30(i) - Fill volume for rural zones or heritage conservation area
-            if attributes["zoning"] in ["RU1", "RU2", "RU3", "RU4", "RU6"] or ["heritage_conserv"] == "yes":
-                if attributes["fill_volume"] > 100:
-                    results.append("The fill volume exceeds 100m³ for rural zones or heritage conservation areas. Please refer to the State Environmental Planning Policy legislation for fill volume restrictions:")
-                    relevant_sections.append("sec.2.30 (i)")
-
-        # Check if any NON-EXEMPT reasons were found and prepare final output
-        if len(results) > 0:
-            results.insert(0,"The proposed structure DOES NOT qualify for exempt development for the following reasons:")
-            relevant_sections.insert(0, "")
-            context = "Non-Exempt"
-        else:
-            # No NON-EXEMPT reasons found, so development is Exempt
-            results.append("The proposed structure qualifies for exempt development. For more information, please refer to the State Environmental Planning Policy legislation:")
-            relevant_sections.append("pt.2-div.1-sdiv.15")
-            context = "Exempt"
-
-        # Return results, relevant sections and context
-        return results, relevant_sections, context
-    
-    except Exception:
-        # Catch any exceptions and return an error message
-        results.append("Missing or invalid input data. Please check all required fields are provided and valid.")
-        relevant_sections.append(f"Attributes File: {attributes}")
-        return results, relevant_sections, context
-
 
 # Create API
 # Initialize Flask application instance
 app = Flask(__name__)
 app.config["RATELIMIT_HEADERS_ENABLED"] = True
 
+# Compile the assessment log table template once rather than on every request
+HTML_TABLE_TEMPLATE = app.jinja_env.from_string(html_table_template)
+
 # Request/Response timeout
-EXECUTOR = ThreadPoolExecutor(max_workers=4)
+# Assessments run on a bounded scheduler (SCHEDULER_WORKERS threads, SCHEDULER_QUEUE_DEPTH queued jobs): a full
+# queue is answered with 503 and Retry-After, and work whose deadline passes is skipped or stops cooperatively
+SCHEDULER = WorkScheduler(name="assess")
 REQUEST_TIMEOUT_SECONDS = int(os.getenv("REQUEST_TIMEOUT_SECONDS", 30))
 
 def run_with_timeout(fn, *args, timeout=REQUEST_TIMEOUT_SECONDS):
-    fut = EXECUTOR.submit(fn, *args)
-    try:
-        return fut.result(timeout=timeout)
-    except FuturesTimeout:
-        fut.cancel()
-        raise
+    # Raises Overloaded when the queue is full and FuturesTimeout (DeadlineExceeded) when the deadline passes
+    # The time until a worker picks the job up is recorded as the "queue" stage of the request
+    submitted = perf_counter()
+    def job():
+        METRICS.record("queue", perf_counter() - submitted)
+        return fn(*args)
+    return SCHEDULER.run(job, timeout=timeout)
 
 # Rate limiting setup 
 DEFAULT_LIMIT = os.getenv("RATE_LIMIT_DEFAULT", "30 per minute")
 VALIDATE_LIMIT = os.getenv("RATE_LIMIT_VALIDATE", "10 per 30 seconds")  # for assessment endpoint
 LOGGING_LIMIT  = os.getenv("RATE_LIMIT_LOGGING",  "10 per minute")      # for /get-logging-db/
 HELP_LIMIT     = os.getenv("RATE_LIMIT_HELP",     "30 per minute")
-STORAGE_URI    = os.getenv("LIMITER_STORAGE_URI", "memory://")          
+BATCH_LIMIT    = os.getenv("RATE_LIMIT_BATCH",    "5 per minute")       # for batch assessment endpoint
+SUGGEST_LIMIT  = os.getenv("RATE_LIMIT_SUGGEST",  "120 per minute")     # for address autocomplete (per keystroke)
+STORAGE_URI    = os.getenv("LIMITER_STORAGE_URI", "memory://")          # sqlite:///path shares limits across workers
+
+# Default and maximum number of rows on one page of /get-logging-db/
+LOGGING_PAGE_SIZE = int(os.getenv("LOGGING_PAGE_SIZE", 100))
+LOGGING_MAX_PAGE_SIZE = int(os.getenv("LOGGING_MAX_PAGE_SIZE", 10000))
+
+# Response formats of the assessment endpoint: messages with SEPP links, or reason codes only
+ASSESSMENT_FORMATS = ("verbose", "codes")
+# Reason code catalog served to clients of the compact format, built once
+REASON_CATALOG = sepp_rules.catalog_document()
+
+# Maximum number of assessments accepted in one batch request
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", 1000))
+# Maximum size in bytes of the body of a single assessment request (the form sends well under 2 KiB)
+ASSESSMENT_MAX_BYTES = int(os.getenv("ASSESSMENT_MAX_BYTES", 16384))
+PAYLOAD_TOO_LARGE = {"error": "payload_too_large",
+                     "message": f"An assessment request can be at most {ASSESSMENT_MAX_BYTES} bytes."}
 
 limiter = Limiter(
     key_func=get_remote_address,          # per-IP by default; swap to user-id if you add auth
@@ -647,13 +259,38 @@ def expose_rate_limit_headers(resp):
         "X-RateLimit-Limit, X-RateLimit-Remaining, X-RateLimit-Reset, Retry-After"
     return resp
 
+# Time each request and the stages it runs (see request_metrics.py), returning them in the Server-Timing header
+@app.before_request
+def start_request_timing():
+    g.request_started = METRICS.begin_request()
+
+@app.after_request
+def add_server_timing(resp):
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    METRICS.count("responses", route, resp.status_code)
+    # A request that failed before the timer started has no timings
+    started = g.pop("request_started", None)
+    if started is not None:
+        resp.headers["Server-Timing"] = METRICS.end_request(route, started)
+    return resp
+
 @app.errorhandler(429)
 def ratelimit_handler(e):
+    METRICS.count("rate_limited", request.url_rule.rule if request.url_rule else "unmatched")
     # Flask-Limiter will set Retry-After and X-RateLimit-* headers; return a friendly JSON
     return jsonify({"error": "rate_limited",
                     "message": "Too many requests. Please try again later."}), 429
 
 
+@app.errorhandler(Overloaded)
+def overloaded_handler(e):
+    # The work queue is full: shed the request straight away rather than queueing it behind work that will time out
+    resp = jsonify({"error": "overloaded",
+                    "message": "The server is busy. Please try again shortly."})
+    resp.headers["Retry-After"] = str(e.retry_after)
+    return resp, 503
+
+
 # Define route for homepage; serves the main HTML form interface for shed/patio/retaining_wall assessment (ExemptAssessAPI)
 @app.route("/")
 def index():
@@ -665,7 +302,23 @@ def index():
 @app.route("/get-assessment-result/", methods=["POST"])
 @limiter.limit(VALIDATE_LIMIT)  # Apply rate limit to assessment endpoint
 def API_assessment():
-    attributes = request.get_json(silent=True) or {}
+    # Oversized bodies are rejected before they are read or parsed
+    if (request.content_length or 0) > ASSESSMENT_MAX_BYTES:
+        return jsonify(PAYLOAD_TOO_LARGE), 413
+    # The body is decoded with json_codec, and a JSON object is logged as the bytes that were sent rather than
+    # encoded again
+    input_json = request.get_data() if request.is_json else b""
+    try:
+        attributes = loads(input_json)
+    except ValueError:
+        attributes = None
+    if not isinstance(attributes, dict):
+        attributes, input_json = {}, None
+    # ?format=codes returns reason codes instead of the messages and links (the default, ?format=verbose)
+    response_format = request.args.get("format", default="verbose").lower()
+    if response_format not in ASSESSMENT_FORMATS:
+        return jsonify({"error": "invalid_format",
+                        "message": f"The format must be one of: {', '.join(ASSESSMENT_FORMATS)}."}), 400
 
     # TESTING: debug slowness via query param (?debug_sleep=40)
     #try:
@@ -678,7 +331,8 @@ def API_assessment():
     # end testing code
         
     try:
-        return run_with_timeout(Assess, attributes)
+        return app.response_class(run_with_timeout(Assess, attributes, response_format, input_json),
+                                  mimetype="application/json")
     except FuturesTimeout:
         return jsonify({
             "error": "timeout",
@@ -686,6 +340,42 @@ def API_assessment():
         }), 504
     
 
+# Define route page to return assessment results for many proposals in one POST request
+# The body is either a JSON array of attribute sets or NDJSON (one attribute set per line)
+# Usage example:
+# curl -X POST -H "Content-Type: application/x-ndjson" --data-binary @proposals.ndjson /get-assessment-results/batch
+@app.route("/get-assessment-results/batch", methods=["POST"])
+@limiter.limit(BATCH_LIMIT)  # Apply rate limit to batch assessment endpoint
+def API_assessment_batch():
+    body = request.get_data(as_text=True)
+
+    # Parse the batch as a JSON array, or as NDJSON if sent that way or not starting with "["
+    try:
+        if request.mimetype == "application/x-ndjson" or not body.lstrip().startswith("["):
+            items = [loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            items = loads(body)
+    except ValueError:
+        return jsonify({"error": "invalid_batch",
+                        "message": "The batch must be a JSON array or NDJSON of assessment attributes."}), 400
+
+    if not isinstance(items, list) or len(items) == 0:
+        return jsonify({"error": "invalid_batch",
+                        "message": "The batch must contain at least one set of assessment attributes."}), 400
+
+    if len(items) > BATCH_MAX_SIZE:
+        return jsonify({"error": "batch_too_large",
+                        "message": f"A batch can contain at most {BATCH_MAX_SIZE} assessments."}), 413
+
+    try:
+        return app.response_class(dumps(run_with_timeout(AssessBatch, items)), mimetype="application/json")
+    except FuturesTimeout:
+        return jsonify({
+            "error": "timeout",
+            "message": f"Processing took longer than {REQUEST_TIMEOUT_SECONDS}s. Please try again."
+        }), 504
+
+
 # Define route to return help information on required attributes for shed and patio assessments via GET request
 @app.route("/get-assessment-help/", methods=["GET"])
 @limiter.limit(HELP_LIMIT)  # Apply rate limit to help endpoint
@@ -694,20 +384,41 @@ def API_assessment_help():
     return get_shed_help + get_patio_help + get_retain_wall_help
 
 
+# Define route to return the reason code catalog (messages, clause anchors and SEPP links), for clients that request
+# compact assessment results with ?format=codes and expand them locally.  The ETag is the catalog version, which
+# compact results also carry, so a client can keep its copy until the rules change
+@app.route("/get-reason-catalog/", methods=["GET"])
+@limiter.limit(HELP_LIMIT)  # Apply rate limit to help endpoint
+def API_reason_catalog():
+    response = jsonify(REASON_CATALOG)
+    response.set_etag(sepp_rules.RULES_VERSION)
+    return response.make_conditional(request)
+
+
 # Define route to retrieve and display logged assessments from the database with optional filtering via GET request
 # This is primarily for demonstration, testing and debugging purposes
-# User can filter by assessment ID or limit number of recent entries returned
+# User can get one assessment by ID, or page through assessments newest first using the id of the last row seen
 # Usage examples:
 # /get-logging-db/?id=1  (to get assessment with ID 1)
-# /get-logging-db/?limit=10  (to get the 10 most recent assessments)
-# /get-logging-db/  (to get all assessments)
+# /get-logging-db/?page_size=10  (to get the 10 most recent assessments; ?limit=10 also works)
+# /get-logging-db/?before_id=500&page_size=100  (to get the 100 assessments before ID 500)
+# /get-logging-db/  (to get the most recent LOGGING_PAGE_SIZE assessments)
 # This should probably be changed to a more secure admin-only view in a production system
 @app.route("/get-logging-db/", methods=["GET"])
 @limiter.limit(LOGGING_LIMIT)   # Apply rate limit to logging endpoint
 def get_logging_dbx():
-    limited = request.args.get('limit', default=-1, type=int)
+    page_size = request.args.get('page_size', default=None, type=int)
+    if page_size is None:
+        page_size = request.args.get('limit', default=LOGGING_PAGE_SIZE, type=int)
+    if page_size <= 0 or page_size > LOGGING_MAX_PAGE_SIZE:
+        # limit=-1 used to mean all rows, so use the largest page instead
+        page_size = LOGGING_MAX_PAGE_SIZE
+    before_id = request.args.get('before_id', default=None, type=int)
     id = request.args.get('id', default=None, type=int)
-    
+
+    # Make sure queued assessments have been written before reading
+    ASSESSMENT_LOGGER.flush()
+
     # Connect to the SQLite database
     db = AssessmentDB()
 
@@ -715,126 +426,403 @@ def get_logging_dbx():
     if id is not None:
         # Get specific assessment by ID
         rows = db.get_assessment_id(assessment_id=id)
+        page_size = None
     else:
-        # Get limited number of recent assessments
-        rows = db.get_recent_assessments(limit=limited)
+        # Stream one page of assessments from the cursor
+        rows = db.iter_assessments(before_id=before_id, page_size=page_size)
 
     # Get column names for header
     column_names = [description[0] for description in db.cursor.description]
 
-    db.close()
+    def generate():
+        # Render the results in an HTML table row by row using the compiled template
+        try:
+            yield from HTML_TABLE_TEMPLATE.generate(columns=column_names, rows=rows, page_size=page_size)
+        finally:
+            db.close()
+
+    return Response(stream_with_context(generate()), mimetype="text/html")
+
+
+# Define route to download the assessment log for offline analysis, streamed so memory use stays constant
+# Filters are optional and applied in the database query
+# Usage examples:
+# /export-assessments/?format=csv  (CSV with the input fields flattened into columns)
+# /export-assessments/?format=ndjson&from=2025-10-01&to=2025-10-31&context=Non-Exempt&development=shed
+# /export-assessments/?format=parquet  (compressed columnar file, needs pyarrow)
+# The same export is available from the command line: python assessment_export.py --help
+@app.route("/export-assessments/", methods=["GET"])
+@limiter.limit(LOGGING_LIMIT)   # Apply rate limit to logging endpoint
+def export_logging_db():
+    export_format = request.args.get("format", default="ndjson").lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": "invalid_format",
+                        "message": f"The format must be one of: {', '.join(EXPORT_FORMATS)}."}), 400
+
+    # Make sure queued assessments have been written before exporting
+    ASSESSMENT_LOGGER.flush()
+
+    try:
+        chunks = export_assessments(export_format,
+                                    start=request.args.get("from"),
+                                    end=request.args.get("to"),
+                                    context=request.args.get("context"),
+                                    development=request.args.get("development"))
+    except RuntimeError as error:
+        return jsonify({"error": "format_unavailable", "message": str(error)}), 501
+    except ValueError:
+        return jsonify({"error": "invalid_date", "message": "from and to must be YYYY-MM-DD dates or ISO 8601 timestamps."}), 400
+
+    media_type, extension = EXPORT_MEDIA_TYPES[export_format]
+    return Response(stream_with_context(chunks), mimetype=media_type,
+                    headers={"Content-Disposition": f"attachment; filename=assessments.{extension}"})
+
+
+# Define route to return grouped counts of logged assessments, answered from the indexed analytics columns
+# group_by is a comma separated list of development, zoning, outcome, code (reason code) and clause (SEPP clause anchor)
+# The same names can be used as filters, along with a from/to date range
+# Usage examples:
+# /assessment-stats/?group_by=development,outcome  (assessment counts by development type and outcome)
+# /assessment-stats/?group_by=code&development=shed&zoning=RU1&from=2025-10-01&to=2025-10-31  (failed clauses of RU1 sheds in October)
+# Assessments logged before the analytics columns existed are included once assessment_migrate.py has been run
+@app.route("/assessment-stats/", methods=["GET"])
+@limiter.limit(LOGGING_LIMIT)   # Apply rate limit to logging endpoint
+def get_assessment_stats():
+    group_by = [name.strip().lower() for name in request.args.get("group_by", default="outcome").split(",") if name.strip()]
+    unknown = [name for name in group_by if name not in STATS_COLUMNS]
+    if unknown:
+        return jsonify({"error": "invalid_group_by",
+                        "message": f"group_by must be a comma separated list of: {', '.join(STATS_COLUMNS)}."}), 400
+
+    filters = {name: request.args[name].strip() for name in STATS_COLUMNS if request.args.get(name, "").strip()}
+    if "development" in filters:
+        filters["development"] = filters["development"].lower()
+    if "zoning" in filters:
+        filters["zoning"] = filters["zoning"].upper()
+
+    # Make sure queued assessments have been written before counting
+    ASSESSMENT_LOGGER.flush()
 
-    # Render the results in an HTML table using the template
-    return render_template_string(html_table_template, columns=column_names, rows=rows)
+    db = AssessmentDB()
+    try:
+        rows = db.get_assessment_stats(group_by, start=request.args.get("from"), end=request.args.get("to"), **filters)
+    except ValueError:
+        return jsonify({"error": "invalid_date", "message": "from and to must be YYYY-MM-DD dates or ISO 8601 timestamps."}), 400
+    finally:
+        db.close()
+
+    # Each group is its column values plus the number of matching assessments
+    return jsonify({"group_by": group_by, "filters": filters,
+                    "groups": [dict(zip(group_by + ["count"], row)) for row in rows]})
+
+
+# Define route to return dashboard figures from the rollup tables, which are kept up to date on every insert,
+# so the cost depends on the number of days and buckets rather than the number of logged assessments
+# Usage examples:
+# /assessment-dashboard/  (daily counts by outcome, development type and zone, and the 10 most failed clauses)
+# /assessment-dashboard/?from=2025-10-01&to=2025-10-31&development=shed&top=5
+@app.route("/assessment-dashboard/", methods=["GET"])
+@limiter.limit(LOGGING_LIMIT)   # Apply rate limit to logging endpoint
+def get_assessment_dashboard():
+    start = request.args.get("from")
+    end = request.args.get("to")
+    development = request.args.get("development", "").strip().lower() or None
+    top = min(max(request.args.get("top", default=10, type=int), 1), 100)
+
+    # Make sure queued assessments have been written before reading
+    ASSESSMENT_LOGGER.flush()
+
+    db = AssessmentDB()
+    try:
+        daily = db.get_daily_counts(start, end, development)
+        top_reasons = db.get_top_reasons(start, end, development, limit=top)
+    except ValueError:
+        return jsonify({"error": "invalid_date", "message": "from and to must be YYYY-MM-DD dates."}), 400
+    finally:
+        db.close()
+
+    # Missing development types and zones are stored as '' in the rollups
+    return jsonify({
+        "daily": [{"day": day, "outcome": context, "development": development or None, "zoning": zoning or None, "count": count}
+                  for day, context, development, zoning, count in daily],
+        "top_reasons": [{"development": development or None, "code": code, "clause": clause or None, "count": count}
+                        for development, code, clause, count in top_reasons],
+    })
 
 
 # Define a route to clear the logging database (for testing purposes)
 @app.route("/clear-logging-db/", methods=["GET"])
 @limiter.limit(LOGGING_LIMIT)   # Apply rate limit to logging endpoint
 def clear_logging_dbx():
+    # Write any queued assessments first so they are cleared too
+    ASSESSMENT_LOGGER.flush()
     db = AssessmentDB()
     db.clear_assessments()
     db.close()
     return "Logging database cleared."
+
+
+# Define a route to return the background assessment logger queue depth and row counters, and the console log queue
+@app.route("/get-logging-stats/", methods=["GET"])
+@limiter.limit(LOGGING_LIMIT)   # Apply rate limit to logging endpoint
+def get_logging_stats():
+    return jsonify({**ASSESSMENT_LOGGER.stats(), "console_log": logging_stats()})
     
 
 #### GisProxy Route for Geocoding ########
 @app.route("/geocode", methods=["GET"])
 def API_geocode():
     address = request.args.get("address")
-    result = geocode_address(address)
+    try:
+        # The ArcGIS request (and its retries) stops once the deadline passes
+        with deadline_scope(Deadline(REQUEST_TIMEOUT_SECONDS)):
+            result = geocode_address(address)
+    except FuturesTimeout:
+        return jsonify({
+            "error": "timeout",
+            "message": f"Processing took longer than {REQUEST_TIMEOUT_SECONDS}s. Please try again."
+        }), 504
     return jsonify(result)
 
+# Define route to return address suggestions from the in-memory index of in-area addresses (the local address file,
+# filtered by ADDRESS_POSTCODE / ADDRESS_SUBURB); responds 503 when there is no address file so the page can fall
+# back to the NSW Planning address API
+# Usage example: /address-suggest?q=12 smith st&limit=5
+@app.route("/address-suggest", methods=["GET"])
+@limiter.limit(SUGGEST_LIMIT)  # Apply rate limit to autocomplete endpoint
+def API_address_suggest():
+    query = request.args.get("q") or ""
+    if not ADDRESS_SUGGESTER.available():
+        return jsonify({"error": "address_index_unavailable",
+                        "message": "No address file has been loaded."}), 503
+    limit = request.args.get("limit", default=5, type=int)
+    return jsonify({"query": query,
+                    "suggestions": [{"address": address} for address in ADDRESS_SUGGESTER.suggest(query, limit)]})
+
+# Define a route to return the assessment scheduler's queue depth, counters and queue-wait and execution-time histograms
+@app.route("/get-scheduler-stats/", methods=["GET"])
+@limiter.limit(LOGGING_LIMIT)   # Apply rate limit to logging endpoint
+def get_scheduler_stats():
+    return jsonify(SCHEDULER.stats())
 
-# Define the main assessment function that routes to specific development checks based on input attributes
-def Assess(attributes):
+# Define a route to return the stage and request latency histograms and the outcome, response and rate-limit
+# counters in the Prometheus text format
+@app.route("/metrics", methods=["GET"])
+@limiter.limit(LOGGING_LIMIT)   # Apply rate limit to logging endpoint
+def get_metrics():
+    return Response(METRICS.render(), mimetype="text/plain; version=0.0.4")
+
+# Define a route to return the assessment result cache hit, miss and eviction counters
+@app.route("/get-assessment-cache-stats/", methods=["GET"])
+@limiter.limit(LOGGING_LIMIT)   # Apply rate limit to logging endpoint
+def get_assessment_cache_stats():
+    return jsonify(ASSESSMENT_CACHE.stats())
+
+# Define a route to return the size and memory use of the address autocomplete index
+@app.route("/get-address-index-stats/", methods=["GET"])
+@limiter.limit(LOGGING_LIMIT)   # Apply rate limit to logging endpoint
+def get_address_index_stats():
+    return jsonify(ADDRESS_SUGGESTER.stats())
+
+# Define route to return the property profile for an address in one request: the geocoded location plus
+# zoning, heritage, foreshore, bushfire, sensitive area and land size from the GIS layers, queried concurrently
+# Usage example: /property-profile?address=1 Smith Street, Albury NSW 2640
+@app.route("/property-profile", methods=["GET"])
+def API_property_profile():
+    address = (request.args.get("address") or "").strip()
+    if not address:
+        return jsonify({"error": "Missing address"}), 400
+    try:
+        # GIS calls made for this request stop once the deadline passes
+        with deadline_scope(Deadline(REQUEST_TIMEOUT_SECONDS)):
+            profile = PROPERTY_PROFILES.get(address)
+    except FuturesTimeout:
+        return jsonify({
+            "error": "timeout",
+            "message": f"Processing took longer than {REQUEST_TIMEOUT_SECONDS}s. Please try again."
+        }), 504
+    if "error" in profile:
+        # The address could not be geocoded
+        return jsonify(profile), 404 if profile == NO_CANDIDATES else 502
+    return jsonify(profile)
+
+# Define a route to return the geocode cache hit, miss and eviction counters, and the property profile and parcel table counters
+@app.route("/get-geocode-stats/", methods=["GET"])
+@limiter.limit(LOGGING_LIMIT)   # Apply rate limit to logging endpoint
+def get_geocode_stats():
+    return jsonify({**GEOCODE_CACHE.stats(), "property_profiles": PROPERTY_PROFILES.stats(),
+                    "parcel_table": PARCEL_TABLE.stats()})
+
+
+# Helper function to build the output of an assessment
+def format_result(result, relevant_sections, context):
+    """ This function interleaves the assessment messages with the full URL of each relevant SEPP section,
+        or the guidance message for an Invalid assessment """
     # Initialise an empty list to hold the full result including relevant SEPP sections and explanatory links
     full_result = []
 
-    # Make a copy of original attributes for logging purposes
-    attributes_received = attributes.copy()
-
-    # Extract address for logging or future audit trail (default fallback if missing)
-    address = attributes.get("address", "No address provided")
-    
-    # Do some basic validation of input attributes but this should really be done in the frontend
-    for attrib in attributes:
-        # Normalise string inputs to lowercase and strip whitespace (except zoning which should be uppercase)
-        if isinstance(attributes[attrib], str):
-            if attrib == "zoning":  # Zones should be in capital letters
-                attributes[attrib] = attributes[attrib].upper().strip()
-            else:
-                attributes[attrib] = attributes[attrib].lower().strip() 
-        # Validate numeric inputs, defaulting to 0.0 if invalid or missing
-        elif isinstance(attributes[attrib], (int, float)):
-            attributes[attrib] = parse_float(attributes[attrib], default=0.0)   
-        else:
-            # For any other data types, retain the original value
-            attributes[attrib] = attributes[attrib]
-        # Default any missing string attributes to "no" for binary yes/no fields
-        if attributes[attrib] == "" or attributes[attrib] is None:
-            attributes[attrib] = "no"
-
-    # Route to appropriate rules engine based on development type and get assessment results
-    if attributes["development"] == "patio":
-        # Applies patio-specific rules from schema
-        result, relevant_sections, context = patio_check(attributes)  
-    elif attributes["development"] == "shed":
-        # Applies shed-specific rules from schema
-        result, relevant_sections, context = shed_check(attributes)
-    elif attributes["development"] == "retain":
-        # Applies retaining wall-specific rules from schema
-        result, relevant_sections, context = retain_wall_check(attributes)
-    else:
-        # Handle invalid development type with fallback messaging and context flag
-        result, relevant_sections, context = ["The development type is not supported."], ["Please use 'shed' or 'patio' as the development type."], "Invalid"
-
-    # Prepare and format the full result for output
-    # Add header and footer for clarity when output to console
-    print("--------------------------------------------------------------------------------------------------------------------")
-    print(f"📋 Assessment Result for : {address}")
-    print("--------------------------------------------------------------------------------------------------------------------")
-  
-    # Build the full result list for output including relevant SEPP sections and links
     # Iterate through each rule result and append to output list
     for section in range(len(relevant_sections)):
-            full_result.append(result[section])
-            
-            # If context is invalid, append guidance and exit early
-            if context == "Invalid" and section == 0:
-                full_result.append(relevant_sections[section])
-                break
-
-            # If SEPP section is provided, append full URL for user reference
-            if relevant_sections[section] != "":
-                full_result.append(f"{SEPP_URL}{relevant_sections[section]}")
-    
-    # Print the full result to console for logging/debugging purposes
-    for line in full_result:
-        print(line)
+        full_result.append(result[section])
 
-    # Add footer with SEPP reference
-    print("--------------------------------------------------------------------------------------------------------------------")
-    print("################ Subject to conditions listed in SEPP Division 2 - Exempt and Complying Development ################")
-    print("--------------------------------------------------------------------------------------------------------------------")
-    print("\n")
+        # If context is invalid, append guidance and exit early
+        if context == "Invalid" and section == 0:
+            full_result.append(relevant_sections[section])
+            break
 
-    # Save Assessment results to database
-    db = AssessmentDB()
+        # If SEPP section is provided, append full URL for user reference
+        if relevant_sections[section] != "":
+            full_result.append(f"{SEPP_URL}{relevant_sections[section]}")
 
-    # Save assessment result as `context`, `input_data`, and `response_data`
-    # Where `input_data` and `response_data` are JSON strings
-    # and `context` is a string to identify the type of assessment result {"Exempt", "Non-Exempt", "Invalid"}
-    db.save_assessment(
-        context = context,
-        input_json = json.dumps(attributes_received),
-        response_json = json.dumps({"result": full_result})
-        )
+    return full_result
 
-    db.close()
 
-    # Return the full result list to the frontend for display
-    return full_result
+# Helper function to build the outcome of an assessment with invalid or missing attributes
+def invalid_outcome(errors, codes=()):
+    """ This function returns the Invalid context, the full result list (the invalid input message followed by one
+        line per field error), the reason codes found before the error and the compact parameters (the errors) """
+    full_result = [sepp_rules.INVALID_INPUT_MESSAGE]
+    full_result.extend(f"{error['field']}: {error['message']}" if error["field"] else error["message"] for error in errors)
+    return "Invalid", full_result, tuple(codes), {"errors": errors}
+
+
+# Helper function to find the development type of the input attributes of an assessment
+def development_type(attributes):
+    """ This function returns the development type, normalised as its input schema would """
+    development = attributes.get("development")
+    return development.lower().strip() if isinstance(development, str) else development
+
+
+# Helper function to assess a validated input record against the rule-set for a development type
+def evaluate_rules(development, record):
+    """ This function applies the compiled SEPP rule-set to a validated input record, returning the assessment
+        context, the full result list (messages with their SEPP links from the reason catalog), the reason codes
+        and the compact parameters """
+    codes, missing = sepp_rules.evaluate_record(development, record)
+    if missing is not None:
+        return invalid_outcome([missing_field_error(missing)], codes)
+    return sepp_rules.outcome(codes), sepp_rules.expand(development, codes), tuple(codes), {}
+
+
+# Helper function to find the reason codes an assessment is logged under
+def logged_codes(context, codes):
+    """ This function returns the reason codes to index a logged assessment under: the reasons its result lists,
+        so none for an Invalid assessment (whose result lists the field errors, not the reasons found before them) """
+    return () if context == "Invalid" else codes
+
+
+# Helper function to assess a validated input record, timed as the rules stage (cached by Assess)
+def assess_rules(development, record):
+    """ This function returns evaluate_rules(development, record), timing it as the rules stage """
+    with METRICS.stage("rules"):
+        return evaluate_rules(development, record)
+
+
+# Define the main assessment function that routes to specific development checks based on input attributes
+# response_format is "verbose" (the messages and links) or "codes" (the compact form: reason codes and the values
+# of any variable parts, for clients that expand the codes with the catalog from /get-reason-catalog/)
+# input_json is the request body the attributes were decoded from, if they were, which is logged as it is
+def Assess(attributes, response_format="verbose", input_json=None):
+    # Development type, normalised as its schema would
+    development = development_type(attributes)
+
+    # Validate the attributes against the compiled input schema of the development type (patio, shed or retaining
+    # wall), then get the assessment from its compiled rule-set, or from the result cache when the same validated
+    # inputs have been submitted before (skipping the rules)
+    schema = SCHEMAS.get(development)
+    if schema is not None:
+        with METRICS.stage("assess"):
+            with METRICS.stage("normalise"):
+                record, errors = schema.validate(attributes)
+            if errors:
+                context, full_result, codes, parameters = invalid_outcome(errors)
+            else:
+                context, full_result, codes, parameters = ASSESSMENT_CACHE.get_or_assess(development, record, assess_rules)
+        # The result lists may be shared with the cache: they are only encoded, never changed
+        compact = {"development": development, "context": context, "codes": codes, "parameters": parameters}
+    else:
+        # Handle invalid development type with fallback messaging and context flag
+        result, relevant_sections, context = sepp_rules.UNSUPPORTED_DEVELOPMENT
+        full_result = format_result(result, relevant_sections, context)
+        codes = ()
+        compact = {"development": development, "context": context, "codes": [],
+                   "parameters": {"unsupported_development": development}}
+
+    # Log the outcome as one structured event (sampled with LOG_SAMPLE_RATES=assessment=<rate>).  The address
+    # and result text are not logged: the address stays in the assessment database only, and the codes expand to
+    # the result text with the reason catalog
+    log.info("assessment", extra={"development": development, "context": context, "codes": compact["codes"]})
+    METRICS.count("assessments", context)
+
+    # Stop here if the request has already timed out, so no result is logged for a response nobody receives
+    check_deadline()
+
+    # Encode the response body once: the full result list for the frontend to display, or the compact form if it
+    # was asked for.  The logged response is {"result": <the full result list>}, so for the full result it is built
+    # around the same bytes rather than encoded again
+    with METRICS.stage("encode"):
+        result_json = dumps(full_result)
+        if response_format == "codes":
+            body = dumps({**compact, "catalog_version": sepp_rules.RULES_VERSION})
+        else:
+            body = result_json
+        response_json = b'{"result":' + result_json + b'}'
+
+    # Queue the assessment result for the background database writer as `context`, `input_data`, `response_data` and
+    # `fields` where `input_data` is the request body as sent (or the attributes, encoded as a JSON string by the
+    # writer), `response_data` is already JSON, `fields` are the development type, zone and reason codes it is
+    # indexed under and `context` is a string to identify the type of assessment result {"Exempt", "Non-Exempt", "Invalid"}
+    with METRICS.stage("log"):
+        ASSESSMENT_LOGGER.log(context, attributes if input_json is None else input_json, response_json,
+                              (*input_fields(attributes), logged_codes(context, codes)))
+
+    # The JSON response body, returned by the WSGI and ASGI routes as it is
+    return body
+
+# Define the batch assessment function that evaluates many sets of input attributes together
+def AssessBatch(items):
+    # Validate each item against the compiled input schema of its development type, as Assess does (anything that
+    # is not an object is assessed as an unsupported development type).  Invalid items get the same field errors
+    outcomes = [None] * len(items)
+    valid_items = []
+    with METRICS.stage("normalise"):
+        for position, item in enumerate(items):
+            development = development_type(item) if isinstance(item, dict) else None
+            schema = SCHEMAS.get(development)
+            if schema is None:
+                result, relevant_sections, context = sepp_rules.UNSUPPORTED_DEVELOPMENT
+                outcomes[position] = (context, format_result(result, relevant_sections, context), (), {})
+                continue
+            record, errors = schema.validate(item)
+            if errors:
+                outcomes[position] = invalid_outcome(errors)
+            else:
+                valid_items.append((position, development, record))
+
+    # Evaluate the valid items with the same compiled rules as a single assessment
+    with METRICS.stage("rules"):
+        for position, development, record in valid_items:
+            outcomes[position] = evaluate_rules(development, record)
+
+    log.info("batch_assessment", extra={"count": len(items)})
+    for context, _, _, _ in outcomes:
+        METRICS.count("assessments", context)
+
+    # Stop here if the request has already timed out, so no results are logged for a response nobody receives
+    check_deadline()
+
+    # Queue all assessment results for the background database writer, which saves them in a single transaction
+    with METRICS.stage("log"):
+        ASSESSMENT_LOGGER.log_many([
+            (context, item, {"result": full_result}, (*input_fields(item), logged_codes(context, codes)))
+            for item, (context, full_result, codes, _) in zip(items, outcomes)
+        ])
+
+    # Return the per-item results in input order
+    return {
+        "count": len(items),
+        "results": [{"context": context, "result": full_result} for context, full_result, _, _ in outcomes]
+    }
 
 # for testing timeout response
 #@app.get("/debug/sleep/<int:secs>")
@@ -0,0 +1,189 @@
+# Asyncio (ASGI) variant of ExemptAssessAPI
+#
+# Under gunicorn sync workers every request holds its worker while it waits on ArcGIS, so one slow GIS
+# response blocks a whole worker.  This app serves the I/O-bound routes natively on an event loop, where a
+# worker can wait on many GIS responses at once:
+#   /property-profile, /geocode    geocode and layer queries over the shared asyncio connection pool
+#   /get-assessment-result/        rule evaluation is CPU-light, so it runs inline on the event loop
+#   /address-suggest               in-memory index lookup, inline
+# Every other route is served by the Flask app (ExemptAssessAPI.app, mounted as WSGI and run in a thread
+# pool), so both modes share one implementation of them.  The Flask WSGI mode is unchanged.
+#
+# Requires the optional starlette, uvicorn, aiohttp and a2wsgi packages.
+# Usage (from the repository root):
+#   uvicorn ExemptAssessASGI:app --workers 4
+
+import asyncio
+import functools
+import time
+from concurrent.futures import TimeoutError as FuturesTimeout
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from limits import parse_many, storage
+from limits.aio.strategies import FixedWindowRateLimiter
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse as StarletteJSONResponse, Response
+from starlette.routing import Mount, Route
+
+import ExemptAssessAPI
+from ExemptAssessAPI import (ASSESSMENT_FORMATS, ASSESSMENT_MAX_BYTES, Assess, DEFAULT_LIMIT, PAYLOAD_TOO_LARGE,
+                             REQUEST_TIMEOUT_SECONDS, STORAGE_URI, SUGGEST_LIMIT, VALIDATE_LIMIT)
+from GISProxy import geocode_address_async
+from address_index import ADDRESS_SUGGESTER
+from assessment_logger import ASSESSMENT_LOGGER
+from geocode_cache import NO_CANDIDATES
+from json_codec import dumps, loads
+from http_transport import GIS_ASYNC_TRANSPORT
+from property_profile import PROPERTY_PROFILES
+from request_metrics import METRICS
+from work_scheduler import Deadline, deadline_scope
+
+
+class JSONResponse(StarletteJSONResponse):
+    # JSON responses encoded with json_codec (orjson or msgspec when installed): compact UTF-8, keys in order
+    def render(self, content):
+        return dumps(content)
+
+
+# Rate limits for the native routes, with the same limits and storage as Flask-Limiter applies in WSGI mode
+RATE_LIMITER = FixedWindowRateLimiter(storage.storage_from_string(
+    STORAGE_URI if STORAGE_URI.startswith("async+") else f"async+{STORAGE_URI}"))
+
+
+@functools.lru_cache(maxsize=None)
+def limit_items(limit):
+    # The rate limits in a limit string, which like Flask-Limiter's can hold several ("10 per second;100 per minute")
+    return tuple(parse_many(limit))
+
+
+async def rate_limited(request, limit):
+    # A 429 response if the client has used up any of the limits for this route, otherwise None.  As in
+    # Flask-Limiter, the limits are hit in order and the first one used up answers the request
+    identifiers = (request.client.host if request.client else "", request.url.path)
+    for item in limit_items(limit):
+        if not await RATE_LIMITER.hit(item, *identifiers):
+            break
+    else:
+        return None
+    METRICS.count("rate_limited", request.url.path)
+    reset_time, _ = await RATE_LIMITER.get_window_stats(item, *identifiers)
+    return JSONResponse({"error": "rate_limited",
+                         "message": "Too many requests. Please try again later."},
+                        status_code=429, headers={"Retry-After": str(max(1, int(reset_time - time.time())))})
+
+
+def content_length(request):
+    # The Content-Length header as a number, 0 if it is missing or malformed (as Werkzeug reads it in the Flask app)
+    value = request.headers.get("content-length", "").strip()
+    return int(value) if value.isascii() and value.isdigit() else 0
+
+
+def timed(handler):
+    # A route handler that times the request and its stages, returned in the Server-Timing header as in the Flask app
+    async def endpoint(request):
+        started = METRICS.begin_request()
+        response = await handler(request)
+        METRICS.count("responses", request.url.path, response.status_code)
+        response.headers["Server-Timing"] = METRICS.end_request(request.url.path, started)
+        return response
+    return endpoint
+
+
+# Assessment of one proposal; the rules are evaluated inline and the result is logged by the write-behind logger
+async def API_assessment(request):
+    limited = await rate_limited(request, VALIDATE_LIMIT)
+    if limited:
+        return limited
+    response_format = request.query_params.get("format", "verbose").lower()
+    if response_format not in ASSESSMENT_FORMATS:
+        return JSONResponse({"error": "invalid_format",
+                             "message": f"The format must be one of: {', '.join(ASSESSMENT_FORMATS)}."}, status_code=400)
+    if content_length(request) > ASSESSMENT_MAX_BYTES:
+        return JSONResponse(PAYLOAD_TOO_LARGE, status_code=413)
+    # A JSON object is logged as the bytes that were sent, as in the Flask app
+    input_json = await request.body()
+    try:
+        attributes = loads(input_json)
+    except ValueError:
+        attributes = None
+    if not isinstance(attributes, dict):
+        attributes, input_json = {}, None
+    # Assess returns the encoded response body
+    return Response(Assess(attributes, response_format, input_json), media_type="application/json")
+
+
+async def API_geocode(request):
+    limited = await rate_limited(request, DEFAULT_LIMIT)
+    if limited:
+        return limited
+    try:
+        # The ArcGIS request (and its retries) stops once the deadline passes
+        with deadline_scope(Deadline(REQUEST_TIMEOUT_SECONDS)):
+            result = await geocode_address_async(request.query_params.get("address"))
+    except (FuturesTimeout, asyncio.TimeoutError):
+        return JSONResponse({
+            "error": "timeout",
+            "message": f"Processing took longer than {REQUEST_TIMEOUT_SECONDS}s. Please try again."
+        }, status_code=504)
+    return JSONResponse(result)
+
+
+# Property profile for an address: the geocode and the six layer queries are awaited on the event loop
+async def API_property_profile(request):
+    limited = await rate_limited(request, DEFAULT_LIMIT)
+    if limited:
+        return limited
+    address = (request.query_params.get("address") or "").strip()
+    if not address:
+        return JSONResponse({"error": "Missing address"}, status_code=400)
+    try:
+        # GIS calls made for this request stop once the deadline passes
+        with deadline_scope(Deadline(REQUEST_TIMEOUT_SECONDS)):
+            profile = await PROPERTY_PROFILES.get_async(address)
+    except (FuturesTimeout, asyncio.TimeoutError):
+        return JSONResponse({
+            "error": "timeout",
+            "message": f"Processing took longer than {REQUEST_TIMEOUT_SECONDS}s. Please try again."
+        }, status_code=504)
+    if "error" in profile:
+        # The address could not be geocoded
+        return JSONResponse(profile, status_code=404 if profile == NO_CANDIDATES else 502)
+    return JSONResponse(profile)
+
+
+async def API_address_suggest(request):
+    limited = await rate_limited(request, SUGGEST_LIMIT)
+    if limited:
+        return limited
+    if not ADDRESS_SUGGESTER.available():
+        return JSONResponse({"error": "address_index_unavailable",
+                             "message": "No address file has been loaded."}, status_code=503)
+    query = request.query_params.get("q") or ""
+    try:
+        limit = int(request.query_params.get("limit", 5))
+    except ValueError:
+        limit = 5
+    return JSONResponse({"query": query,
+                         "suggestions": [{"address": address} for address in ADDRESS_SUGGESTER.suggest(query, limit)]})
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    # Close this worker's GIS connections and write any assessments still queued for the database
+    await GIS_ASYNC_TRANSPORT.close()
+    ASSESSMENT_LOGGER.close()
+
+
+app = Starlette(
+    routes=[
+        Route("/get-assessment-result/", timed(API_assessment), methods=["POST"]),
+        Route("/geocode", timed(API_geocode), methods=["GET"]),
+        Route("/property-profile", timed(API_property_profile), methods=["GET"]),
+        Route("/address-suggest", timed(API_address_suggest), methods=["GET"]),
+        # Everything else is served by the Flask app
+        Mount("/", app=WSGIMiddleware(ExemptAssessAPI.app)),
+    ],
+    lifespan=lifespan,
+)
@@ -1,7 +1,11 @@
 # GISProxy.py
 import os
 import json
-import requests
+
+from geocode_cache import GeocodeCache, NO_CANDIDATES
+from http_transport import GIS_TRANSPORT, GIS_ASYNC_TRANSPORT
+from work_scheduler import DeadlineExceeded
+from request_metrics import METRICS
 
 # Load config
 config_path = os.path.join(os.path.dirname(__file__), "env", "geocode.conf")
@@ -10,33 +14,69 @@ with open(config_path, "r") as f:
 
 # Uses environment key if set, otherwise uses config file
 API_KEY = os.getenv("ARCGIS_API_KEY", config.get("ARCGIS_API_KEY"))
-GEOCODE_URL = config.get("GEOCODE_URL")
+GEOCODE_URL = os.getenv("GEOCODE_URL", config.get("GEOCODE_URL"))
 
-def geocode_address(address):
-    """Query ArcGIS API to get GPS coordinates for an address"""
-    if not address:
-        return {"error": "Missing address"}
+# Shared two-tier (in-process and SQLite) cache of geocode results
+GEOCODE_CACHE = GeocodeCache()
+
+def query_arcgis(address):
+    """Query ArcGIS API to get GPS coordinates for an address, raising an exception if the request fails"""
+    params = {
+        "SingleLine": address,
+        "f": "json",
+        "token": API_KEY
+    }
+
+    # Pooled keep-alive connection with connect/read timeouts and retry on 429/5xx
+    with METRICS.stage("arcgis"):
+        return first_candidate(GIS_TRANSPORT.get_json(GEOCODE_URL, params=params))
 
+async def query_arcgis_async(address):
+    """query_arcgis() for the ASGI app, over the shared asyncio connection pool"""
     params = {
         "SingleLine": address,
         "f": "json",
         "token": API_KEY
     }
+    with METRICS.stage("arcgis"):
+        return first_candidate(await GIS_ASYNC_TRANSPORT.get_json(GEOCODE_URL, params=params))
+
+def first_candidate(data):
+    """Location of the best candidate in a findAddressCandidates response"""
+    if data.get("candidates"):
+        c = data["candidates"][0]
+        return {
+            "x": c["location"]["x"],
+            "y": c["location"]["y"],
+            "score": c.get("score"),
+            "address": c.get("address")
+        }
+    else:
+        return dict(NO_CANDIDATES)
+
+def geocode_address(address):
+    """Get GPS coordinates for an address, from the geocode cache if it has been looked up recently"""
+    if not address:
+        return {"error": "Missing address"}
+
+    try:
+        with METRICS.stage("geocode"):
+            return GEOCODE_CACHE.get_or_fetch(address, query_arcgis)
+    except DeadlineExceeded:
+        # The caller's deadline has passed; let it answer with a timeout
+        raise
+    except Exception as e:
+        return {"error": str(e)}
+
+async def geocode_address_async(address):
+    """geocode_address() for the ASGI app: the same cache, with the ArcGIS request made without blocking a thread"""
+    if not address:
+        return {"error": "Missing address"}
 
     try:
-        resp = requests.get(GEOCODE_URL, params=params, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-
-        if data.get("candidates"):
-            c = data["candidates"][0]
-            return {
-                "x": c["location"]["x"],
-                "y": c["location"]["y"],
-                "score": c.get("score"),
-                "address": c.get("address")
-            }
-        else:
-            return {"error": "No candidates found"}
+        with METRICS.stage("geocode"):
+            return await GEOCODE_CACHE.get_or_fetch_async(address, query_arcgis_async)
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         return {"error": str(e)}
@@ -0,0 +1,261 @@
+# In-memory address autocomplete index for /address-suggest
+#
+# The address box used to call the NSW Planning address API on every debounced keystroke, asking for 15
+# records and discarding most of them with the ADDRESS_POSTCODE / ADDRESS_SUBURB filter.  This index holds
+# the in-area address set instead: it is built from a local address file (ADDRESS_FILE, one address per
+# line, or a CSV with an "address" column such as a G-NAF / NSW Address Point extract), filtered with the
+# same postcode and suburb settings from static/js/conf/js.conf, so a suggestion is an in-process lookup.
+#
+# Addresses are matched on words, in any order, with the last (or any) word allowed to be a prefix and
+# street type abbreviations expanded, so "12 smith st", "smith street 12" and "12 smi" all find
+# "12 SMITH STREET ALBURY 2640".  The sorted word list is searched with bisect, and the ids of the addresses
+# containing each word are stored one word after another in a single NumPy array, so the addresses containing
+# any word with a given prefix are one contiguous slice of it.  A query marks each word's slice in a boolean
+# mask over all addresses and ANDs the masks; the whole-word matches that rank the results are counted the same
+# way.  Checking the candidates of the rarest word one by one cost up to several milliseconds when even that
+# word matched thousands of addresses (a house number like "2" is a prefix of the postcode 2640); the masks
+# bound a suggestion to a few vectorised passes over the index.
+#
+# Usage (from the repository root):
+#   python address_index.py info [--file addresses.txt]
+#   python address_index.py suggest "12 smith st" [--file addresses.txt]
+
+import argparse
+import csv
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+import numpy as np
+
+from geocode_cache import ABBREVIATIONS, normalise_address
+
+log = logging.getLogger(__name__)
+
+# Index settings
+ADDRESS_FILE = os.getenv("ADDRESS_FILE", "addresses.txt")
+ADDRESS_FILE_COLUMN = os.getenv("ADDRESS_FILE_COLUMN", "address")
+ADDRESS_RELOAD_CHECK_SECONDS = float(os.getenv("ADDRESS_RELOAD_CHECK_SECONDS", 30))
+SUGGEST_MIN_LENGTH = 3
+SUGGEST_MAX_RESULTS = 15
+
+# Area filter shared with the frontend
+JS_CONF_PATH = os.path.join(os.path.dirname(__file__), "static", "js", "conf", "js.conf")
+
+
+def load_area_filter(path=JS_CONF_PATH):
+    # (postcodes, suburb) from ADDRESS_POSTCODE and ADDRESS_SUBURB in the frontend configuration, parsed like
+    # validateAddressList() in APIQuery.js
+    with open(path, "r") as f:
+        text = "\n".join(line for line in f if not line.strip().startswith("//"))
+    config = dict(re.findall(r'(ADDRESS_\w+)\s*:\s*"([^"]*)"', text))
+    postcodes = {digits for digits in (re.sub(r"\D", "", code) for code in config.get("ADDRESS_POSTCODE", "").split(","))
+                 if len(digits) == 4}
+    return postcodes, config.get("ADDRESS_SUBURB", "").strip().lower()
+
+
+def in_area(address, postcodes, suburb):
+    # Whether an address ends with one of the postcodes or contains the suburb
+    parts = address.split()
+    return bool(parts) and (parts[-1] in postcodes or bool(suburb and suburb in address.lower()))
+
+
+def read_addresses(path, column=ADDRESS_FILE_COLUMN):
+    # Addresses from a text file (one per line) or a CSV file (the given column, matched case-insensitively)
+    with open(path, "r", newline="", encoding="utf-8-sig") as f:
+        if not path.lower().endswith(".csv"):
+            return [line.strip() for line in f if line.strip()]
+        reader = csv.DictReader(f)
+        field = next((name for name in reader.fieldnames or [] if name.strip().lower() == column.lower()), None)
+        if field is None:
+            raise ValueError(f"{path} has no {column!r} column")
+        return [row[field].strip() for row in reader if row[field] and row[field].strip()]
+
+
+def _deep_size(value):
+    # Approximate memory used by the index structures (containers plus the objects they hold)
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        size += sum(_deep_size(item) for item in value)
+    return size
+
+
+class AddressIndex:
+    def __init__(self, addresses=()):
+        # Display addresses, de-duplicated and sorted; ids below are positions in this list
+        self.addresses = sorted({" ".join(address.split()) for address in addresses})
+        # The words of each address's normalised form
+        postings = {}
+        for address_id, address in enumerate(self.addresses):
+            for word in set(normalise_address(address).split()):
+                postings.setdefault(word, array("I")).append(address_id)
+        # Sorted words, the ids of the addresses containing each (concatenated in word order) and running
+        # totals of the id counts, so the addresses of the words from position start to end are
+        # ids[totals[start]:totals[end]]
+        self.words = sorted(postings)
+        self.totals = np.zeros(len(self.words) + 1, dtype=np.int64)
+        np.cumsum([len(postings[word]) for word in self.words], out=self.totals[1:])
+        self.ids = np.concatenate([np.frombuffer(postings[word], dtype=np.uint32) for word in self.words]
+                                  or [np.zeros(0, dtype=np.uint32)])
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def _word_range(self, prefix):
+        # Positions in self.words of the words starting with prefix
+        return bisect_left(self.words, prefix), bisect_left(self.words, prefix + "\uffff")
+
+    def _mask(self, spans):
+        # Boolean mask of the addresses containing a word in any of the (start, end) ranges of self.words
+        mask = np.zeros(len(self.addresses), dtype=bool)
+        for start, end in spans:
+            mask[self.ids[self.totals[start]:self.totals[end]]] = True
+        return mask
+
+    def suggest(self, query, limit=5):
+        # Up to limit addresses containing every word of the query (as a word or a word prefix, in any order),
+        # addresses with more whole-word matches first
+        words = [word for word in re.split(r"[\s,.;]+", query.lower()) if word]
+        if not words:
+            return []
+        # Each query word matches as typed or with its abbreviation expanded ("rd" also matches "road")
+        alternatives = [{word, ABBREVIATIONS.get(word, word)} for word in words]
+
+        # Stop straight away if a query word matches no address, otherwise AND the masks of the query words,
+        # rarest first
+        ranges = [[self._word_range(prefix) for prefix in options] for options in alternatives]
+        counts = [sum(int(self.totals[end] - self.totals[start]) for start, end in spans) for spans in ranges]
+        if min(counts) == 0:
+            return []
+        order = sorted(range(len(words)), key=counts.__getitem__)
+        found = self._mask(ranges[order[0]])
+        for position in order[1:]:
+            found &= self._mask(ranges[position])
+        matches = np.flatnonzero(found)
+        if len(matches) == 0:
+            return []
+
+        # Rank by the number of query words matched as whole words, then by address (a stable sort keeps the
+        # ids in order)
+        whole_words = np.zeros(len(matches), dtype=np.int32)
+        for options in alternatives:
+            positions = [bisect_left(self.words, option) for option in options]
+            spans = [(position, position + 1) for position, option in zip(positions, options)
+                     if position < len(self.words) and self.words[position] == option]
+            if spans:
+                whole_words += self._mask(spans)[matches]
+        ranked = matches[np.argsort(-whole_words, kind="stable")[:limit]]
+        return [self.addresses[address_id] for address_id in ranked.tolist()]
+
+    def memory_bytes(self):
+        return _deep_size(self.addresses) + _deep_size(self.words) + self.ids.nbytes + self.totals.nbytes
+
+
+class AddressSuggester:
+    # The shared index for the application: built from the address file on first use and rebuilt (then
+    # swapped in) when the file changes, checked at most every check_seconds
+    def __init__(self, path=ADDRESS_FILE, check_seconds=ADDRESS_RELOAD_CHECK_SECONDS, conf_path=JS_CONF_PATH):
+        self.path = path
+        self.check_seconds = check_seconds
+        self.conf_path = conf_path
+        self.index = None
+        self.source_mtime = None
+        self.read_count = 0
+        self.load_seconds = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def _mtime(self):
+        try:
+            return os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    def reload(self):
+        # Build a new index from the address file (empty if there is no file) and swap it in
+        start = time.perf_counter()
+        mtime = self._mtime()
+        addresses = read_addresses(self.path) if mtime is not None else []
+        postcodes, suburb = load_area_filter(self.conf_path)
+        index = AddressIndex(address for address in addresses if in_area(address, postcodes, suburb))
+        self.read_count = len(addresses)
+        self.load_seconds = time.perf_counter() - start
+        self.index = index
+        self.source_mtime = mtime
+        self._checked_at = time.monotonic()
+        return index
+
+    def _current(self):
+        # The index, loading it on first use and reloading it if the address file has changed
+        if self._checked_at is not None and time.monotonic() - self._checked_at < self.check_seconds:
+            return self.index
+        with self._lock:
+            if self._checked_at is None or (time.monotonic() - self._checked_at >= self.check_seconds
+                                            and self._mtime() != self.source_mtime):
+                try:
+                    self.reload()
+                except Exception as error:
+                    # Keep serving the previous index rather than failing every suggestion
+                    log.warning("Address index load failed: %s", error)
+                    self.index = self.index or AddressIndex()
+            self._checked_at = time.monotonic()
+        return self.index
+
+    def available(self):
+        # Whether there are in-area addresses to suggest from
+        return len(self._current()) > 0
+
+    def suggest(self, query, limit=5):
+        query = query.strip()
+        if len(query) < SUGGEST_MIN_LENGTH:
+            return []
+        return self._current().suggest(query, max(1, min(limit, SUGGEST_MAX_RESULTS)))
+
+    def stats(self):
+        index = self._current()
+        return {
+            "file": self.path,
+            "addresses_read": self.read_count,
+            "addresses_indexed": len(index),
+            "words": len(index.words),
+            "memory_bytes": index.memory_bytes(),
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+        }
+
+
+# Shared address index for the application, loaded on first use
+ADDRESS_SUGGESTER = AddressSuggester()
+
+
+def main(argv=None):
+    # Command line entry point for inspecting and querying the address index
+    parser = argparse.ArgumentParser(description="Build the address autocomplete index and query it.")
+    parser.add_argument("--file", default=ADDRESS_FILE, help="address file (text, one per line, or CSV)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("info", help="show the number of addresses and memory used")
+    suggest_parser = commands.add_parser("suggest", help="print the suggestions for a query")
+    suggest_parser.add_argument("query")
+    suggest_parser.add_argument("--limit", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    suggester = AddressSuggester(args.file)
+    suggester.reload()
+    if args.command == "info":
+        for name, value in suggester.stats().items():
+            print(f"{name:<19}{value}")
+        return
+    start = time.perf_counter()
+    suggestions = suggester.suggest(args.query, args.limit)
+    elapsed = (time.perf_counter() - start) * 1e3
+    for address in suggestions:
+        print(address)
+    print(f"({len(suggestions)} suggestions in {elapsed:.3f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# Memoised assessment results keyed by the rule inputs
+#
+# Many submissions differ only in the address, or repeat exactly (a resubmission after a timeout), yet every
+# one was evaluated and formatted again.  AssessmentCache keeps a bounded in-process LRU (per gunicorn worker)
+# of assessment outcomes (context, formatted result, reason codes and compact parameters) keyed by the
+# development type and the values of only the attributes its rules read (sepp_rules.RULE_INPUTS), so the
+# address and any other extra fields do not split entries.  An attribute that is missing is part of the key
+# too, as the rules report it as missing.
+#
+# Keys are read from the validated input record (input_schemas), so values that normalise to the same input
+# ("Yes" and "yes", 5 and 5.0) share an entry, and every value is hashable.  A hit skips the rules.
+#
+# The rule tables are fixed when sepp_rules is imported, so entries stay valid for the life of the worker and a
+# rule change takes effect when the workers are restarted.  "Invalid" results (a missing attribute) are not cached: they are rare, and usually corrected and submitted
+# again straight away.  Caching only skips the assessment itself: Assess() still validates and logs every request.
+
+import os
+import threading
+from collections import OrderedDict
+from operator import attrgetter
+
+import sepp_rules
+
+# Cache settings (0 disables the cache)
+ASSESSMENT_CACHE_SIZE = int(os.getenv("ASSESSMENT_CACHE_SIZE", 4096))
+
+
+# Stands in for an attribute that was not submitted
+_MISSING = object()
+
+# Getters for the rule inputs of each development type, in a fixed order
+_INPUT_GETTERS = {}
+
+
+def canonical_key(development, record, inputs):
+    # The development type and the values of the rule inputs of an input record in a fixed order, with
+    # attributes that were not submitted marked so they never match a present one
+    getter = _INPUT_GETTERS.get(inputs)
+    if getter is None:
+        getter = _INPUT_GETTERS[inputs] = attrgetter(*inputs)
+    try:
+        values = getter(record)
+    except AttributeError:
+        values = tuple(getattr(record, name, _MISSING) for name in inputs)
+    return (development, values)
+
+
+class AssessmentCache:
+    def __init__(self, size=ASSESSMENT_CACHE_SIZE):
+        self.size = size
+        # key -> (context, full result, reason codes, parameters), least recently used first
+        self.entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Counters reported by stats()
+        self.hits = 0
+        self.misses = 0
+        self.uncacheable = 0
+        self.evictions = 0
+
+    def key(self, development, record):
+        return canonical_key(development, record, sepp_rules.RULE_INPUTS[development])
+
+    def get(self, key):
+        # The cached outcome for a key, or None
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, outcome):
+        # Cache an assessment outcome, evicting the least recently used entries beyond the size limit.  Callers
+        # share the cached outcome, so they must not modify it
+        with self._lock:
+            if outcome[0] == "Invalid":
+                self.uncacheable += 1
+                return
+            self.entries[key] = outcome
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_assess(self, development, record, assess):
+        # The (context, full result, reason codes, parameters) for a validated input record, from the cache or
+        # by calling assess(development, record) and caching what it returns
+        if self.size <= 0:
+            return assess(development, record)
+        key = self.key(development, record)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        outcome = assess(development, record)
+        self.put(key, outcome)
+        return outcome
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+    def stats(self):
+        # Hit, miss and eviction counters for monitoring
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "size": self.size,
+            "rules_version": sepp_rules.RULES_VERSION,
+            "hits": self.hits,
+            "misses": self.misses,
+            "uncacheable": self.uncacheable,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+# Shared assessment result cache for the application (one per worker process)
+ASSESSMENT_CACHE = AssessmentCache()
@@ -1,43 +1,323 @@
 # Logging of Assessment requests and results to SQLITE database
 
+import os
 import sqlite3
-from datetime import datetime
+import threading
+from collections import Counter
+from datetime import date, datetime, timedelta
 from zoneinfo import ZoneInfo
 
+import sepp_rules
+from json_codec import loads
+from request_metrics import METRICS
+
+# Timezone for assessment timestamps (built once rather than on every save)
+AEST = ZoneInfo("Australia/Sydney")
+
+
+def aest_now():
+    # Current time in AEST as an ISO 8601 string
+    return datetime.now(AEST).isoformat()
+
+
+# SQL statements, kept as constants so each persistent connection reuses its prepared (cached) statement
+CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS assessments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        context TEXT,         -- 'Exempt', 'Non-Exempt', 'Invalid'
+        input_json TEXT,      -- raw input parameters
+        response_json TEXT,   -- full backend response
+        development TEXT,     -- normalised development type from input_json (indexed for analytics)
+        zoning TEXT           -- normalised zone from input_json (indexed for analytics)
+    )
+"""
+# Index for the ORDER BY timestamp queries (id is the rowid primary key, so it is already indexed)
+CREATE_TIMESTAMP_INDEX_SQL = """
+    CREATE INDEX IF NOT EXISTS idx_assessments_timestamp ON assessments (timestamp)
+"""
+# Covering index for grouped counts by development type, zone, outcome and date, so /assessment-stats/
+# is answered from the index alone without reading (or JSON parsing) the table rows
+CREATE_STATS_INDEX_SQL = """
+    CREATE INDEX IF NOT EXISTS idx_assessments_stats ON assessments (development, zoning, context, timestamp)
+"""
+# One row per failed SEPP clause of an assessment: the reason code from sepp_rules and its clause anchor.
+# The assessment's timestamp, outcome, development type and zone are copied in so reason counts are
+# answered from this table's covering index too
+CREATE_REASONS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS assessment_reasons (
+        assessment_id INTEGER NOT NULL,   -- assessments.id
+        timestamp TEXT,
+        context TEXT,
+        development TEXT,
+        zoning TEXT,
+        code TEXT NOT NULL,               -- reason code, e.g. 'SHED_BOUNDARY_RESIDENTIAL'
+        clause TEXT                       -- SEPP clause anchor, e.g. 'sec.2.18 (1)(f)(i)'
+    )
+"""
+CREATE_REASONS_STATS_INDEX_SQL = """
+    CREATE INDEX IF NOT EXISTS idx_assessment_reasons_stats
+    ON assessment_reasons (development, zoning, code, clause, context, timestamp, assessment_id)
+"""
+CREATE_REASONS_ASSESSMENT_INDEX_SQL = """
+    CREATE INDEX IF NOT EXISTS idx_assessment_reasons_assessment ON assessment_reasons (assessment_id)
+"""
+# Rollup tables kept up to date in the same transaction as each insert, so dashboard reads cost one row per
+# bucket rather than a scan of the log.  Missing values are stored as '' as they are part of the primary key
+CREATE_DAILY_COUNTS_SQL = """
+    CREATE TABLE IF NOT EXISTS assessment_daily_counts (
+        day TEXT NOT NULL,           -- AEST date of the assessment, YYYY-MM-DD
+        context TEXT NOT NULL,
+        development TEXT NOT NULL,
+        zoning TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (day, context, development, zoning)
+    ) WITHOUT ROWID
+"""
+CREATE_DAILY_REASONS_SQL = """
+    CREATE TABLE IF NOT EXISTS assessment_daily_reasons (
+        day TEXT NOT NULL,
+        development TEXT NOT NULL,
+        code TEXT NOT NULL,
+        clause TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (day, development, code)
+    ) WITHOUT ROWID
+"""
+UPSERT_DAILY_COUNT_SQL = """
+    INSERT INTO assessment_daily_counts (day, context, development, zoning, count)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (day, context, development, zoning) DO UPDATE SET count = count + excluded.count
+"""
+UPSERT_DAILY_REASON_SQL = """
+    INSERT INTO assessment_daily_reasons (day, development, code, clause, count)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (day, development, code) DO UPDATE SET count = count + excluded.count, clause = excluded.clause
+"""
+
+# Columns added to the assessments table after it was first released, added to older databases on startup
+ADDED_COLUMNS = [("development", "TEXT"), ("zoning", "TEXT")]
+# Schema statements, run in order once per process for each database (after any ADDED_COLUMNS are added)
+SCHEMA_SQL = [CREATE_TABLE_SQL, CREATE_TIMESTAMP_INDEX_SQL, CREATE_REASONS_TABLE_SQL,
+              CREATE_REASONS_ASSESSMENT_INDEX_SQL, CREATE_DAILY_COUNTS_SQL, CREATE_DAILY_REASONS_SQL]
+INDEX_SQL = [CREATE_STATS_INDEX_SQL, CREATE_REASONS_STATS_INDEX_SQL]
+
+INSERT_SQL = """
+    INSERT INTO assessments (timestamp, context, input_json, response_json, development, zoning)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+INSERT_REASON_SQL = """
+    INSERT INTO assessment_reasons (assessment_id, timestamp, context, development, zoning, code, clause)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Columns that /assessment-stats/ can group and filter by; outcome is the context column
+STATS_COLUMNS = {"development": "development", "zoning": "zoning", "outcome": "context",
+                 "code": "code", "clause": "clause"}
+# Columns that only exist in the assessment_reasons table
+REASON_COLUMNS = ("code", "clause")
+
+# Connection settings: WAL lets readers and the writer work at the same time, synchronous=NORMAL is safe with WAL
+# and avoids an fsync on every commit, and busy_timeout waits for the lock instead of failing straight away
+BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+CACHED_STATEMENTS = 64
+
+# One connection per thread (and per process, as connections must not be shared across a fork)
+_local = threading.local()
+# Database paths whose schema has been set up in this process
+_initialised = set()
+_initialised_lock = threading.Lock()
+
+
+def get_connection(db_path="assessments.db"):
+    # Return this thread's persistent connection to the database, opening and configuring it on first use
+    pid = os.getpid()
+    if getattr(_local, "pid", None) != pid:
+        # New thread, or first use in a forked worker process
+        _local.pid = pid
+        _local.connections = {}
+
+    conn = _local.connections.get(db_path)
+    if conn is None:
+        conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000, cached_statements=CACHED_STATEMENTS)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        _setup_schema(conn, db_path, pid)
+        _local.connections[db_path] = conn
+    return conn
+
+
+def close_connection(db_path="assessments.db"):
+    # Close this thread's persistent connection to the database, if it has one
+    connections = getattr(_local, "connections", {}) if getattr(_local, "pid", None) == os.getpid() else {}
+    conn = connections.pop(db_path, None)
+    if conn is not None:
+        conn.close()
+
+
+def _setup_schema(conn, db_path, pid):
+    # Create the tables and their indexes once per process for each database path
+    with _initialised_lock:
+        if (pid, db_path) in _initialised:
+            return
+        conn.execute(CREATE_TABLE_SQL)
+        # Databases created before the indexed columns existed get them added (cheap: SQLite does not rewrite
+        # the table); existing rows are filled in by the backfill in assessment_migrate.py
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(assessments)")}
+        for column, column_type in ADDED_COLUMNS:
+            if column not in existing:
+                try:
+                    conn.execute(f"ALTER TABLE assessments ADD COLUMN {column} {column_type}")
+                except sqlite3.OperationalError as error:
+                    # Another worker process added it first
+                    if "duplicate column" not in str(error):
+                        raise
+        for statement in SCHEMA_SQL + INDEX_SQL:
+            conn.execute(statement)
+        conn.commit()
+        _initialised.add((pid, db_path))
+
+
+def _decode(value):
+    # Decode a JSON string or bytes, returning None if it is not valid JSON (objects are returned as they are)
+    if not isinstance(value, (str, bytes)):
+        return value
+    try:
+        return loads(value)
+    except ValueError:
+        return None
+
+
+def input_fields(input_data):
+    # The indexed (development, zoning) values of an assessment's input, given as an object or as stored JSON
+    inputs = _decode(input_data)
+    if not isinstance(inputs, dict):
+        inputs = {}
+    development = inputs.get("development")
+    development = development.lower().strip() or None if isinstance(development, str) else None
+    zoning = inputs.get("zoning")
+    zoning = zoning.upper().strip() or None if isinstance(zoning, str) else None
+    return development, zoning
+
+
+def reason_fields(development, zoning, codes):
+    # The indexed (development, zoning, reasons) values for an assessment whose reason codes are known, as they
+    # are when it is logged: reasons is each code with its clause from the reason catalog (None for a reason
+    # without a SEPP section, such as an unsupported zone)
+    return development, zoning, [(code, sepp_rules.CATALOG[code][1] or None) for code in codes]
+
+
+def index_fields(context, input_data, response_data):
+    # Extract the indexed (development, zoning, reasons) values for an assessment from its context, input and
+    # response, given either as objects or as the stored JSON strings.  reasons is a list of (code, clause) pairs,
+    # matched from the messages in the response and the SEPP link (or section) that follows each one; an Invalid
+    # assessment has none, as when it is logged (logged_codes).  Only used for rows logged without their codes
+    # (the backfill of older rows in assessment_migrate.py); new rows are logged with the codes the rules gave
+    # (reason_fields)
+    development, zoning = input_fields(input_data)
+
+    reasons = []
+    if context == "Invalid":
+        return development, zoning, reasons
+    response = _decode(response_data)
+    result = response.get("result") if isinstance(response, dict) else None
+    codes = sepp_rules.REASON_CODES.get(development)
+    if codes and isinstance(result, list):
+        index = 0
+        while index < len(result):
+            message = result[index]
+            following = result[index + 1] if index + 1 < len(result) else None
+            # The section follows the message as a full SEPP URL (or on its own for an Invalid assessment)
+            section = following.rsplit("#", 1)[-1] if isinstance(following, str) else None
+            if isinstance(message, str) and (message, section) in codes:
+                reasons.append((codes[(message, section)], section))
+                index += 2
+                continue
+            if isinstance(message, str) and (message, "") in codes:
+                # Reasons without a SEPP section (unsupported zone) have no link after them
+                reasons.append((codes[(message, "")], None))
+            index += 1
+    return development, zoning, reasons
+
+
+def timestamp_conditions(start=None, end=None):
+    # SQL conditions and parameters for a timestamp range, where start and end are dates (YYYY-MM-DD, end
+    # inclusive) or full ISO 8601 timestamps
+    conditions = []
+    parameters = []
+    if start:
+        conditions.append("timestamp >= ?")
+        parameters.append(start)
+    if end:
+        if len(end) == 10:
+            # A date on its own includes the whole day
+            conditions.append("timestamp < ?")
+            parameters.append((date.fromisoformat(end) + timedelta(days=1)).isoformat())
+        else:
+            conditions.append("timestamp <= ?")
+            parameters.append(end)
+    return conditions, parameters
+
+
+def day_conditions(start=None, end=None):
+    # SQL conditions and parameters for an inclusive range of rollup days (YYYY-MM-DD; longer timestamps are
+    # truncated to their date)
+    conditions = []
+    parameters = []
+    if start:
+        conditions.append("day >= ?")
+        parameters.append(date.fromisoformat(start[:10]).isoformat())
+    if end:
+        conditions.append("day <= ?")
+        parameters.append(date.fromisoformat(end[:10]).isoformat())
+    return conditions, parameters
+
+
 class AssessmentDB:
     def __init__(self, db_path="assessments.db"):
-        # Connect to the SQLite database (or create it if it doesn't exist)
-        self.conn = sqlite3.connect(db_path)
+        # Use this thread's persistent connection to the SQLite database (created if it doesn't exist)
+        self.conn = get_connection(db_path)
         # Create a cursor object to execute SQL commands
         self.cursor = self.conn.cursor()
-        # Create the assessments table if it doesn't exist
-        self._create_table()
-
-    def _create_table(self):
-        # Create the assessments table with the required fields
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS assessments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT,
-                context TEXT,         -- 'Exempt', 'Non-Exempt', 'Invalid'
-                input_json TEXT,      -- raw input parameters
-                response_json TEXT    -- full backend response
-            )
-        """)
-        # Commit the changes to the database
-        self.conn.commit()
 
     def save_assessment(self, context, input_json, response_json):
         # Save the current time in AEST timezone
-        aest_time = datetime.now(ZoneInfo("Australia/Sydney")).isoformat()
+        aest_time = aest_now()
 
-        # Insert the assessment record into the database
-        self.cursor.execute("""
-            INSERT INTO assessments (timestamp, context, input_json, response_json)
-            VALUES (?, ?, ?, ?)
-        """, (aest_time, context, input_json, response_json))
-        # Commit the changes to the database
-        self.conn.commit()
+        # Insert the assessment record (and its indexed columns and reason codes) into the database
+        self.insert_assessments([(aest_time, context, input_json, response_json)])
+
+    def save_assessments(self, rows):
+        # Save many assessment records in a single transaction, where each row is (context, input_json, response_json)
+        aest_time = aest_now()
+        self.insert_assessments([(aest_time, context, input_json, response_json) for context, input_json, response_json in rows])
+
+    def insert_assessments(self, rows, fields=None):
+        # Insert many timestamped records in a single transaction, where each row is (timestamp, context, input_json, response_json)
+        # fields is the matching list of index_fields() values; if it is not given they are extracted from the JSON
+        # Time the transaction as the "db_write" stage (see request_metrics.py)
+        with METRICS.stage("db_write"):
+            if fields is None:
+                fields = [index_fields(context, input_json, response_json) for _, context, input_json, response_json in rows]
+            daily_counts = Counter()
+            daily_reasons = Counter()
+            for (timestamp, context, input_json, response_json), (development, zoning, reasons) in zip(rows, fields):
+                self.cursor.execute(INSERT_SQL, (timestamp, context, input_json, response_json, development, zoning))
+                day = timestamp[:10]
+                daily_counts[(day, context or "", development or "", zoning or "")] += 1
+                if reasons:
+                    assessment_id = self.cursor.lastrowid
+                    self.cursor.executemany(INSERT_REASON_SQL, [
+                        (assessment_id, timestamp, context, development, zoning, code, clause) for code, clause in reasons
+                    ])
+                    for code, clause in reasons:
+                        daily_reasons[(day, development or "", code, clause or "")] += 1
+            # Add the rows to the rollups in the same transaction, one upsert per bucket
+            self.cursor.executemany(UPSERT_DAILY_COUNT_SQL, [bucket + (count,) for bucket, count in daily_counts.items()])
+            self.cursor.executemany(UPSERT_DAILY_REASON_SQL, [bucket + (count,) for bucket, count in daily_reasons.items()])
+            # Commit once for all the rows
+            self.conn.commit()
 
     def get_recent_assessments(self, limit=10):
         # Retrieve the most recent assessments up to the specified limit
@@ -49,6 +329,26 @@ class AssessmentDB:
         """, (limit,))
         return self.cursor.fetchall()
     
+    def iter_assessments(self, before_id=None, page_size=100):
+        # Retrieve a page of assessments, newest first, using keyset pagination on the id primary key
+        # The cursor is returned so rows can be streamed one at a time instead of loaded with fetchall()
+        if before_id is None:
+            self.cursor.execute("""
+                SELECT id, timestamp, context, input_json, response_json
+                FROM assessments
+                ORDER BY id DESC
+                LIMIT ?
+            """, (page_size,))
+        else:
+            self.cursor.execute("""
+                SELECT id, timestamp, context, input_json, response_json
+                FROM assessments
+                WHERE id < ?
+                ORDER BY id DESC
+                LIMIT ?
+            """, (before_id, page_size))
+        return self.cursor
+
     def get_assessment_id(self, assessment_id=1):
         # Retrieve a specific assessment by its ID
         self.cursor.execute("""
@@ -61,15 +361,72 @@ class AssessmentDB:
     def clear_assessments(self):
         # Delete all records from the assessments table
         self.cursor.execute("DELETE FROM assessments")
+        self.cursor.execute("DELETE FROM assessment_reasons")
+        self.cursor.execute("DELETE FROM assessment_daily_counts")
+        self.cursor.execute("DELETE FROM assessment_daily_reasons")
         # Reset the auto-incrementing primary key
         self.cursor.execute("DELETE FROM sqlite_sequence WHERE name='assessments'")
         # Commit the changes
         self.conn.commit()
 
+    def get_assessment_stats(self, group_by=(), start=None, end=None, **filters):
+        # Count assessments grouped by any of the STATS_COLUMNS, with optional equality filters on the same columns
+        # and a timestamp range (see timestamp_conditions).  Grouping or filtering by reason code or clause counts
+        # the assessments that failed on them, from the assessment_reasons table.  Both tables have a covering
+        # index over these columns, so the query never reads the stored JSON
+        columns = [STATS_COLUMNS[name] for name in group_by]
+        by_reason = any(name in REASON_COLUMNS for name in list(group_by) + list(filters))
+        conditions, parameters = timestamp_conditions(start, end)
+        for name, value in filters.items():
+            conditions.append(f"{STATS_COLUMNS[name]} = ?")
+            parameters.append(value)
+
+        select = ", ".join(columns + ["COUNT(DISTINCT assessment_id)" if by_reason else "COUNT(*)"])
+        sql = f"SELECT {select} FROM {'assessment_reasons' if by_reason else 'assessments'}"
+        if conditions:
+            sql += f" WHERE {' AND '.join(conditions)}"
+        if columns:
+            sql += f" GROUP BY {', '.join(columns)} ORDER BY {len(columns) + 1} DESC, {', '.join(columns)}"
+        self.cursor.execute(sql, parameters)
+        return self.cursor.fetchall()
+
+    def get_daily_counts(self, start=None, end=None, development=None):
+        # Daily assessment counts by outcome, development type and zone from the rollup table, for dates start to
+        # end inclusive (YYYY-MM-DD); reads one row per bucket
+        conditions, parameters = day_conditions(start, end)
+        if development:
+            conditions.append("development = ?")
+            parameters.append(development)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        self.cursor.execute(f"""
+            SELECT day, context, development, zoning, count
+            FROM assessment_daily_counts
+            {where}
+            ORDER BY day, context, development, zoning
+        """, parameters)
+        return self.cursor.fetchall()
+
+    def get_top_reasons(self, start=None, end=None, development=None, limit=10):
+        # The most frequently failed SEPP clauses over a date range from the rollup table, as
+        # (development, code, clause, count) rows, most frequent first
+        conditions, parameters = day_conditions(start, end)
+        if development:
+            conditions.append("development = ?")
+            parameters.append(development)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        self.cursor.execute(f"""
+            SELECT development, code, clause, SUM(count)
+            FROM assessment_daily_reasons
+            {where}
+            GROUP BY development, code
+            ORDER BY 4 DESC, development, code
+            LIMIT ?
+        """, parameters + [limit])
+        return self.cursor.fetchall()
+
     def close(self):
-        # Close the database connection
+        # Close the cursor; the connection stays open for reuse by this thread (see close_connection)
         self.cursor.close()
-        self.conn.close()
 
 
 
@@ -0,0 +1,196 @@
+# Bulk export of the assessment log for offline analysis
+#
+# Streams the assessments table in chunks with fetchmany(), so memory use stays constant however many
+# rows the table has.  Date range, context and development type filters are applied in SQL.
+# Formats:
+#   ndjson  - one JSON object per row, with input_json and response_json decoded
+#   csv     - one row per assessment, with the input_json fields flattened into columns
+#   parquet - compressed columnar file with the same columns as csv (needs the optional pyarrow package)
+#
+# Usage (from the repository root):
+#   python assessment_export.py --format csv --from 2025-10-01 --to 2025-10-31 --context Non-Exempt -o october.csv
+
+import argparse
+import csv
+import io
+import sys
+
+from assessment_db import AssessmentDB, timestamp_conditions
+from json_codec import dumps_text, loads
+import sepp_rules
+
+# Optional dependency for the columnar (Parquet) export
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+EXPORT_FORMATS = ("ndjson", "csv", "parquet")
+EXPORT_CHUNK_SIZE = 1000
+
+# Media type and file extension for each export format
+EXPORT_MEDIA_TYPES = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+# Input fields flattened into their own columns: the address, the development type, then every attribute
+# read by the rule tables.  Any other input fields are kept together in the input_other column as JSON
+INPUT_FIELDS = list(dict.fromkeys(
+    ["address", "development"]
+    + [attribute for _, rules, _ in sepp_rules.RULE_SETS.values()
+       for rule in rules for attribute, _, _ in rule["when"]]
+))
+FLAT_COLUMNS = ["id", "timestamp", "context"] + [f"input_{field}" for field in INPUT_FIELDS] + ["input_other", "response_json"]
+
+
+def build_query(start=None, end=None, context=None, development=None):
+    # Build the SELECT statement and parameters for an export, with the filters in the WHERE clause
+    # start and end are dates (YYYY-MM-DD, end inclusive) or full ISO 8601 timestamps
+    conditions, parameters = timestamp_conditions(start, end)
+    if context:
+        conditions.append("context = ?")
+        parameters.append(context)
+    if development:
+        conditions.append("development = ?")
+        parameters.append(development.strip().lower())
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    sql = f"""
+        SELECT id, timestamp, context, input_json, response_json
+        FROM assessments
+        {where}
+        ORDER BY id
+    """
+    return sql, parameters
+
+
+def iter_rows(query, db_path="assessments.db", chunk_size=EXPORT_CHUNK_SIZE):
+    # Yield chunks of (id, timestamp, context, input_json, response_json) rows of a build_query() query using
+    # fetchmany()
+    db = AssessmentDB(db_path)
+    try:
+        sql, parameters = query
+        db.cursor.execute(sql, parameters)
+        while True:
+            rows = db.cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        db.close()
+
+
+def _decode(text):
+    # Decode a stored JSON column, keeping the raw text if it is not valid JSON
+    try:
+        return loads(text) if text else None
+    except ValueError:
+        return text
+
+
+def flatten_row(row):
+    # Flatten one assessment row into the FLAT_COLUMNS values, as strings (None for missing values)
+    assessment_id, timestamp, context, input_json, response_json = row
+    inputs = _decode(input_json)
+    if not isinstance(inputs, dict):
+        inputs = {}
+    values = [assessment_id, timestamp, context]
+    for field in INPUT_FIELDS:
+        value = inputs.get(field)
+        values.append(value if value is None or isinstance(value, str) else dumps_text(value))
+    other = {field: value for field, value in inputs.items() if field not in INPUT_FIELDS}
+    values.append(dumps_text(other) if other else None)
+    values.append(response_json)
+    return values
+
+
+def iter_ndjson(chunks):
+    # One JSON object per line, with input_json and response_json decoded
+    for rows in chunks:
+        yield "".join(
+            dumps_text({"id": assessment_id, "timestamp": timestamp, "context": context,
+                        "input": _decode(input_json), "response": _decode(response_json)}) + "\n"
+            for assessment_id, timestamp, context, input_json, response_json in rows
+        )
+
+
+def iter_csv(chunks):
+    # CSV header then one line per assessment with the input fields flattened into columns
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FLAT_COLUMNS)
+    for rows in chunks:
+        writer.writerows(flatten_row(row) for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_parquet(chunks):
+    # Parquet file written one row group per chunk, yielding the bytes as each row group is written
+    if pq is None:
+        raise RuntimeError("The parquet export needs the pyarrow package (pip install pyarrow).")
+    schema = pa.schema([("id", pa.int64())] + [(column, pa.string()) for column in FLAT_COLUMNS[1:]])
+    buffer = io.BytesIO()
+    with pq.ParquetWriter(buffer, schema, compression="zstd") as writer:
+        for rows in chunks:
+            columns = list(zip(*(flatten_row(row) for row in rows)))
+            writer.write_table(pa.Table.from_arrays([pa.array(column, type=field.type)
+                                                     for column, field in zip(columns, schema)], schema=schema))
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    # The file footer is written when the writer closes
+    yield buffer.getvalue()
+
+
+def export_assessments(export_format, db_path="assessments.db", chunk_size=EXPORT_CHUNK_SIZE, **filters):
+    # Stream the export in the requested format as a generator of str (ndjson, csv) or bytes (parquet) chunks
+    # The filters are checked here, before anything is streamed: invalid from/to dates raise ValueError
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {export_format!r}, expected one of {', '.join(EXPORT_FORMATS)}")
+    if export_format == "parquet" and pq is None:
+        raise RuntimeError("The parquet export needs the pyarrow package (pip install pyarrow).")
+    chunks = iter_rows(build_query(**filters), db_path, chunk_size)
+    if export_format == "ndjson":
+        return iter_ndjson(chunks)
+    if export_format == "csv":
+        return iter_csv(chunks)
+    return iter_parquet(chunks)
+
+
+def main(argv=None):
+    # Command line entry point for exporting the assessment log to a file or stdout
+    parser = argparse.ArgumentParser(description="Export the assessment log for offline analysis.")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson", help="output format (default ndjson)")
+    parser.add_argument("--from", dest="start", help="first date (YYYY-MM-DD) or ISO 8601 timestamp to include")
+    parser.add_argument("--to", dest="end", help="last date (YYYY-MM-DD, inclusive) or ISO 8601 timestamp to include")
+    parser.add_argument("--context", help="only include this context (Exempt, Non-Exempt or Invalid)")
+    parser.add_argument("--development", help="only include this development type (shed, patio or retain)")
+    parser.add_argument("--db", default="assessments.db", help="path to the assessments database")
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE, help="rows fetched per chunk")
+    parser.add_argument("-o", "--output", help="output file (default stdout)")
+    args = parser.parse_args(argv)
+
+    chunks = export_assessments(args.format, db_path=args.db, chunk_size=args.chunk_size, start=args.start,
+                                end=args.end, context=args.context, development=args.development)
+    binary = args.format == "parquet"
+    if args.output:
+        output = open(args.output, "wb" if binary else "w", newline="" if not binary else None)
+    else:
+        output = sys.stdout.buffer if binary else sys.stdout
+    try:
+        for chunk in chunks:
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
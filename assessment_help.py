@@ -258,7 +258,10 @@ html_table_template = """
                 </tr>
             </thead>
             <tbody>
+                {% set page = namespace(last_id=None, count=0) %}
                 {% for row in rows %}
+                    {% set page.last_id = row[0] %}
+                    {% set page.count = loop.index %}
                     <tr>
                         {% for cell in row %}
                             <td>{{ cell }}</td>
@@ -267,6 +270,9 @@ html_table_template = """
                 {% endfor %}
             </tbody>
         </table>
+        {% if page_size and page.count == page_size %}
+            <p><a href="?before_id={{ page.last_id }}&page_size={{ page_size }}">Next {{ page_size }} older assessments</a></p>
+        {% endif %}
     </body>
     </html>
     """
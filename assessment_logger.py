@@ -0,0 +1,196 @@
+# Write-behind logging of assessments to the SQLite database
+#
+# Requests push (context, input, response, indexed fields) onto a bounded queue and return straight away.  One writer
+# thread drains the queue and writes the rows in batched transactions (group commit), committing when
+# LOG_BATCH_SIZE rows are pending or LOG_FLUSH_SECONDS have passed since the first pending row.
+# JSON encoding and SQLite commits happen on the writer thread, so neither is in the request path.  JSON bytes
+# (a request body as it was sent, or a response already encoded for the client) are stored as they are instead of
+# being encoded again; any other value, strings included, is encoded with the standard library as it always was.
+# The development type, zone and reason codes an assessment is indexed under are queued with it, so neither the
+# input nor the response is decoded again to find them.
+# If the queue is full the row is dropped and counted rather than blocking the request.
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+from assessment_db import AssessmentDB, aest_now, close_connection, index_fields, reason_fields
+from json_codec import loads
+
+log = logging.getLogger(__name__)
+
+# Queue and group commit settings
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", 200))
+LOG_FLUSH_SECONDS = float(os.getenv("LOG_FLUSH_SECONDS", 0.5))
+
+# Control messages for the writer thread
+_FLUSH = object()
+_STOP = object()
+
+
+class AssessmentLogger:
+    def __init__(self, db_path="assessments.db", queue_size=LOG_QUEUE_SIZE,
+                 batch_size=LOG_BATCH_SIZE, flush_seconds=LOG_FLUSH_SECONDS):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.queue = queue.Queue(maxsize=queue_size)
+        # Counters reported by stats()
+        self.logged = 0
+        self.dropped = 0
+        self.failed = 0
+        # The writer thread is started on first use, so it is created in each gunicorn worker after fork
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        # Drops are counted by request threads, so they are counted under a lock of their own
+        self._counter_lock = threading.Lock()
+
+    def _ensure_started(self):
+        # Start the writer thread if it is not running in this process
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="assessment-logger", daemon=True)
+                self._thread.start()
+
+    def log(self, context, input_data, response_data, fields=None):
+        # Queue one assessment for logging; input_data and response_data are encoded as JSON by the writer unless
+        # they are already JSON bytes.  fields are the (development, zoning, reason codes) to index the assessment
+        # under; if they are not given they are read from the input and matched from the messages in the response
+        # (index_fields)
+        return self.log_many([(context, input_data, response_data, fields)])
+
+    def log_many(self, rows):
+        # Queue many (context, input_data, response_data, fields) assessments as one item, so they are always
+        # written in the same transaction
+        self._ensure_started()
+        try:
+            self.queue.put_nowait((aest_now(), rows))
+            return True
+        except queue.Full:
+            with self._counter_lock:
+                self.dropped += len(rows)
+            return False
+
+    def flush(self, timeout=5.0):
+        # Wait until everything queued before this call has been committed
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        try:
+            self.queue.put((_FLUSH, done), timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        # Write everything still queued and stop the writer thread (called at exit)
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def stats(self):
+        # Queue depth and row counters for monitoring
+        return {
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "logged_rows": self.logged,
+            "dropped_rows": self.dropped,
+            "failed_rows": self.failed,
+        }
+
+    def _run(self):
+        # Writer thread: drain the queue and group commit the rows
+        db = AssessmentDB(self.db_path)
+        pending = []
+        waiting = []
+        deadline = None
+        stopping = False
+        try:
+            while not stopping:
+                # Block for the first row, then wait at most until the flush deadline for more
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+
+                if item is _STOP:
+                    stopping = True
+                elif isinstance(item, tuple) and item[0] is _FLUSH:
+                    waiting.append(item[1])
+                elif item is not None:
+                    timestamp, rows = item
+                    pending.extend((timestamp, *row) for row in rows)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_seconds
+
+                # Commit when enough rows are pending, the deadline has passed, or on a flush or stop request
+                if pending and (len(pending) >= self.batch_size or item is None or waiting or stopping
+                                or time.monotonic() >= deadline):
+                    self._write(db, pending)
+                    pending = []
+                    deadline = None
+                elif not pending:
+                    deadline = None
+
+                for done in waiting:
+                    done.set()
+                waiting = []
+        finally:
+            db.close()
+            close_connection(self.db_path)
+
+    def _write(self, db, pending):
+        # Extract the indexed fields, encode and insert the pending rows in one transaction
+        try:
+            rows = [(timestamp, context, _json_text(input_data), _json_text(response_data))
+                    for timestamp, context, input_data, response_data, _ in pending]
+            db.insert_assessments(rows, [_index(row, pending_row) for row, pending_row in zip(rows, pending)])
+            self.logged += len(pending)
+        except Exception as error:
+            self.failed += len(pending)
+            log.error("Assessment logging failed for %d rows: %s", len(pending), error)
+            try:
+                db.conn.rollback()
+            except Exception:
+                pass
+
+
+def _index(row, pending_row):
+    # The indexed fields of a logged row: as they were queued, otherwise read from the input and matched from the
+    # response.  Text is read as stored JSON, so a string value is indexed from its encoded form
+    _, context, input_json, response_json = row
+    _, _, input_data, response_data, fields = pending_row
+    if fields is not None:
+        return reason_fields(*fields)
+    return index_fields(context, input_json if isinstance(input_data, str) else input_data,
+                        response_json if isinstance(response_data, str) else response_data)
+
+
+def _json_text(value):
+    # The JSON text stored for a logged value: JSON bytes (already encoded) are decoded, any other value is encoded
+    # as json.dumps always stored it (a request body in UTF-16 or UTF-32, which JSON decoders accept, is re-encoded)
+    if isinstance(value, (bytes, bytearray)):
+        try:
+            return value.decode()
+        except UnicodeDecodeError:
+            value = loads(value)
+    return json.dumps(value)
+
+
+# Shared logger for the application, flushed when the process exits
+ASSESSMENT_LOGGER = AssessmentLogger()
+atexit.register(ASSESSMENT_LOGGER.close)
@@ -0,0 +1,76 @@
+# Backfill of the indexed analytics columns for assessments logged before they existed
+#
+# New assessments get their development, zoning and assessment_reasons rows when they are written
+# (see assessment_db.index_fields).  Older databases get the columns added on startup, and this
+# migration fills them in for the existing rows.  Rows are processed in id order in batches, each batch
+# in its own short transaction, so the application can keep logging while the backfill runs.  It is safe
+# to run again: a row's reason codes are deleted and rewritten whenever the row is processed.  The rollup
+# tables are rebuilt afterwards, as the backfill moves rows between rollup buckets.
+#
+# Usage (from the repository root):
+#   python assessment_migrate.py [--db assessments.db] [--batch-size 1000]
+
+import argparse
+
+from assessment_db import AssessmentDB, INSERT_REASON_SQL, index_fields
+from assessment_rollups import rebuild_rollups
+
+BACKFILL_BATCH_SIZE = 1000
+
+SELECT_UNINDEXED_SQL = """
+    SELECT id, timestamp, context, input_json, response_json
+    FROM assessments
+    WHERE id > ? AND development IS NULL
+    ORDER BY id
+    LIMIT ?
+"""
+UPDATE_INDEXED_SQL = "UPDATE assessments SET development = ?, zoning = ? WHERE id = ?"
+DELETE_REASONS_SQL = "DELETE FROM assessment_reasons WHERE assessment_id = ?"
+
+
+def backfill_index_columns(db_path="assessments.db", batch_size=BACKFILL_BATCH_SIZE, progress=None):
+    # Fill in the indexed columns and reason codes of rows that have no development type yet, returning the
+    # number of rows processed.  progress, if given, is called with the running total after each batch
+    db = AssessmentDB(db_path)
+    processed = 0
+    last_id = 0
+    try:
+        while True:
+            db.cursor.execute(SELECT_UNINDEXED_SQL, (last_id, batch_size))
+            rows = db.cursor.fetchall()
+            if not rows:
+                break
+            for assessment_id, timestamp, context, input_json, response_json in rows:
+                development, zoning, reasons = index_fields(context, input_json, response_json)
+                db.cursor.execute(UPDATE_INDEXED_SQL, (development, zoning, assessment_id))
+                db.cursor.execute(DELETE_REASONS_SQL, (assessment_id,))
+                db.cursor.executemany(INSERT_REASON_SQL, [
+                    (assessment_id, timestamp, context, development, zoning, code, clause) for code, clause in reasons
+                ])
+            # Commit each batch so the writer is never locked out for long
+            db.conn.commit()
+            processed += len(rows)
+            last_id = rows[-1][0]
+            if progress is not None:
+                progress(processed)
+    finally:
+        db.close()
+    return processed
+
+
+def main(argv=None):
+    # Command line entry point for backfilling the analytics columns of an assessment database
+    parser = argparse.ArgumentParser(description="Backfill the indexed analytics columns of the assessment log.")
+    parser.add_argument("--db", default="assessments.db", help="path to the assessments database")
+    parser.add_argument("--batch-size", type=int, default=BACKFILL_BATCH_SIZE, help="rows per transaction")
+    args = parser.parse_args(argv)
+
+    processed = backfill_index_columns(args.db, args.batch_size,
+                                       progress=lambda total: print(f"  {total} rows backfilled"))
+    print(f"✅ Backfilled {processed} assessments in {args.db}")
+    for table, count in rebuild_rollups(args.db).items():
+        print(f"✅ Rebuilt {table}: {count} buckets")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# Rebuild and consistency check of the assessment rollup tables
+#
+# assessment_daily_counts (assessments per day, outcome, development type and zone) and
+# assessment_daily_reasons (failed SEPP clauses per day and development type) are updated in the same
+# transaction as every insert (see AssessmentDB.insert_assessments), so they only need rebuilding after
+# the raw tables are changed some other way, e.g. by the backfill in assessment_migrate.py.  The check
+# recomputes both with GROUP BY over the raw tables and reports every bucket that differs.
+#
+# Usage (from the repository root):
+#   python assessment_rollups.py rebuild [--db assessments.db]
+#   python assessment_rollups.py check [--db assessments.db]    (exit status 1 if the rollups are out of date)
+
+import argparse
+import sys
+
+from assessment_db import AssessmentDB
+
+# Rollups recomputed from the raw tables, in the same column order as the rollup tables
+RAW_DAILY_COUNTS_SQL = """
+    SELECT substr(timestamp, 1, 10), ifnull(context, ''), ifnull(development, ''), ifnull(zoning, ''), COUNT(*)
+    FROM assessments
+    GROUP BY 1, 2, 3, 4
+"""
+RAW_DAILY_REASONS_SQL = """
+    SELECT substr(timestamp, 1, 10), ifnull(development, ''), code, ifnull(max(clause), ''), COUNT(*)
+    FROM assessment_reasons
+    GROUP BY 1, 2, 3
+"""
+# Rollup table, its SELECT over the raw tables and the number of key columns (before count)
+ROLLUPS = [
+    ("assessment_daily_counts", RAW_DAILY_COUNTS_SQL, 4),
+    ("assessment_daily_reasons", RAW_DAILY_REASONS_SQL, 3),
+]
+
+
+def rebuild_rollups(db_path="assessments.db"):
+    # Recompute the rollup tables from scratch in one transaction, returning the number of buckets in each
+    db = AssessmentDB(db_path)
+    buckets = {}
+    try:
+        # BEGIN IMMEDIATE takes the write lock up front, so no insert can land between the DELETE and the INSERT
+        db.cursor.execute("BEGIN IMMEDIATE")
+        for table, raw_sql, _ in ROLLUPS:
+            db.cursor.execute(f"DELETE FROM {table}")
+            db.cursor.execute(f"INSERT INTO {table} {raw_sql}")
+            buckets[table] = db.cursor.rowcount
+        db.conn.commit()
+    except Exception:
+        db.conn.rollback()
+        raise
+    finally:
+        db.close()
+    return buckets
+
+
+def check_rollups(db_path="assessments.db"):
+    # Compare the rollup tables with the raw tables, returning a list of (table, bucket, rollup_count, raw_count)
+    # for every bucket that differs (an empty list means the rollups are consistent)
+    db = AssessmentDB(db_path)
+    differences = []
+    try:
+        # Read both sides in one transaction so they come from the same snapshot of the database
+        db.cursor.execute("BEGIN")
+        for table, raw_sql, key_columns in ROLLUPS:
+            db.cursor.execute(f"SELECT * FROM {table}")
+            rollup = {tuple(row[:key_columns]): row[-1] for row in db.cursor.fetchall()}
+            db.cursor.execute(raw_sql)
+            raw = {tuple(row[:key_columns]): row[-1] for row in db.cursor.fetchall()}
+            for bucket in sorted(rollup.keys() | raw.keys()):
+                if rollup.get(bucket, 0) != raw.get(bucket, 0):
+                    differences.append((table, bucket, rollup.get(bucket, 0), raw.get(bucket, 0)))
+        db.conn.rollback()
+    finally:
+        db.close()
+    return differences
+
+
+def main(argv=None):
+    # Command line entry point for rebuilding or checking the rollup tables
+    parser = argparse.ArgumentParser(description="Rebuild or check the assessment rollup tables.")
+    parser.add_argument("command", choices=("rebuild", "check"), help="rebuild the rollups, or compare them with the raw tables")
+    parser.add_argument("--db", default="assessments.db", help="path to the assessments database")
+    args = parser.parse_args(argv)
+
+    if args.command == "rebuild":
+        for table, count in rebuild_rollups(args.db).items():
+            print(f"✅ Rebuilt {table}: {count} buckets")
+        return 0
+
+    differences = check_rollups(args.db)
+    for table, bucket, rollup_count, raw_count in differences:
+        print(f"❌ {table} {bucket}: rollup {rollup_count}, raw {raw_count}")
+    if differences:
+        print(f"{len(differences)} buckets differ; run 'python assessment_rollups.py rebuild' to fix them")
+        return 1
+    print("✅ Rollups match the raw tables")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
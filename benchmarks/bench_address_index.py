@@ -0,0 +1,107 @@
+# Benchmark and check of the address autocomplete index with a synthetic LGA address set
+#
+# Builds an address file the size of a regional LGA (street numbers on a few thousand streets across the
+# in-area postcodes, plus out-of-area addresses that the js.conf filter must drop), loads it with
+# address_index, then:
+#   - checks the matches for random queries against a brute-force scan of every address,
+#   - checks "12 smith st" and "smith street 12" style queries rank the address they were made from first,
+#   - reports the load time, memory used and the time per suggestion.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_address_index [addresses]
+
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+import address_index
+from geocode_cache import ABBREVIATIONS
+
+STREET_NAMES = ["Smith", "Kiewa", "Dean", "David", "Olive", "Townsend", "Wilson", "Guinea", "Hume", "Macauley",
+                "Thurgoona", "Lavington", "Urana", "Mate", "Union", "Wagga", "Kemp", "Pemberton", "Nurigong", "Ebden"]
+STREET_TYPES = ["St", "Street", "Rd", "Road", "Ave", "Dr", "Ct", "Pl", "Cres", "Cl", "Way", "Pde"]
+SUBURBS = [("ALBURY", "2640"), ("EAST ALBURY", "2640"), ("LAVINGTON", "2641"), ("THURGOONA", "2640"),
+           ("SPRINGDALE HEIGHTS", "2641"), ("LAKE HUME VILLAGE", "3691")]
+OUT_OF_AREA = [("WODONGA", "3690"), ("CORRYONG", "3707")]
+
+
+def synthetic_addresses(count, seed=1234):
+    # About count in-area addresses plus a tenth as many out of area, in the NSW address API format
+    rng = random.Random(seed)
+    streets = [f"{rng.choice(STREET_NAMES)}{rng.choice(['', 'S', 'TON', 'VALE', 'FIELD'])} {rng.choice(STREET_TYPES)}".upper()
+               for _ in range(count // 12)]
+    addresses = []
+    for number in range(count + count // 10):
+        suburb, postcode = rng.choice(OUT_OF_AREA) if number >= count else rng.choice(SUBURBS)
+        addresses.append(f"{rng.randint(1, 400)} {rng.choice(streets)} {suburb} {postcode}")
+    return addresses
+
+
+def brute_force(addresses, query):
+    # Every address matching the query with the same rules as the index, by testing each one
+    words = [word for word in re.split(r"[\s,.;]+", query.lower()) if word]
+    alternatives = [{word, ABBREVIATIONS.get(word, word)} for word in words]
+    matches = []
+    for address in addresses:
+        text = address_index.normalise_address(address).split()
+        if all(any(token.startswith(option) for token in text for option in options) for options in alternatives):
+            matches.append(address)
+    return sorted(matches)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 40000
+    rng = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        path = os.path.join(scratch, "addresses.txt")
+        with open(path, "w") as f:
+            f.write("\n".join(synthetic_addresses(count)))
+        # The file is deleted with the scratch directory, so the suggester must not look for changes
+        suggester = address_index.AddressSuggester(path, check_seconds=float("inf"))
+        suggester.reload()
+    index = suggester.index
+    stats = suggester.stats()
+
+    # Queries made from random indexed addresses: number first, street first, and partly typed ("12 smi")
+    queries = []
+    for address in rng.sample(index.addresses, 300):
+        number, name, street_type = address.split()[:3]
+        queries.append((address, f"{number} {name.lower()} {street_type.lower()}"))
+        queries.append((address, f"{name.lower()} {ABBREVIATIONS.get(street_type.lower(), street_type.lower())} {number}"))
+        queries.append((address, f"{number} {name.lower()[:3]}"))
+
+    # Every match must agree with the brute-force scan
+    for _, query in queries[:150]:
+        expected = brute_force(index.addresses, query)
+        actual = sorted(index.suggest(query, limit=len(index)))
+        if actual != expected:
+            raise AssertionError(f"{query!r}: index found {len(actual)} addresses, brute force {len(expected)}")
+    # The address a full query was made from is among the first suggestions, unless they all match every
+    # word of the query in full (the same number on the same street in several suburbs)
+    for address, query in queries[0::3] + queries[1::3]:
+        top = index.suggest(query, limit=5)
+        whole = [{word, ABBREVIATIONS.get(word, word)} for word in query.split()]
+        assert address in top or all(all(options & set(address_index.normalise_address(other).split()) for options in whole)
+                                     for other in top), (query, address, top)
+
+    timings = []
+    for _, query in queries:
+        start = time.perf_counter()
+        suggester.suggest(query)
+        timings.append((time.perf_counter() - start) * 1e6)
+    timings.sort()
+
+    print(f"{stats['addresses_read']} addresses read, {stats['addresses_indexed']} in area indexed, "
+          f"{stats['words']} distinct words; load {stats['load_seconds']:.2f}s, memory {stats['memory_bytes'] / 2**20:.1f} MiB")
+    print(f"{len(queries[:150])} queries match the brute-force scan; full queries rank their address first")
+    print(f"{len(queries)} suggestions: median {statistics.median(timings):.0f} us, "
+          f"p99 {timings[int(len(timings) * 0.99)]:.0f} us, max {timings[-1]:.0f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# Benchmark and check of the memoised assessment results
+#
+# Runs the branch-coverage and typical corpora from bench_rules through the input schemas and
+# AssessmentCache.get_or_assess() with ExemptAssessAPI.assess_rules (rules and formatting), each case under
+# several addresses, with extra attributes the rules do not read and with values as a browser might submit them
+# ("Yes", 5 for 5.0), and checks every result is identical to assessing it uncached (so the key covers every
+# attribute the rules read, and only those).  Every case the schema accepts must also give the same outcome as
+# the original normalisation, rule functions and format_result() (legacy_rules); Invalid outcomes only need to
+# agree on being Invalid, as they now list the field errors.  Then reports the hit rate and the time per
+# assessment for a stream of typical proposals (each assessed for several addresses), cached and uncached.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_assessment_cache
+
+import os
+import random
+import tempfile
+import time
+
+import sepp_rules
+from assessment_cache import AssessmentCache
+from benchmarks.bench_rules import LEGACY_CHECKS, build_corpus, build_typical_corpus
+from benchmarks.legacy_rules import normalise_attributes
+from input_schemas import SCHEMAS
+
+
+def submitted(value, rng):
+    # A value as it might arrive from the page: strings in another case or padded, whole numbers as integers
+    if isinstance(value, str) and rng.random() < 0.3:
+        return rng.choice([value.upper(), f" {value}", value.capitalize()])
+    if isinstance(value, float) and value.is_integer() and rng.random() < 0.3:
+        return int(value)
+    return value
+
+
+def with_address(case, rng):
+    # A copy of a case submitted for a random address, sometimes with an attribute the rules do not read
+    case = dict(case, address=f"{rng.randint(1, 400)} Smith Street Albury NSW 2640")
+    if rng.random() < 0.5:
+        case["longitude"] = rng.choice([146.9135, 146.9201, None])
+    return case
+
+
+def main():
+    # ExemptAssessAPI opens its database in the working directory, so import it from a scratch directory
+    os.chdir(tempfile.mkdtemp())
+    from ExemptAssessAPI import assess_rules as assess, format_result
+    rng = random.Random(7)
+    cache = AssessmentCache(size=100000)
+    checked = rejected = 0
+    for development in sepp_rules.RULE_SETS:
+        schema = SCHEMAS[development]
+        corpus = build_corpus(development, random_cases=2000) + build_typical_corpus(development)
+        for case in corpus:
+            variant = {name: submitted(value, rng) for name, value in case.items()}
+            for _ in range(3):
+                attributes = with_address(variant, rng)
+                record, errors = schema.validate(attributes)
+                if errors:
+                    rejected += 1
+                    continue
+                actual = cache.get_or_assess(development, record, assess)
+                expected = assess(development, schema.validate(attributes)[0])
+                if actual != expected:
+                    raise AssertionError(f"{development} {attributes}: cached {actual}, expected {expected}")
+                # The output built from the reason catalog is the original rule output with its links added
+                normalised = normalise_attributes(dict(attributes))
+                result, relevant_sections, context = LEGACY_CHECKS[development](normalised)
+                if (actual[0] == "Invalid") != (context == "Invalid") or context != "Invalid" and (
+                        list(actual[1]) != format_result(result, relevant_sections, context) or actual[0] != context):
+                    raise AssertionError(f"{development} {attributes}: catalog output {actual[1]} differs")
+                checked += 1
+    stats = cache.stats()
+    print(f"{checked} assessments match the uncached rules ({stats['hits']} hits, {stats['misses']} misses, "
+          f"{stats['uncacheable']} invalid not cached); {rejected} rejected by the input schema")
+
+    # Typical proposals, each submitted for several addresses in a shuffled stream
+    stream = [(development, with_address(case, rng))
+              for development in sepp_rules.RULE_SETS for case in build_typical_corpus(development)
+              for _ in range(5)]
+    rng.shuffle(stream)
+    timings = {}
+    for name, size in (("uncached", 0), ("cached", 4096)):
+        cache = AssessmentCache(size=size)
+        start = time.perf_counter()
+        for development, attributes in stream:
+            record, _ = SCHEMAS[development].validate(attributes)
+            cache.get_or_assess(development, record, assess)
+        timings[name] = (time.perf_counter() - start) / len(stream) * 1e6
+    print(f"{len(stream)} typical assessments: uncached {timings['uncached']:.1f} us, cached {timings['cached']:.1f} us "
+          f"per assessment, hit rate {cache.stats()['hit_rate']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
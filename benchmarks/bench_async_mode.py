@@ -0,0 +1,177 @@
+# Load test of /property-profile in WSGI (gunicorn sync worker) and ASGI (uvicorn) mode
+#
+# Starts a local stub of the geocoder and the six GIS layers that answers every request after an injected
+# latency, then runs the app in each mode with ONE worker pointed at the stub (GEOCODE_URL and the *_URL
+# layer overrides, scratch databases so every lookup misses the caches) and sends the same burst of
+# concurrent /property-profile requests for distinct addresses to each.  Reports the throughput, latency and
+# the most GIS requests the single worker had in flight at once (its concurrency):
+#   wsgi - gunicorn -k sync -w 1 ExemptAssessAPI:app   (one request at a time per worker)
+#   asgi - uvicorn --workers 1 ExemptAssessASGI:app    (requests interleaved on the event loop)
+# Needs gunicorn, uvicorn, starlette, aiohttp and a2wsgi.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_async_mode [requests] [concurrency] [latency ms]
+
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import aiohttp
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAYER_PATHS = {"ZONING_URL": "zoning", "HERITAGE_URL": "heritage", "FBL_URL": "fbl", "BUSHFIRE_URL": "bushfire",
+               "BIODIVERSITY_URL": "biodiversity", "FEATURESERVER_URL": "lot"}
+
+
+class StubGISHandler(BaseHTTPRequestHandler):
+    # Geocoder and layer query stand-in: a distinct location per address, one feature per layer
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    latency = 0.1
+    in_flight = 0
+    # Shared with the benchmark process (the stub runs in its own process, so its threads do not compete
+    # with the load generator for the GIL)
+    max_in_flight = None
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with StubGISHandler.lock:
+            StubGISHandler.in_flight += 1
+            StubGISHandler.max_in_flight.value = max(StubGISHandler.max_in_flight.value, StubGISHandler.in_flight)
+        try:
+            time.sleep(self.latency)
+            url = urlparse(self.path)
+            if url.path == "/geocode":
+                address = parse_qs(url.query)["SingleLine"][0]
+                number = int(address.split()[0])
+                body = {"candidates": [{"location": {"x": 146.9 + number * 1e-4, "y": -36.08}, "score": 100,
+                                        "address": address.upper()}]}
+            elif url.path == "/lot":
+                body = {"features": [{"attributes": {"AREA_SQM": 650}}]}
+            else:
+                body = {"features": [{"attributes": {"SYM_CODE": "R1", "Category": 1}}]}
+            payload = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        finally:
+            with StubGISHandler.lock:
+                StubGISHandler.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+class StubGISServer(ThreadingHTTPServer):
+    # A listen backlog for bursts of connections (the default of 5 drops them, costing a 1s SYN retry)
+    request_queue_size = 256
+    daemon_threads = True
+
+
+def serve_stub(port, latency, max_in_flight):
+    # Run the stub GIS server (the target of a separate process)
+    StubGISHandler.latency = latency
+    StubGISHandler.max_in_flight = max_in_flight
+    StubGISServer(("127.0.0.1", port), StubGISHandler).serve_forever()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_app(command, port, env, scratch):
+    # Start the app in a subprocess (in the scratch directory, so it has its own databases) and wait until it answers
+    process = subprocess.Popen(command, cwd=scratch, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(200):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/get-assessment-help/", timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError(f"{command[0]} did not start")
+
+
+async def burst(port, requests, concurrency, first_number):
+    # Send the requests with at most concurrency in flight, returning (elapsed seconds, latencies, failures)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    failures = 0
+
+    async def one(session, number):
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            async with session.get(f"http://127.0.0.1:{port}/property-profile",
+                                   params={"address": f"{number} Stub Street Albury"}) as resp:
+                body = await resp.json(content_type=None)
+            latencies.append(time.perf_counter() - start)
+            if resp.status != 200 or body.get("zoning") != "R1":
+                failures += 1
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=300)) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(one(client, first_number + i) for i in range(requests)))
+        return time.perf_counter() - start, sorted(latencies), failures
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    latency = (float(sys.argv[3]) if len(sys.argv) > 3 else 100) / 1000
+
+    stub_port = free_port()
+    max_in_flight = multiprocessing.Value("i", 0)
+    stub = multiprocessing.Process(target=serve_stub, args=(stub_port, latency, max_in_flight), daemon=True)
+    stub.start()
+    base = f"http://127.0.0.1:{stub_port}"
+
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        env = dict(os.environ, PYTHONPATH=REPO_ROOT, GEOCODE_URL=f"{base}/geocode", ARCGIS_API_KEY="stub",
+                   GIS_LAYERS_DB=os.path.join(scratch, "gis_layers.db"), RATE_LIMIT_DEFAULT="100000 per minute",
+                   REQUEST_TIMEOUT_SECONDS="300",
+                   **{name: f"{base}/{path}" for name, path in LAYER_PATHS.items()})
+        modes = {
+            "wsgi": ["gunicorn", "-k", "sync", "-w", "1", "--timeout", "300", "ExemptAssessAPI:app"],
+            "asgi": ["uvicorn", "--workers", "1", "--log-level", "warning", "ExemptAssessASGI:app"],
+        }
+        for number, (mode, command) in enumerate(modes.items()):
+            port = free_port()
+            command = command + (["-b", f"127.0.0.1:{port}"] if mode == "wsgi" else ["--port", str(port)])
+            # Separate databases per mode, so neither sees the other's cached profiles
+            mode_env = dict(env, GEOCODE_CACHE_DB=f"{mode}.db", PARCEL_DB=f"{mode}.db")
+            process = start_app(command, port, mode_env, scratch)
+            try:
+                max_in_flight.value = 0
+                results[mode] = asyncio.run(burst(port, requests, concurrency, number * requests)) + (max_in_flight.value,)
+            finally:
+                process.terminate()
+                process.wait(10)
+    stub.terminate()
+
+    print(f"{requests} /property-profile requests, {concurrency} concurrent, {latency * 1000:.0f} ms GIS latency, one worker")
+    for mode, (elapsed, latencies, failures, max_in_flight) in results.items():
+        print(f"{mode:<6}{requests / elapsed:>8.1f} req/s  median {statistics.median(latencies) * 1000:>7.0f} ms  "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:>7.0f} ms  "
+              f"GIS requests in flight {max_in_flight:>3}  failures {failures}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# Benchmark of the batch assessment endpoint against single assessments
+#
+# Posts the typical corpus from bench_rules (with some invalid and unsupported items added) to
+# /get-assessment-results/batch and checks every item gets the same context and result as posting it on its
+# own to /get-assessment-result/.  Then compares the end-to-end cost of N single POSTs with one POST of the
+# same N proposals, both including the database writes, using the Flask test client and a scratch database.
+# The batch assesses each item with the same compiled rules as a single request, so the difference is the
+# per-request overhead and the per-row commits.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_batch
+
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import sepp_rules
+from benchmarks.bench_rules import build_typical_corpus
+
+
+def best_time(function, repeat=5):
+    """ Best-of-repeat wall time of a call in seconds """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_endpoints(ExemptAssessAPI, cases, size=500):
+    """ End-to-end time per proposal for single POSTs versus one batch POST, in a scratch directory so the
+        assessments.db used is a throwaway copy """
+    client = ExemptAssessAPI.app.test_client()
+    cases = (cases * (size // len(cases) + 1))[:size]
+    with tempfile.TemporaryDirectory() as scratch, contextlib.redirect_stdout(io.StringIO()):
+        cwd = os.getcwd()
+        os.chdir(scratch)
+        try:
+            # Both timings include writing the queued log rows to the database
+            start = time.perf_counter()
+            for case in cases:
+                client.post("/get-assessment-result/", json=dict(case))
+            ExemptAssessAPI.ASSESSMENT_LOGGER.flush()
+            single = time.perf_counter() - start
+
+            start = time.perf_counter()
+            response = client.post("/get-assessment-results/batch", json=cases)
+            ExemptAssessAPI.ASSESSMENT_LOGGER.flush()
+            batch = time.perf_counter() - start
+        finally:
+            # Stop the log writer while its scratch database still exists
+            ExemptAssessAPI.ASSESSMENT_LOGGER.close()
+            os.chdir(cwd)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return single / size, batch / size
+
+
+def check_results(ExemptAssessAPI, cases):
+    """ Raise AssertionError unless every case gets the same context and result from the batch endpoint as
+        from the single assessment endpoint """
+    client = ExemptAssessAPI.app.test_client()
+    with tempfile.TemporaryDirectory() as scratch, contextlib.redirect_stdout(io.StringIO()):
+        cwd = os.getcwd()
+        os.chdir(scratch)
+        try:
+            expected = [client.post("/get-assessment-result/", json=case).get_json() for case in cases]
+            response = client.post("/get-assessment-results/batch", json=cases)
+            ExemptAssessAPI.ASSESSMENT_LOGGER.flush()
+        finally:
+            ExemptAssessAPI.ASSESSMENT_LOGGER.close()
+            os.chdir(cwd)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    for case, single, item in zip(cases, expected, response.get_json()["results"]):
+        if item["result"] != single:
+            raise AssertionError(f"Outcome mismatch for {case}\n{single}\n{item}")
+    return len(cases)
+
+
+def main():
+    os.environ.setdefault("RATE_LIMIT_VALIDATE", "1000000 per minute")
+    os.environ.setdefault("RATE_LIMIT_BATCH", "1000000 per minute")
+    os.environ.setdefault("BATCH_MAX_SIZE", "500")
+    # ExemptAssessAPI opens its database in the working directory, so import it from a scratch directory
+    cwd = os.getcwd()
+    os.chdir(tempfile.mkdtemp())
+    import ExemptAssessAPI
+    os.chdir(cwd)
+    typical = [case for development in sepp_rules.RULE_SETS for case in build_typical_corpus(development)]
+    odd = [{"development": "patio", "zoning": "R1"}, {"development": "boat"}, {"development": "shed", "area": "big"}]
+    checked = check_results(ExemptAssessAPI, (typical + odd)[-500:])
+    print(f"{checked} batch items match their single assessments")
+
+    print(f"{'':<10}{'items':>8}{'single us':>12}{'batch us':>12}{'speedup':>10}")
+    single, batch = bench_endpoints(ExemptAssessAPI, typical)
+    print(f"{'endpoint':<10}{500:>8}{single * 1e6:>12.0f}{batch * 1e6:>12.0f}{single / batch:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
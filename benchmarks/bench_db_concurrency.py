@@ -0,0 +1,105 @@
+# Concurrency benchmark for the assessment database
+#
+# Runs N threads in each of M processes, every worker doing a mix of inserts and recent-row reads
+# (as Assess() and /get-logging-db/ do), and reports throughput and "database is locked" errors for:
+#   before - a new connection per operation with the default rollback journal, re-running CREATE TABLE
+#            each time (how AssessmentDB worked originally)
+#   after  - AssessmentDB with persistent per-thread WAL connections
+# Each mode uses its own scratch database, as WAL mode is stored in the database file.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_db_concurrency [threads] [processes] [operations per worker]
+
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import assessment_db
+
+INPUT_JSON = '{"development": "shed", "zoning": "R1", "area": 12.0}'
+RESPONSE_JSON = '{"result": ["The proposed structure qualifies for exempt development."]}'
+READ_EVERY = 5
+
+
+def legacy_operation(db_path, read):
+    # One operation the way the original AssessmentDB did it: connect, create table, run, commit, close
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute(assessment_db.CREATE_TABLE_SQL)
+    conn.commit()
+    if read:
+        cursor.execute("SELECT id, timestamp, context, input_json, response_json FROM assessments ORDER BY timestamp DESC LIMIT ?", (10,))
+        cursor.fetchall()
+    else:
+        cursor.execute("INSERT INTO assessments (timestamp, context, input_json, response_json) VALUES (?, ?, ?, ?)",
+                       (assessment_db.aest_now(), "Exempt", INPUT_JSON, RESPONSE_JSON))
+        conn.commit()
+    cursor.close()
+    conn.close()
+
+
+def pooled_operation(db_path, read):
+    # One operation through AssessmentDB and its persistent per-thread connection
+    db = assessment_db.AssessmentDB(db_path)
+    if read:
+        db.get_recent_assessments(limit=10)
+    else:
+        db.save_assessment("Exempt", INPUT_JSON, RESPONSE_JSON)
+    db.close()
+
+
+def run_threads(mode, db_path, threads, operations, errors):
+    # Run the worker threads of one process, counting operations that failed with a locked database
+    operation = legacy_operation if mode == "before" else pooled_operation
+
+    def worker():
+        for index in range(operations):
+            try:
+                operation(db_path, index % READ_EVERY == 0)
+            except sqlite3.OperationalError:
+                with errors.get_lock():
+                    errors.value += 1
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+
+def run(mode, db_path, threads, processes, operations):
+    # Run all processes for a mode, returning (operations per second, errors)
+    errors = multiprocessing.Value("i", 0)
+    start = time.perf_counter()
+    workers = [multiprocessing.Process(target=run_threads, args=(mode, db_path, threads, operations, errors))
+               for _ in range(processes)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+    elapsed = time.perf_counter() - start
+    return threads * processes * operations / elapsed, errors.value
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    operations = int(sys.argv[3]) if len(sys.argv) > 3 else 250
+
+    print(f"{threads} threads x {processes} processes x {operations} operations (1 in {READ_EVERY} is a read)")
+    print(f"{'mode':<8}{'ops/s':>10}{'errors':>8}")
+    with tempfile.TemporaryDirectory() as scratch:
+        for mode in ("before", "after"):
+            db_path = os.path.join(scratch, f"{mode}.db")
+            # Create the database up front so both modes start from an existing, empty table
+            legacy_operation(db_path, True)
+            ops, errors = run(mode, db_path, threads, processes, operations)
+            print(f"{mode:<8}{ops:>10.0f}{errors:>8}")
+
+
+if __name__ == "__main__":
+    main()
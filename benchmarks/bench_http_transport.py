@@ -0,0 +1,112 @@
+# Benchmark of the pooled keep-alive transport against a new connection per lookup
+#
+# Starts a local stub geocode server (HTTPS with a throwaway self-signed certificate when the openssl
+# command is available, otherwise plain HTTP) that answers like findAddressCandidates, then times N
+# sequential lookups with:
+#   before - requests.get() per lookup, as GISProxy originally did (new TCP + TLS connection each time)
+#   after  - http_transport.HttpTransport (one pooled keep-alive connection)
+# The stub also fails every fifth request with a 503 to check the retry path.  The handshake saving
+# against the real ArcGIS service is larger, as each new connection also pays the network round trips.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_http_transport [lookups]
+
+import json
+import os
+import shutil
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from http_transport import HttpTransport
+
+CANDIDATES = json.dumps({"candidates": [{"location": {"x": 146.9, "y": -36.1}, "score": 100,
+                                        "address": "1 Stub Street, Albury"}]}).encode()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep the connection alive
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes, so without this Nagle's algorithm adds ~40ms to each response
+    disable_nagle_algorithm = True
+    fail_every = 0
+    count = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with StubHandler.lock:
+            StubHandler.count += 1
+            fail = StubHandler.fail_every and StubHandler.count % StubHandler.fail_every == 0
+        body = b'{"error": "busy"}' if fail else CANDIDATES
+        self.send_response(503 if fail else 200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(scratch):
+    # Start the stub server on a free port, returning (server, base URL)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    scheme = "http"
+    if shutil.which("openssl"):
+        cert, key = os.path.join(scratch, "cert.pem"), os.path.join(scratch, "key.pem")
+        subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=127.0.0.1",
+                        "-keyout", key, "-out", cert], check=True, capture_output=True)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = "https"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"{scheme}://127.0.0.1:{server.server_address[1]}/findAddressCandidates"
+
+
+def main():
+    lookups = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    params = {"SingleLine": "1 Stub Street, Albury", "f": "json", "token": "stub"}
+    warnings.simplefilter("ignore")   # unverified HTTPS to the self-signed stub
+
+    with tempfile.TemporaryDirectory() as scratch:
+        server, url = start_server(scratch)
+        try:
+            start = time.perf_counter()
+            for _ in range(lookups):
+                resp = requests.get(url, params=params, timeout=10, verify=False)
+                resp.raise_for_status()
+                resp.json()
+            before = time.perf_counter() - start
+
+            transport = HttpTransport(verify=False)
+            start = time.perf_counter()
+            for _ in range(lookups):
+                transport.get_json(url, params=params)
+            after = time.perf_counter() - start
+
+            # Every fifth response is a 503, which the transport retries with backoff
+            StubHandler.fail_every = 5
+            retrying = HttpTransport(verify=False, backoff_factor=0.001)
+            for _ in range(20):
+                retrying.get_json(url, params=params)
+            transport.close()
+            retrying.close()
+        finally:
+            server.shutdown()
+
+    print(f"{lookups} sequential lookups to a local {url.split(':')[0].upper()} stub")
+    print(f"{'before':<8}{before / lookups * 1e3:>10.3f} ms per lookup (new connection each time)")
+    print(f"{'after':<8}{after / lookups * 1e3:>10.3f} ms per lookup (pooled keep-alive)  {before / after:.1f}x")
+    print("retry   20 lookups with every fifth response a 503 all succeeded")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# JSON work per assessment: the old decode/copy/encode-three-times path against the single-encode path
+#
+# Replays the JSON handling of one /get-assessment-result/ request, given its body and assessed result, both ways:
+#   current  Flask's get_json (json.loads), attributes.copy() and list(full_result) for the log, jsonify of the
+#            response (sorted keys, ASCII escapes), then on the writer thread json.dumps of the input and of
+#            {"result": ...} and index_fields on the objects
+#   new      json_codec.loads, one encode of the full result that is the response body and, wrapped in
+#            {"result": ...}, the logged response, queued with the request body and the indexed fields; the
+#            writer stores the body and response bytes as they are and indexes the row from the fields
+# for the verbose and codes response formats, over the typical proposals of bench_rules.  The new path uses
+# json_codec's backend (orjson or msgspec when installed); run with JSON_BACKEND=json to measure the standard
+# library fallback.  Reports microseconds per assessment on the request thread, on the writer thread and in
+# total, and the peak memory allocated (tracemalloc) per assessment.  Both paths are first checked to give the
+# same response, log row and indexed fields.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_json_pipeline [--repeat N]
+
+import argparse
+import json
+import time
+import tracemalloc
+
+import ExemptAssessAPI as api
+import json_codec
+from assessment_db import index_fields, input_fields, reason_fields
+from assessment_logger import _json_text
+from benchmarks.bench_rules import LEGACY_CHECKS, build_typical_corpus
+
+
+def build_requests():
+    # (request body, development, full result, compact form) of each typical proposal, with an address
+    requests = []
+    for development in LEGACY_CHECKS:
+        for number, case in enumerate(build_typical_corpus(development)):
+            case = dict(case, address=f"{number} Smith Street Albury NSW 2640")
+            record, errors = api.SCHEMAS[development].validate(case)
+            if errors:
+                continue
+            context, full_result, codes, parameters = api.assess_rules(development, record)
+            compact = {"development": development, "context": context, "codes": codes, "parameters": parameters,
+                       "catalog_version": api.sepp_rules.RULES_VERSION}
+            requests.append((json.dumps(case).encode(), full_result, compact))
+    return requests
+
+
+# Request thread: (response body, log row) of each path
+
+def current_request(body, full_result, compact, response_format):
+    attributes = json.loads(body)
+    attributes_received = attributes.copy()
+    full_result = list(full_result)
+    payload = dict(compact, codes=list(compact["codes"])) if response_format == "codes" else full_result
+    response = (json.dumps(payload, separators=(",", ":"), sort_keys=True) + "\n").encode()
+    return response, (compact["context"], attributes_received, {"result": full_result})
+
+
+def new_request(body, full_result, compact, response_format):
+    attributes = json_codec.loads(body)
+    result_json = json_codec.dumps(full_result)
+    response = json_codec.dumps(compact) if response_format == "codes" else result_json
+    fields = (*input_fields(attributes), compact["codes"])
+    return response, (body, b'{"result":' + result_json + b'}', fields)
+
+
+# Writer thread: (input_json, response_json, indexed fields) of a log row
+
+def current_write(context, input_data, response_data):
+    return json.dumps(input_data), json.dumps(response_data), index_fields(context, input_data, response_data)
+
+
+def new_write(input_data, response_data, fields):
+    return _json_text(input_data), _json_text(response_data), reason_fields(*fields)
+
+
+PATHS = {"current": (current_request, current_write), "new": (new_request, new_write)}
+
+
+def check_paths(requests):
+    # Raise AssertionError unless both paths give the same response, log row and indexed fields
+    for body, full_result, compact in requests:
+        for response_format in ("verbose", "codes"):
+            outputs = {}
+            for name, (request, write) in PATHS.items():
+                response, row = request(body, full_result, compact, response_format)
+                input_json, response_json, fields = write(*row)
+                outputs[name] = (json.loads(response), json.loads(input_json), json.loads(response_json), fields)
+            assert outputs["current"] == outputs["new"], (body, response_format)
+
+
+def best_time(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure(requests, request, write, response_format, repeat):
+    # (request us, writer us, peak KiB) per assessment
+    rows = [request(body, full_result, compact, response_format)[1] for body, full_result, compact in requests]
+    request_seconds = best_time(lambda: [request(body, full_result, compact, response_format)
+                                         for body, full_result, compact in requests], repeat)
+    write_seconds = best_time(lambda: [write(*row) for row in rows], repeat)
+
+    peak = 0
+    tracemalloc.start()
+    for body, full_result, compact in requests:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        write(*request(body, full_result, compact, response_format)[1])
+        peak += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    count = len(requests)
+    return request_seconds / count * 1e6, write_seconds / count * 1e6, peak / count / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs over the proposals (the best is kept)")
+    args = parser.parse_args()
+
+    requests = build_requests()
+    check_paths(requests)
+    print(f"{len(requests)} typical proposals, new path with the {json_codec.BACKEND} backend; "
+          f"us and peak KiB allocated per assessment")
+    print(f"{'format':<9}{'path':<9}{'request':>10}{'writer':>10}{'total':>10}{'peak KiB':>10}")
+    for response_format in ("verbose", "codes"):
+        for name, (request, write) in PATHS.items():
+            request_us, write_us, peak = measure(requests, request, write, response_format, args.repeat)
+            print(f"{response_format:<9}{name:<9}{request_us:>10.2f}{write_us:>10.2f}{request_us + write_us:>10.2f}"
+                  f"{peak:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
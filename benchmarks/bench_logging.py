@@ -0,0 +1,116 @@
+# Per-request cost of the old print() banners against the structured, queued log event
+#
+# Replays the console output of one assessment request both ways, one request every REQUEST_INTERVAL seconds
+# (500 requests a second), with stdout going to a pipe as it does under gunicorn with journald:
+#   print   - the banners, address and result lines Assess() used to print (unbuffered, as with
+#             PYTHONUNBUFFERED=1, so each print is a write() on the request thread)
+#   logging - one "assessment" event through structured_logging's queue handler; a listener thread writes
+#             the JSON line to the same pipe
+# against a pipe reader that keeps up, and one that falls behind (reading 4 KiB every 20 ms), where writes
+# block once the pipe buffer is full.  Reports the time spent on the request thread per request, and
+# for the logging path the records dropped because the queue was full.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_logging [requests]
+
+import io
+import logging
+import statistics
+import subprocess
+import sys
+import time
+
+from structured_logging import LogPipeline
+
+SEPARATOR = "-" * 116
+RESULT = [
+    "The proposed structure DOES NOT qualify for exempt development for the following reasons:",
+    "The shed area exceeds 20m² in a residential zone. Please refer to the State Environmental Planning Policy legislation for area restrictions:",
+    "https://legislation.nsw.gov.au/view/html/inforce/current/epi-2008-0572#sec.2.18 (1)(b)",
+    "The shed is closer than 900mm to a boundary. Please refer to the State Environmental Planning Policy legislation for setback restrictions:",
+    "https://legislation.nsw.gov.au/view/html/inforce/current/epi-2008-0572#sec.2.18 (1)(f)(i)",
+]
+
+# Time between requests
+REQUEST_INTERVAL = 0.002
+
+# Pipe readers: one that keeps up, one that reads 4 KiB every 20 ms (200 KiB/s, less than the print path writes)
+READERS = {
+    "fast reader": "import sys\nwhile sys.stdin.buffer.read1(65536): pass",
+    "slow reader": "import sys, time\nwhile sys.stdin.buffer.read1(4096): time.sleep(0.02)",
+}
+
+
+def print_request(address):
+    # The console output of one assessment before structured logging
+    print("\n🔧 Shed Development Check")
+    print(SEPARATOR)
+    print(f"📋 Assessment Result for : {address}")
+    print(SEPARATOR)
+    for line in RESULT:
+        print(line)
+    print(SEPARATOR)
+    print("################ Subject to conditions listed in SEPP Division 2 - Exempt and Complying Development ################")
+    print(SEPARATOR)
+    print("\n")
+
+
+def wait_until(moment):
+    # Sleep (releasing the GIL, as a worker waiting for its next request does) until a moment
+    time.sleep(max(0.0, moment - time.perf_counter()))
+
+
+def run(mode, reader, requests):
+    # Per-request times on this thread in microseconds, the time to drain the output and the records dropped
+    consumer = subprocess.Popen([sys.executable, "-c", READERS[reader]], stdin=subprocess.PIPE)
+    stream = io.TextIOWrapper(consumer.stdin, encoding="utf-8", write_through=True)
+    timings = []
+    dropped = 0
+    begin = time.perf_counter()
+    if mode == "print":
+        stdout, sys.stdout = sys.stdout, stream
+        try:
+            for number in range(requests):
+                wait_until(begin + number * REQUEST_INTERVAL)
+                start = time.perf_counter()
+                print_request(f"{number} Smith Street Albury NSW 2640")
+                timings.append(time.perf_counter() - start)
+        finally:
+            sys.stdout = stdout
+        drain_start = time.perf_counter()
+    else:
+        pipeline = LogPipeline(stream)
+        log = logging.getLogger("bench_logging")
+        log.propagate = False
+        log.handlers = [pipeline.handler]
+        log.setLevel(logging.INFO)
+        pipeline.start()
+        for number in range(requests):
+            wait_until(begin + number * REQUEST_INTERVAL)
+            start = time.perf_counter()
+            log.info("assessment", extra={"development": "shed", "context": "Non-Exempt",
+                                          "codes": ["SHED_AREA_RESIDENTIAL", "SHED_BOUNDARY_RESIDENTIAL"]})
+            timings.append(time.perf_counter() - start)
+        drain_start = time.perf_counter()
+        pipeline.stop()
+        dropped = pipeline.stats()["dropped"]
+    stream.close()
+    consumer.wait()
+    drain = time.perf_counter() - drain_start
+    timings = sorted(value * 1e6 for value in timings)
+    return timings, drain, dropped
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    print(f"{requests} requests, stdout to a pipe; time on the request thread per request")
+    print(f"{'reader':<13}{'path':<9}{'mean us':>9}{'median us':>11}{'p99 us':>9}{'max us':>10}{'drain s':>9}{'dropped':>9}")
+    for reader in READERS:
+        for mode in ("print", "logging"):
+            timings, drain, dropped = run(mode, reader, requests)
+            print(f"{reader:<13}{mode:<9}{statistics.mean(timings):>9.1f}{statistics.median(timings):>11.1f}"
+                  f"{timings[int(len(timings) * 0.99)]:>9.1f}{timings[-1]:>10.0f}{drain:>9.2f}{dropped:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+# Per-request cost of the rate limit storage: memory:// vs the shared sqlite:// storage vs a Redis stand-in
+#
+# Replays what Flask-Limiter does for one request to a route with one limit (VALIDATE_LIMIT, LOGGING_LIMIT or
+# HELP_LIMIT): a fixed-window hit, then the window stats for the X-RateLimit headers, from a spread of client IPs.
+# Storages:
+#   memory://            per-process counters (the default; not shared between workers)
+#   sqlite://            rate_limit_storage.SQLiteStorage on a temporary file
+#   redis stand-in       a minimal RESP server in its own process with a client storage making the same round
+#                        trips per operation as limits' RedisStorage (one for the increment script, one each for
+#                        GET and TTL), for the cost of a Redis hop without a Redis server.  --redis-url measures
+#                        a real one instead (needs the redis package)
+# Then checks that a limit holds across processes: WORKERS processes each try to use the whole of a
+# "10 per 30 seconds" limit for one client, which should let 10 requests through in total with a shared storage
+# (and 10 per process with memory://).
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_rate_limit_storage [--requests N] [--workers N] [--redis-url redis://localhost:6379]
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import tempfile
+import time
+
+from limits import parse
+from limits.storage import Storage, storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+
+import rate_limit_storage  # registers sqlite://
+
+LIMITS = {
+    "validate": os.getenv("RATE_LIMIT_VALIDATE", "10 per 30 seconds"),
+    "logging": os.getenv("RATE_LIMIT_LOGGING", "10 per minute"),
+    "help": os.getenv("RATE_LIMIT_HELP", "30 per minute"),
+}
+ROUTES = {"validate": "/get-assessment-result/", "logging": "/get-logging-db/", "help": "/shed-help"}
+CLIENTS = 200
+
+
+# Redis stand-in: RESP over TCP, one event loop in its own process, as a Redis server is
+
+def _encode(value):
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    data = str(value).encode()
+    return b"$%d\r\n%s\r\n" % (len(data), data)
+
+
+def _serve_resp(port, ready):
+    counters = {}  # key -> [count, expires]
+
+    def command(args):
+        name = args[0].upper()
+        now = time.time()
+        if name == b"INCREX":
+            # The increment script: add to the counter, starting a new window when it has expired
+            key, expiry, amount = args[1], int(args[2]), int(args[3])
+            entry = counters.get(key)
+            if entry is None or entry[1] <= now:
+                entry = counters[key] = [0, now + expiry]
+            entry[0] += amount
+            return entry[0]
+        entry = counters.get(args[1]) if len(args) > 1 else None
+        live = entry is not None and entry[1] > now
+        if name == b"GET":
+            return entry[0] if live else None
+        if name == b"TTL":
+            return int(entry[1] - now) if live else -2
+        if name == b"DEL":
+            return 1 if counters.pop(args[1], None) else 0
+        if name == b"FLUSHDB":
+            counters.clear()
+            return "OK"
+        return "PONG"
+
+    async def client(reader, writer):
+        try:
+            while True:
+                header = await reader.readline()
+                if not header:
+                    break
+                args = []
+                for _ in range(int(header[1:])):
+                    length = int((await reader.readline())[1:])
+                    args.append((await reader.readexactly(length + 2))[:-2])
+                writer.write(_encode(command(args)))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        writer.close()
+
+    async def main():
+        server = await asyncio.start_server(client, "127.0.0.1", port)
+        ready.set()
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(main())
+
+
+class RedisStandInStorage(Storage):
+    # Client of the stand-in: one blocking round trip per operation over a TCP_NODELAY socket
+    STORAGE_SCHEME = ["redis-standin"]
+
+    def __init__(self, uri=None, wrap_exceptions=False, **options):
+        host, _, port = uri.split("://", 1)[1].partition(":")
+        self.sock = socket.create_connection((host, int(port)))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb")
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return OSError
+
+    def _call(self, *args):
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self.sock.sendall(b"".join(parts))
+        line = self.reader.readline()
+        if line[:1] == b"$":
+            length = int(line[1:])
+            return None if length < 0 else self.reader.read(length + 2)[:-2].decode()
+        return int(line[1:]) if line[:1] == b":" else line[1:].strip().decode()
+
+    def incr(self, key, expiry, amount=1):
+        return self._call("INCREX", key, expiry, amount)
+
+    def get(self, key):
+        return int(self._call("GET", key) or 0)
+
+    def get_expiry(self, key):
+        return time.time() + max(self._call("TTL", key), 0)
+
+    def check(self):
+        return self._call("PING") == "PONG"
+
+    def reset(self):
+        self._call("FLUSHDB")
+
+    def clear(self, key):
+        self._call("DEL", key)
+
+
+def start_resp_server():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    ready = multiprocessing.Event()
+    process = multiprocessing.Process(target=_serve_resp, args=(port, ready), daemon=True)
+    process.start()
+    ready.wait(10)
+    return process, f"redis-standin://127.0.0.1:{port}"
+
+
+# Benchmarks
+
+def per_request(uri, requests):
+    # Microseconds per request (a hit and the window stats), best of three runs, for each limit
+    limiter = FixedWindowRateLimiter(storage_from_string(uri))
+    results = {}
+    for name, limit in LIMITS.items():
+        item, route = parse(limit), ROUTES[name]
+        best = float("inf")
+        for _ in range(3):
+            limiter.storage.reset()
+            start = time.perf_counter()
+            for i in range(requests):
+                client = f"10.0.0.{i % CLIENTS}"
+                limiter.hit(item, client, route)
+                limiter.get_window_stats(item, client, route)
+            best = min(best, time.perf_counter() - start)
+        results[name] = best / requests * 1e6
+    return results
+
+
+def _use_limit(uri, limit, attempts, start, allowed):
+    limiter = FixedWindowRateLimiter(storage_from_string(uri))
+    item = parse(limit)
+    start.wait()
+    passed = sum(limiter.hit(item, "203.0.113.7", "/get-assessment-result/") for _ in range(attempts))
+    with allowed.get_lock():
+        allowed.value += passed
+
+
+def shared_limit(uri, workers, limit="10 per 30 seconds"):
+    # Requests let through in total when every worker process tries to use the whole limit for one client
+    item = parse(limit)
+    start = multiprocessing.Event()
+    allowed = multiprocessing.Value("i", 0)
+    processes = [multiprocessing.Process(target=_use_limit, args=(uri, limit, item.amount, start, allowed))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    start.set()
+    for process in processes:
+        process.join()
+    return allowed.value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20000, help="requests per limit and storage")
+    parser.add_argument("--workers", type=int, default=4, help="processes sharing one limit")
+    parser.add_argument("--redis-url", help="measure a real Redis server instead of the stand-in")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        sqlite_uri = f"sqlite://{os.path.join(directory, 'rate-limits.db')}"
+        server = None
+        if args.redis_url:
+            redis_uri = args.redis_url
+        else:
+            server, redis_uri = start_resp_server()
+        storages = {"memory://": "memory://", "sqlite://": sqlite_uri,
+                    "redis" if args.redis_url else "redis stand-in": redis_uri}
+        try:
+            print(f"{args.requests} requests per limit from {CLIENTS} clients, us per request (hit + window stats)")
+            print(f"{'storage':<16}" + "".join(f"{name:>12}" for name in LIMITS))
+            for label, uri in storages.items():
+                results = per_request(uri, args.requests)
+                print(f"{label:<16}" + "".join(f"{results[name]:>12.1f}" for name in LIMITS))
+            print(f"\n{args.workers} processes each trying 10 requests against one 10 per 30 seconds limit:")
+            for label, uri in storages.items():
+                print(f"  {label:<16} {shared_limit(uri, args.workers):>3} let through")
+        finally:
+            if server is not None:
+                server.terminate()
+
+
+if __name__ == "__main__":
+    main()
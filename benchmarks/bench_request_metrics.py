@@ -0,0 +1,62 @@
+# Per-request overhead of the stage timers, counters and Server-Timing header
+#
+# Replays the instrumentation one /get-assessment-result/ request goes through (begin_request(), the queue,
+# assess, normalise, rules and log stages, the outcome and response counters and end_request() building the
+# Server-Timing header) around no work, so the time per request is the cost of the metrics alone.  Also
+# reports the cost of a single stage timer, and of rendering /metrics.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_request_metrics [requests]
+
+import sys
+import time
+
+from request_metrics import RequestMetrics
+
+
+def instrumented_request(metrics):
+    started = metrics.begin_request()
+    metrics.record("queue", 0.0001)
+    with metrics.stage("assess"):
+        with metrics.stage("normalise"):
+            pass
+        with metrics.stage("rules"):
+            pass
+    metrics.count("assessments", "Exempt")
+    with metrics.stage("log"):
+        pass
+    metrics.count("responses", "/get-assessment-result/", 200)
+    return metrics.end_request("/get-assessment-result/", started)
+
+
+def per_call(fn, count):
+    # Best of five runs, in microseconds per call
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(count):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return best / count * 1e6
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    metrics = RequestMetrics()
+    baseline = per_call(lambda: None, requests)
+    request = per_call(lambda: instrumented_request(metrics), requests) - baseline
+
+    def one_stage():
+        with metrics.stage("rules"):
+            pass
+    stage = per_call(one_stage, requests) - baseline
+    start = time.perf_counter()
+    text = metrics.render()
+    render = (time.perf_counter() - start) * 1e3
+    print(f"{requests} requests: {request:.2f} us of metrics per request, {stage:.2f} us per stage timer")
+    print(f"Server-Timing: {instrumented_request(metrics)}")
+    print(f"/metrics: {len(text.splitlines())} lines rendered in {render:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+# Benchmark of the table-driven SEPP rule engine against the original hand-written rule functions
+#
+# Builds a branch-coverage corpus and a typical corpus (compliant proposals with one or two inputs
+# changed) for each development type and runs every case through both assessment paths:
+#   legacy   the original normalisation, rule function and format_result() (legacy_rules)
+#   engine   the path Assess() serves requests with: the input schema (SCHEMAS[development].validate),
+#            the compiled rules (sepp_rules.evaluate_record) and the output from the reason catalog
+#            (sepp_rules.expand)
+# Every case the schema accepts must give the same (context, full result) both ways; Invalid outcomes only
+# need to agree on being Invalid, as they now list the field errors.  Then reports the per-assessment cost
+# of both paths over the accepted cases.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_rules
+
+import functools
+import itertools
+import os
+import random
+import tempfile
+import time
+
+import sepp_rules
+from benchmarks import legacy_rules
+from input_schemas import SCHEMAS
+
+LEGACY_CHECKS = {
+    "patio": legacy_rules.patio_check,
+    "shed": legacy_rules.shed_check,
+    "retain": legacy_rules.retain_wall_check,
+}
+
+# Compliant proposals used as the base of the typical corpus
+COMPLIANT = {
+    "patio": {
+        "development": "patio", "zoning": "R1", "structure_type": "new", "height_existing": 0.0,
+        "material_quality": "yes", "same_size": "yes", "heritage": "no", "foreshore": "no", "area": 20.0,
+        "land_size": 600.0, "total_structures_area": 40.0, "wall_height": "no", "behind_building_line": "yes",
+        "boundary_distance": 1500.0, "metal": "yes", "reflective": "yes", "floor_height": 300.0, "roof": "yes",
+        "overhang": 300.0, "attached": "yes", "above_gutter": "no", "fascia_connection": "yes",
+        "engineer_spec": "yes", "roof_height": 2.7, "stormwater": "yes", "drainage": "no", "bushfire": "no",
+        "distance_dwelling": 2.0, "non_combustible": "yes",
+    },
+    "shed": {
+        "development": "shed", "zoning": "R1", "heritage": "no", "heritage_conserv": "no", "rear_yard": "yes",
+        "foreshore": "no", "sensitive_area": "no", "area": 12.0, "height": 2.4, "boundary_distance": 1000.0,
+        "building_line": "yes", "shipping_container": "no", "stormwater": "yes", "metal": "yes",
+        "reflective": "yes", "bushfire": "no", "distance_dwelling": 6.0, "non_combustible": "yes",
+        "adjacent_building": "no", "interfere": "no", "habitable": "no", "easement": "no", "services": "no",
+        "existing_structures": "no",
+    },
+    "retain": {
+        "development": "retain", "zoning": "R1", "heritage": "no", "foreshore": "no", "flood_control_lot": "no",
+        "cut_or_fill": 400.0, "boundary_distance": 1500.0, "heritage_conserv": "no", "rear_yard": "yes",
+        "waterbody_within_40m": "no", "sediment_transfer": "no", "height": 500.0, "distance_other": 3000.0,
+        "distance_easement": 1500.0, "stormwater": "yes", "fill_depth": 100.0, "fill_area": 20.0,
+        "land_size": 600.0, "imported_fill": "no", "venm": "yes", "fill_volume": 10.0,
+    },
+}
+
+# Extra values that are not thresholds in the rule tables but drive branches in the legacy code
+EXTRA_VALUES = {
+    "zoning": ["B1", "", "r1"],
+    "structure_type": ["new"],
+}
+
+
+def attribute_values(rules):
+    """ Boundary values for every attribute used by a rule table, keyed by attribute name """
+    values = {}
+    for rule in rules:
+        for attribute, comparator, threshold in rule["when"]:
+            options = values.setdefault(attribute, [])
+            if comparator in ("in", "not in"):
+                options.extend(threshold)
+            elif comparator == "has":
+                continue
+            elif isinstance(threshold, str):
+                options.extend([threshold, "yes", "no"])
+            elif isinstance(threshold, tuple):
+                options.extend([0.0, 1.0, 24.0, 25.0, 26.0, 75.0, 76.0, 250.0, 251.0, 1000.0])
+            else:
+                options.extend([0.0, threshold - 1.0, float(threshold), threshold + 1.0])
+    # Make sure relative thresholds have a useful range for the attribute they depend on
+    for rule in rules:
+        for attribute, comparator, threshold in rule["when"]:
+            if isinstance(threshold, tuple) and comparator not in ("in", "not in"):
+                values.setdefault(threshold[0], []).extend([100.0, 299.0, 300.0, 301.0, 1000.0])
+    for attribute, extra in EXTRA_VALUES.items():
+        if attribute in values:
+            values[attribute].extend(extra)
+    return {attribute: list(dict.fromkeys(options)) for attribute, options in values.items()}
+
+
+def build_corpus(development, random_cases=5000, seed=1234):
+    """ Build a branch-coverage corpus of attribute dicts for a development type """
+    rules = sepp_rules.RULE_SETS[development][1]
+    values = attribute_values(rules)
+    rng = random.Random(seed)
+
+    def random_case():
+        case = {attribute: rng.choice(options) for attribute, options in values.items()}
+        case["development"] = development
+        return case
+
+    corpus = [random_case() for _ in range(random_cases)]
+
+    # Every combination of boundary values for the attributes of each rule, on several random bases
+    for rule in rules:
+        attributes = list(dict.fromkeys(condition[0] for condition in rule["when"]))
+        for threshold in (condition[2] for condition in rule["when"]):
+            if isinstance(threshold, tuple) and isinstance(threshold[0], str) and threshold[0] in values:
+                attributes.append(threshold[0])
+        for combination in itertools.product(*(values[attribute] for attribute in attributes)):
+            for _ in range(3):
+                case = random_case()
+                case.update(zip(attributes, combination))
+                corpus.append(case)
+
+    # Missing attributes and invalid (non-numeric) values
+    for attribute in values:
+        for _ in range(20):
+            case = random_case()
+            del case[attribute]
+            corpus.append(case)
+            case = random_case()
+            case[attribute] = "no" if not isinstance(case[attribute], str) else 1.0
+            corpus.append(case)
+
+    return corpus
+
+
+def build_typical_corpus(development):
+    """ Compliant proposals with one or two attributes moved to a boundary value, which is closer to
+        real requests than the branch-coverage corpus (most fail on zero to two clauses) """
+    base = COMPLIANT[development]
+    values = attribute_values(sepp_rules.RULE_SETS[development][1])
+    corpus = [dict(base)]
+    for attribute, options in values.items():
+        for value in options:
+            case = dict(base)
+            case[attribute] = value
+            corpus.append(case)
+    for (first, first_options), (second, second_options) in itertools.combinations(values.items(), 2):
+        for first_value, second_value in zip(first_options, second_options):
+            case = dict(base)
+            case[first] = first_value
+            case[second] = second_value
+            corpus.append(case)
+    return corpus
+
+
+def time_per_call(function, corpus, repeat=5):
+    """ Best-of-repeat mean time per call in microseconds """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for case in corpus:
+            function(case)
+        best = min(best, time.perf_counter() - start)
+    return best / len(corpus) * 1e6
+
+
+def engine_assess(development, case):
+    """ (context, full result) of a case on the engine path, or None if the input schema rejects it """
+    record, errors = SCHEMAS[development].validate(case)
+    if errors:
+        return None
+    codes, missing = sepp_rules.evaluate_record(development, record)
+    if missing is not None:
+        return "Invalid", None
+    return sepp_rules.outcome(codes), sepp_rules.expand(development, codes)
+
+
+def main():
+    # ExemptAssessAPI opens its database in the working directory, so import it from a scratch directory
+    os.chdir(tempfile.mkdtemp())
+    from ExemptAssessAPI import format_result
+
+    def legacy_assess(legacy_check, case):
+        result, relevant_sections, context = legacy_check(legacy_rules.normalise_attributes(dict(case)))
+        return context, format_result(result, relevant_sections, context)
+
+    print(f"{'development':<12}{'corpus':<10}{'cases':>8}{'rejected':>10}{'legacy us':>12}{'engine us':>12}"
+          f"{'speedup':>10}")
+    for development, legacy_check in LEGACY_CHECKS.items():
+        corpora = {"coverage": build_corpus(development), "typical": build_typical_corpus(development)}
+
+        for name, corpus in corpora.items():
+            # Outcomes must be identical for every case the input schema accepts
+            accepted = []
+            for case in corpus:
+                actual = engine_assess(development, case)
+                if actual is None:
+                    continue
+                expected = legacy_assess(legacy_check, case)
+                if (actual[0] == "Invalid") != (expected[0] == "Invalid") or actual[0] != "Invalid" and actual != expected:
+                    raise AssertionError(f"Outcome mismatch for {development}: {case}\n{expected}\n{actual}")
+                accepted.append(case)
+
+            legacy_us = time_per_call(functools.partial(legacy_assess, legacy_check), accepted)
+            engine_us = time_per_call(functools.partial(engine_assess, development), accepted)
+            print(f"{development:<12}{name:<10}{len(accepted):>8}{len(corpus) - len(accepted):>10}{legacy_us:>12.2f}"
+                  f"{engine_us:>12.2f}{legacy_us / engine_us:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
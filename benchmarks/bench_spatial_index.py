@@ -0,0 +1,119 @@
+# Benchmark and check of the offline GIS layer index with synthetic polygons
+#
+# Builds a synthetic zoning layer over an LGA-sized extent (a grid of irregular quadrilaterals, some with a
+# hole and some split into multipolygons), ingests it from a GeoJSON file into a scratch store, then:
+#   - checks spatial_index lookups against a brute-force point-in-polygon scan for random points,
+#   - reports the time per lookup of the index and of the brute-force scan,
+#   - re-ingests the layer with new attributes and checks a running index reloads it without a restart.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.bench_spatial_index [grid size]
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import spatial_index
+
+# Rough extent of the Albury LGA in longitude/latitude
+EXTENT = (146.80, -36.15, 147.10, -35.95)
+
+
+def synthetic_layer(size, seed=1234, zone_prefix="R"):
+    """ A GeoJSON FeatureCollection of size x size irregular polygons tiling EXTENT.  Every seventh cell
+        has a hole and every eleventh is split into a two-part multipolygon """
+    rng = random.Random(seed)
+    min_x, min_y, max_x, max_y = EXTENT
+    step_x, step_y = (max_x - min_x) / size, (max_y - min_y) / size
+    # Jittered grid corners shared by neighbouring cells, so the cells tile the extent with no gaps
+    corners = [[(min_x + i * step_x + (rng.uniform(-0.3, 0.3) * step_x if 0 < i < size else 0),
+                 min_y + j * step_y + (rng.uniform(-0.3, 0.3) * step_y if 0 < j < size else 0))
+                for j in range(size + 1)] for i in range(size + 1)]
+    features = []
+    for i in range(size):
+        for j in range(size):
+            a, b, c, d = corners[i][j], corners[i + 1][j], corners[i + 1][j + 1], corners[i][j + 1]
+            number = i * size + j
+            if number % 11 == 0:
+                # Two triangles as a multipolygon
+                geometry = {"type": "MultiPolygon", "coordinates": [[[a, b, c, a]], [[a, c, d, a]]]}
+            else:
+                rings = [[a, b, c, d, a]]
+                if number % 7 == 0:
+                    cx, cy = sum(p[0] for p in (a, b, c, d)) / 4, sum(p[1] for p in (a, b, c, d)) / 4
+                    hx, hy = step_x / 8, step_y / 8
+                    rings.append([(cx - hx, cy - hy), (cx - hx, cy + hy), (cx + hx, cy + hy), (cx + hx, cy - hy), (cx - hx, cy - hy)])
+                geometry = {"type": "Polygon", "coordinates": rings}
+            features.append({"type": "Feature", "geometry": geometry,
+                             "properties": {"SYM_CODE": f"{zone_prefix}{number % 5 + 1}", "cell": number}})
+    return {"type": "FeatureCollection", "features": features}
+
+
+def brute_force(features, x, y):
+    """ Properties of the first feature containing the point, testing every feature """
+    for properties, polygons in features:
+        if spatial_index.polygons_contain(polygons, x, y):
+            return properties
+    return None
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    rng = random.Random(42)
+    points = [(rng.uniform(EXTENT[0], EXTENT[2]), rng.uniform(EXTENT[1], EXTENT[3])) for _ in range(2000)]
+
+    with tempfile.TemporaryDirectory() as scratch:
+        db_path = os.path.join(scratch, "gis_layers.db")
+        geojson_path = os.path.join(scratch, "zoning.geojson")
+        layer = synthetic_layer(size)
+        with open(geojson_path, "w") as f:
+            json.dump(layer, f)
+
+        start = time.perf_counter()
+        count = spatial_index.ingest("zoning", geojson_path, db_path)
+        ingest_seconds = time.perf_counter() - start
+
+        index = spatial_index.SpatialIndex(db_path, check_seconds=0)
+        start = time.perf_counter()
+        index.reload()
+        load_seconds = time.perf_counter() - start
+
+        # Every lookup must match the brute-force scan
+        features = [(feature["properties"], spatial_index._polygons(feature["geometry"])) for feature in layer["features"]]
+        expected = [brute_force(features, x, y) for x, y in points]
+        actual = [index.find("zoning", x, y) for x, y in points]
+        if actual != expected:
+            mismatches = [(point, e, a) for point, e, a in zip(points, expected, actual) if e != a]
+            raise AssertionError(f"{len(mismatches)} lookups differ from the brute-force scan, e.g. {mismatches[0]}")
+        holes = sum(1 for properties in expected if properties is None)
+
+        start = time.perf_counter()
+        for x, y in points:
+            index.find("zoning", x, y)
+        index_us = (time.perf_counter() - start) / len(points) * 1e6
+        sample = points[:200]
+        start = time.perf_counter()
+        for x, y in sample:
+            brute_force(features, x, y)
+        brute_us = (time.perf_counter() - start) / len(sample) * 1e6
+
+        # A new ingest is picked up by a running index on its next lookup (check_seconds=0 here)
+        with open(geojson_path, "w") as f:
+            json.dump(synthetic_layer(size, zone_prefix="RU"), f)
+        spatial_index.ingest("zoning", geojson_path, db_path)
+        x, y = next(point for point, properties in zip(points, expected) if properties is not None)
+        assert index.covers("zoning", x, y) and index.find("zoning", x, y)["SYM_CODE"].startswith("RU"), "index did not reload"
+
+    stats = index.stats()["zoning"]
+    print(f"{count} synthetic polygons, R-tree height {stats['height']}; ingest {ingest_seconds:.2f}s, load {load_seconds:.2f}s")
+    print(f"{len(points)} random lookups match the brute-force scan ({holes} fall in holes)")
+    print(f"{'index':<12}{index_us:>10.1f} us per lookup")
+    print(f"{'brute force':<12}{brute_us:>10.1f} us per lookup  ({brute_us / index_us:.0f}x slower)")
+    print("reload      re-ingested layer picked up by the running index")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+# End-to-end load test of the app against a local ArcGIS stand-in
+#
+# For sizing gunicorn workers and REQUEST_TIMEOUT_SECONDS from measurements.  Starts:
+#   - the stub geocoder and GIS layer (MapServer query) server of bench_async_mode in its own process, answering
+#     after a latency drawn from a distribution and failing a given fraction of requests (with an HTTP status,
+#     or by not answering for --gis-hang seconds, past the app's read timeout),
+#   - the app, under the Flask development server (the default) or gunicorn, in a scratch directory (its own
+#     databases) with GEOCODE_URL and the *_URL layer overrides pointed at the stub,
+# then sends a mix of /get-assessment-result/, /geocode and /get-logging-db/ requests (and /property-profile if
+# it is given a weight) for --duration seconds, either
+#   open loop    Poisson arrivals at --rate requests per second, whether or not earlier requests have finished
+#                (how independent users arrive; the backlog grows once the app falls behind), or
+#   closed loop  --users clients each sending their next request when the last one answers (after an
+#                exponential think time of mean --think ms).
+# Requests come from --clients loopback addresses (127.0.0.2 up), so per-client rate limits apply as they would to
+# separate users.  With --rate-limits off (the default) every RATE_LIMIT_* is raised out of the way to measure
+# capacity.  With --rate-limits app the app's limits apply, including to the sampler below.
+#
+# Reports latency percentiles, throughput and the 429 / 503 / 504 rates per route. It also reports the
+# assessment scheduler's queue depth over time, sampled every --sample-interval seconds from
+# /get-scheduler-stats/. Under gunicorn, each sample comes from whichever worker answers it.
+# Needs aiohttp, and gunicorn for --server gunicorn.  Settings the app reads from the environment
+# (SCHEDULER_WORKERS, HTTP_READ_TIMEOUT, ...) are passed through.
+#
+# Usage (from the repository root), e.g.:
+#   python -m benchmarks.load_test --server gunicorn --workers 4 --rate 40 --duration 60
+#   python -m benchmarks.load_test --users 20 --mix assess=1 --gis-latency lognormal:150:0.6 --gis-errors 503=0.05
+#   python -m benchmarks.load_test --timeout 10 --gis-errors timeout=0.02 -o report.json
+
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+from benchmarks.bench_async_mode import (LAYER_PATHS, REPO_ROOT, StubGISHandler, StubGISServer, free_port,
+                                         start_app)
+from benchmarks.bench_rules import COMPLIANT, build_typical_corpus
+
+ROUTES = {
+    "assess": "/get-assessment-result/",
+    "geocode": "/geocode",
+    "logging": "/get-logging-db/",
+    "profile": "/property-profile",
+}
+RATE_LIMIT_SETTINGS = ("RATE_LIMIT_DEFAULT", "RATE_LIMIT_VALIDATE", "RATE_LIMIT_LOGGING", "RATE_LIMIT_HELP",
+                       "RATE_LIMIT_BATCH", "RATE_LIMIT_SUGGEST")
+
+
+def parse_weights(text):
+    # {"name": float} from "name=value,name=value"
+    weights = {}
+    for item in text.split(","):
+        name, _, value = item.partition("=")
+        if name.strip():
+            weights[name.strip()] = float(value)
+    return weights
+
+
+def latency_distribution(spec):
+    # A function drawing a latency in seconds from "fixed:MS", "uniform:LOW_MS:HIGH_MS" or "lognormal:MEDIAN_MS:SIGMA"
+    kind, *values = spec.split(":")
+    values = [float(value) for value in values]
+    if kind == "fixed":
+        return lambda: values[0] / 1000
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(math.log(values[0]), values[1]) / 1000
+    raise ValueError(f"Unknown latency distribution {spec!r}")
+
+
+class LoadStubHandler(StubGISHandler):
+    # The bench_async_mode stub with a latency distribution and injected failures
+    latency_distribution = None
+    # [(status code or "timeout", probability)]
+    errors = ()
+    hang = 30.0
+
+    def do_GET(self):
+        draw = random.random()
+        failure = None
+        for kind, probability in self.errors:
+            if draw < probability:
+                failure = kind
+                break
+            draw -= probability
+        self.latency = self.latency_distribution()
+        if failure == "timeout":
+            # Hold the request past the app's read timeout, then answer as usual
+            self.latency += self.hang
+        elif failure is not None:
+            time.sleep(self.latency)
+            payload = json.dumps({"error": {"code": int(failure), "message": "Injected failure"}}).encode()
+            self.send_response(int(failure))
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+        super().do_GET()
+
+
+def serve_load_stub(port, latency, errors, hang, max_in_flight):
+    # Run the stub server (the target of a separate process)
+    LoadStubHandler.latency_distribution = staticmethod(latency_distribution(latency))
+    LoadStubHandler.errors = [(kind, probability) for kind, probability in parse_weights(errors).items()]
+    LoadStubHandler.hang = hang
+    StubGISHandler.max_in_flight = max_in_flight
+    StubGISServer(("127.0.0.1", port), LoadStubHandler).serve_forever()
+
+
+class LoadGenerator:
+    def __init__(self, port, mix, clients, client_timeout, addresses, seed):
+        self.base = f"http://127.0.0.1:{port}"
+        self.routes = list(mix)
+        self.weights = [mix[name] for name in self.routes]
+        self.clients = clients
+        self.timeout = aiohttp.ClientTimeout(total=client_timeout)
+        self.addresses = addresses
+        self.rng = random.Random(seed)
+        self.cases = [case for development in COMPLIANT for case in build_typical_corpus(development)]
+        # (seconds from the start, route, status, latency seconds); status is "timeout" or "error" without a response
+        self.results = []
+        self.sessions = []
+        self.started = None
+
+    async def open(self):
+        # One session per client address, so the app sees separate clients
+        for number in range(self.clients):
+            connector = aiohttp.TCPConnector(limit=0, local_addr=(f"127.0.0.{2 + number % 250}", 0))
+            self.sessions.append(aiohttp.ClientSession(connector=connector, timeout=self.timeout))
+        self.started = time.perf_counter()
+
+    async def close(self):
+        for session in self.sessions:
+            await session.close()
+
+    def next_request(self):
+        # (route, method, path, request options) of a request drawn from the mix
+        route = self.rng.choices(self.routes, self.weights)[0]
+        address = f"{self.rng.randint(1, self.addresses)} Stub Street Albury NSW 2640"
+        if route == "assess":
+            return route, "POST", ROUTES[route], {"json": dict(self.rng.choice(self.cases), address=address)}
+        if route in ("geocode", "profile"):
+            return route, "GET", ROUTES[route], {"params": {"address": address}}
+        return route, "GET", ROUTES[route], {}
+
+    async def send(self, session):
+        route, method, path, options = self.next_request()
+        start = time.perf_counter()
+        try:
+            async with session.request(method, self.base + path, **options) as response:
+                await response.read()
+                status = response.status
+        except asyncio.TimeoutError:
+            status = "timeout"
+        except aiohttp.ClientError:
+            status = "error"
+        self.results.append((start - self.started, route, status, time.perf_counter() - start))
+
+    async def open_loop(self, rate, duration):
+        # Poisson arrivals at rate per second for duration seconds; each request runs in its own task
+        tasks = set()
+        moment = 0.0
+        number = 0
+        while True:
+            moment += self.rng.expovariate(rate)
+            if moment >= duration:
+                break
+            await asyncio.sleep(max(0.0, moment - (time.perf_counter() - self.started)))
+            task = asyncio.create_task(self.send(self.sessions[number % len(self.sessions)]))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            number += 1
+        if tasks:
+            await asyncio.wait(tasks)
+
+    async def closed_loop(self, users, think, duration):
+        # users clients sending requests back to back (after the think time) for duration seconds
+        async def user(session):
+            while time.perf_counter() - self.started < duration:
+                await self.send(session)
+                if think:
+                    await asyncio.sleep(self.rng.expovariate(1000 / think))
+        await asyncio.gather(*(user(self.sessions[number % len(self.sessions)]) for number in range(users)))
+
+
+async def sample_scheduler(port, interval, samples, started, stop):
+    # Poll /get-scheduler-stats/ every interval seconds until stop is set
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
+        while not stop.is_set():
+            moment = time.perf_counter() - started
+            try:
+                async with session.get(f"http://127.0.0.1:{port}/get-scheduler-stats/") as response:
+                    stats = await response.json(content_type=None) if response.status == 200 else None
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                stats = None
+            samples.append((moment, stats))
+            try:
+                await asyncio.wait_for(stop.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def run_traffic(args, port, mix):
+    generator = LoadGenerator(port, mix, max(args.clients, args.users or 0), args.client_timeout, args.addresses,
+                              args.seed)
+    await generator.open()
+    samples = []
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_scheduler(port, args.sample_interval, samples, generator.started, stop))
+    try:
+        if args.users:
+            await generator.closed_loop(args.users, args.think, args.duration)
+        else:
+            await generator.open_loop(args.rate, args.duration)
+    finally:
+        elapsed = time.perf_counter() - generator.started
+        stop.set()
+        await sampler
+        await generator.close()
+    return generator.results, samples, elapsed
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else None
+
+
+def summarise(results, elapsed):
+    # Per-route (and overall) request count, throughput, latency percentiles in ms and status rates
+    summary = {}
+    for route in sorted({route for _, route, _, _ in results}) + ["all"]:
+        rows = [row for row in results if route in ("all", row[1])]
+        statuses = {}
+        for _, _, status, _ in rows:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        latencies = sorted(latency * 1000 for _, _, status, latency in rows if isinstance(status, int))
+        summary[route] = {
+            "requests": len(rows),
+            "throughput": len(rows) / elapsed,
+            "p50_ms": percentile(latencies, 0.5),
+            "p95_ms": percentile(latencies, 0.95),
+            "p99_ms": percentile(latencies, 0.99),
+            "mean_ms": statistics.mean(latencies) if latencies else None,
+            "statuses": statuses,
+            "rate_429": statuses.get("429", 0) / len(rows),
+            "rate_503": statuses.get("503", 0) / len(rows),
+            "rate_504": statuses.get("504", 0) / len(rows),
+        }
+    return summary
+
+
+def queue_timeline(samples):
+    # [(seconds, queue depth, running, rejected, timed out)] from the scheduler samples that were answered
+    return [(round(moment, 1), stats["queue_depth"], stats["running"], stats["rejected"], stats["timed_out"])
+            for moment, stats in samples if stats]
+
+
+def print_report(args, mix, summary, timeline, samples, max_in_flight):
+    server = (f"gunicorn ({args.workers} {args.worker_class} workers"
+              + (f", {args.threads} threads" if args.worker_class == "gthread" else "") + ")"
+              if args.server == "gunicorn" else "Flask development server")
+    traffic = (f"closed loop, {args.users} users, think {args.think:g} ms" if args.users
+               else f"open loop, {args.rate:g} req/s")
+    print(f"{server}, REQUEST_TIMEOUT_SECONDS={args.timeout}; {traffic} for {args.duration:g} s; "
+          f"mix {', '.join(f'{name}={weight:g}' for name, weight in mix.items())}")
+    print(f"GIS stub latency {args.gis_latency}, errors {args.gis_errors or 'none'}; "
+          f"at most {max_in_flight} GIS requests in flight")
+    print(f"{'route':<10}{'requests':>9}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'429':>8}{'503':>8}{'504':>8}  other statuses")
+
+    def number(value):
+        return f"{value:>9.1f}" if value is not None else f"{'-':>9}"
+
+    for route, row in summary.items():
+        other = {status: count for status, count in row["statuses"].items() if status not in ("200", "429", "503", "504")}
+        print(f"{route:<10}{row['requests']:>9}{row['throughput']:>8.1f}{number(row['p50_ms'])}{number(row['p95_ms'])}"
+              f"{number(row['p99_ms'])}{row['rate_429']:>8.1%}{row['rate_503']:>8.1%}{row['rate_504']:>8.1%}  "
+              f"{', '.join(f'{status}: {count}' for status, count in sorted(other.items())) or '-'}")
+
+    unanswered = sum(1 for _, stats in samples if not stats)
+    print(f"Scheduler queue over time ({len(timeline)} samples"
+          + (f", {unanswered} not answered, e.g. rate limited" if unanswered else "") + "):")
+    if timeline:
+        # At most 20 rows: the deepest queue in each slice of the run
+        step = max(1, math.ceil(len(timeline) / 20))
+        print(f"{'t (s)':>8}{'depth':>7}{'running':>9}{'rejected':>10}{'timed out':>11}")
+        for start in range(0, len(timeline), step):
+            chunk = timeline[start:start + step]
+            deepest = max(chunk, key=lambda sample: sample[1])
+            print(f"{chunk[0][0]:>8.1f}{deepest[1]:>7}{deepest[2]:>9}{chunk[-1][3]:>10}{chunk[-1][4]:>11}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the app against a local ArcGIS stand-in.")
+    parser.add_argument("--server", choices=("flask", "gunicorn"), default="flask", help="how to run the app")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers (default 2)")
+    parser.add_argument("--worker-class", default="sync", help="gunicorn worker class (default sync)")
+    parser.add_argument("--threads", type=int, default=1, help="threads per gunicorn gthread worker")
+    parser.add_argument("--timeout", type=int, default=int(os.getenv("REQUEST_TIMEOUT_SECONDS", 30)),
+                        help="REQUEST_TIMEOUT_SECONDS for the app (default 30)")
+    parser.add_argument("--rate", type=float, default=20, help="open loop arrivals per second (default 20)")
+    parser.add_argument("--users", type=int, help="closed loop: number of users (instead of --rate)")
+    parser.add_argument("--think", type=float, default=0, help="closed loop mean think time in ms (default 0)")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of traffic (default 30)")
+    parser.add_argument("--mix", default="assess=0.7,geocode=0.25,logging=0.05",
+                        help="route weights: assess, geocode, logging, profile (default assess=0.7,geocode=0.25,logging=0.05)")
+    parser.add_argument("--clients", type=int, default=50, help="client addresses the requests come from (default 50)")
+    parser.add_argument("--addresses", type=int, default=5000,
+                        help="distinct street numbers in geocoded addresses, i.e. the geocode cache working set")
+    parser.add_argument("--rate-limits", choices=("off", "app"), default="off",
+                        help="off: raise every RATE_LIMIT_* out of the way; app: the app's limits apply")
+    parser.add_argument("--gis-latency", default="lognormal:120:0.5",
+                        help="stub latency: fixed:MS, uniform:LOW:HIGH or lognormal:MEDIAN:SIGMA (default lognormal:120:0.5)")
+    parser.add_argument("--gis-errors", default="",
+                        help="stub failures as status=fraction, or timeout=fraction for no answer, e.g. 503=0.02,timeout=0.01")
+    parser.add_argument("--gis-hang", type=float, default=30, help="seconds a 'timeout' failure holds the request")
+    parser.add_argument("--client-timeout", type=float, help="client timeout in seconds (default REQUEST_TIMEOUT_SECONDS + 30)")
+    parser.add_argument("--sample-interval", type=float, default=1, help="seconds between scheduler samples")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("-o", "--output", help="also write the report (with every sample) to this JSON file")
+    args = parser.parse_args()
+    args.client_timeout = args.client_timeout or args.timeout + 30
+    mix = {name: weight for name, weight in parse_weights(args.mix).items() if weight > 0}
+    unknown = set(mix) - set(ROUTES)
+    if unknown:
+        parser.error(f"unknown routes in --mix: {', '.join(sorted(unknown))}")
+    try:
+        latency_distribution(args.gis_latency)
+        failures = parse_weights(args.gis_errors)
+        if any(kind != "timeout" and not kind.isdigit() for kind in failures):
+            raise ValueError(args.gis_errors)
+    except (ValueError, IndexError):
+        parser.error("invalid --gis-latency or --gis-errors")
+
+    stub_port = free_port()
+    max_in_flight = multiprocessing.Value("i", 0)
+    stub = multiprocessing.Process(target=serve_load_stub, daemon=True,
+                                   args=(stub_port, args.gis_latency, args.gis_errors, args.gis_hang, max_in_flight))
+    stub.start()
+    base = f"http://127.0.0.1:{stub_port}"
+    with tempfile.TemporaryDirectory() as scratch:
+        env = dict(os.environ, PYTHONPATH=REPO_ROOT, GEOCODE_URL=f"{base}/geocode", ARCGIS_API_KEY="stub",
+                   GIS_LAYERS_DB=os.path.join(scratch, "gis_layers.db"), REQUEST_TIMEOUT_SECONDS=str(args.timeout),
+                   LOG_LEVEL=os.getenv("LOG_LEVEL", "WARNING"),
+                   **{name: f"{base}/{path}" for name, path in LAYER_PATHS.items()})
+        if args.rate_limits == "off":
+            env.update({name: "1000000 per minute" for name in RATE_LIMIT_SETTINGS})
+        port = free_port()
+        if args.server == "gunicorn":
+            command = ["gunicorn", "-c", os.path.join(REPO_ROOT, "gunicorn.conf.py"), "-w", str(args.workers),
+                       "-k", args.worker_class, "--threads", str(args.threads), "--timeout", str(args.timeout + 30),
+                       "-b", f"127.0.0.1:{port}", "ExemptAssessAPI:app"]
+        else:
+            command = [sys.executable, "-m", "flask", "--app", "ExemptAssessAPI", "run", "--port", str(port)]
+        process = start_app(command, port, env, scratch)
+        try:
+            results, samples, elapsed = asyncio.run(run_traffic(args, port, mix))
+        finally:
+            process.terminate()
+            process.wait(30)
+    stub.terminate()
+
+    summary = summarise(results, elapsed)
+    timeline = queue_timeline(samples)
+    print_report(args, mix, summary, timeline, samples, max_in_flight.value)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"settings": vars(args), "summary": summary, "queue": timeline,
+                       "max_gis_in_flight": max_in_flight.value}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
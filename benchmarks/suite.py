@@ -0,0 +1,293 @@
+# Micro-benchmark suite for the assessment, logging and geocode paths, with JSON baselines
+#
+# The other benchmarks here each compare one change with what it replaced.  This suite tracks the hot paths over
+# time instead, so a regression shows up before it reaches production:
+#   assess.<development>       Assess() throughput (assessments/s), uncached, over the seeded branch-coverage and
+#                              typical corpora of bench_rules.  Each corpus is first checked to execute every line of
+#                              the original patio_check, shed_check and retain_wall_check (legacy_rules.py)
+#   assess.cached              Assess() throughput for typical proposals resubmitted for other addresses
+#   db.save_assessment         AssessmentDB.save_assessment() inserts per second (one transaction each)
+#   db.save_assessments        rows per second inserted in batches of 200, as the write-behind logger commits them
+#   logging_db.<rows>.newest   /get-logging-db/ time to render the newest page (100 rows) of a log of <rows> rows
+#   logging_db.<rows>.middle   the same for a page from the middle of the log (?before_id=)
+#   geocode.uncached           GISProxy.geocode_address() lookups per second against a local stub ArcGIS server
+#   geocode.cached             the same for addresses already in the geocode cache
+#
+# Results are compared with a baseline JSON file (benchmarks/baseline.json unless --baseline is given).  Timings
+# depend on the machine, so save the baseline with --save on the machine that runs the comparison.  A benchmark
+# worse than its baseline by more than the threshold is a regression, and the run exits with status 1.  The
+# threshold is BENCH_REGRESSION_THRESHOLD (default 0.2, i.e. 20%), and BENCH_THRESHOLDS sets it for benchmarks by
+# name prefix, e.g. "geocode=0.5,logging_db=0.3".
+#
+# Usage (from the repository root):
+#   python -m benchmarks.suite                       # run and compare with the baseline
+#   python -m benchmarks.suite --save                # run and save the results as the baseline
+#   python -m benchmarks.suite --only assess,db      # only the benchmarks with these name prefixes
+#   python -m benchmarks.suite --rows 1000,100000    # log sizes for /get-logging-db/ (default 1k, 100k and 1M)
+
+import argparse
+import dis
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer
+
+from benchmarks.bench_http_transport import StubHandler
+from benchmarks.bench_rules import LEGACY_CHECKS, build_corpus, build_typical_corpus
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+REGRESSION_THRESHOLD = float(os.getenv("BENCH_REGRESSION_THRESHOLD", 0.2))
+THRESHOLDS = os.getenv("BENCH_THRESHOLDS", "")
+LOG_ROWS = (1000, 100000, 1000000)
+
+# Timed runs of each benchmark; the best is kept, as it is the least disturbed by other work on the machine
+REPEAT = 5
+# Seed of the attribute generators
+SEED = 1234
+
+
+def result(value, unit, higher_is_better):
+    return {"value": value, "unit": unit, "higher_is_better": higher_is_better}
+
+
+def best_time(function, repeat=REPEAT):
+    # Shortest of repeat runs of function(), in seconds
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def check_coverage(development, corpus):
+    # Raise AssertionError unless the corpus executes every line of the original check function
+    code = LEGACY_CHECKS[development].__code__
+    lines = {line for _, line in dis.findlinestarts(code) if line is not None} - {code.co_firstlineno}
+    executed = set()
+
+    def trace_lines(frame, event, arg):
+        if event == "line":
+            executed.add(frame.f_lineno)
+        return trace_lines
+
+    def trace_calls(frame, event, arg):
+        return trace_lines if frame.f_code is code else None
+
+    sys.settrace(trace_calls)
+    try:
+        for case in corpus:
+            LEGACY_CHECKS[development](dict(case))
+    finally:
+        sys.settrace(None)
+    missing = sorted(lines - executed)
+    if missing:
+        raise AssertionError(f"The {development} corpus does not execute lines {missing} of "
+                             f"{LEGACY_CHECKS[development].__name__}")
+
+
+def bench_assess(api):
+    # Assess() throughput for each development type (uncached), and for resubmitted proposals (cached)
+    results = {}
+    size = api.ASSESSMENT_CACHE.size
+    api.ASSESSMENT_CACHE.size = 0
+    try:
+        for development in LEGACY_CHECKS:
+            corpus = build_corpus(development, random_cases=2000, seed=SEED) + build_typical_corpus(development)
+            check_coverage(development, corpus)
+            seconds = best_time(lambda: [api.Assess(dict(case)) for case in corpus])
+            results[f"assess.{development}"] = result(len(corpus) / seconds, "assessments/s", True)
+    finally:
+        api.ASSESSMENT_CACHE.size = size
+    # Typical proposals, each submitted for five addresses
+    stream = [dict(case, address=f"{number} Smith Street Albury NSW 2640")
+              for development in LEGACY_CHECKS for case in build_typical_corpus(development) for number in range(5)]
+    api.ASSESSMENT_CACHE.clear()
+    seconds = best_time(lambda: [api.Assess(dict(case)) for case in stream])
+    results["assess.cached"] = result(len(stream) / seconds, "assessments/s", True)
+    return results
+
+
+def sample_rows(api, count, start=0):
+    # count log rows (timestamp, context, input_json, response_json, development, zoning) of typical proposals,
+    # one second apart from the start'th
+    outcomes = []
+    for development in LEGACY_CHECKS:
+        for case in build_typical_corpus(development)[:50]:
+            context, full_result, _, _ = api.assess_rules(development, api.SCHEMAS[development].validate(case)[0])
+            outcomes.append((context, json.dumps(case), json.dumps({"result": list(full_result)}), development,
+                             case["zoning"]))
+    first = datetime(2025, 1, 1, tzinfo=timezone(timedelta(hours=10)))
+    for number in range(start, start + count):
+        yield ((first + timedelta(seconds=number)).isoformat(),) + outcomes[number % len(outcomes)]
+
+
+def bench_database(api):
+    # AssessmentDB inserts per second, one row per transaction and in batches
+    from assessment_db import AssessmentDB, close_connection
+    path = os.path.abspath("bench_insert.db")
+    db = AssessmentDB(path)
+    rows = [(context, input_json, response_json)
+            for _, context, input_json, response_json, _, _ in sample_rows(api, 1000)]
+    single = best_time(lambda: [db.save_assessment(*row) for row in rows])
+    batches = [rows[start:start + 200] for start in range(0, len(rows), 200)]
+    batched = best_time(lambda: [db.save_assessments(batch) for batch in batches])
+    db.close()
+    close_connection(path)
+    return {"db.save_assessment": result(len(rows) / single, "rows/s", True),
+            "db.save_assessments": result(len(rows) / batched, "rows/s", True)}
+
+
+def bench_logging_db(api, sizes):
+    # /get-logging-db/ time to render the newest page and a page from the middle, as the log grows to each size
+    from assessment_db import AssessmentDB, INSERT_SQL
+    api.limiter.enabled = False
+    api.ASSESSMENT_LOGGER.flush()
+    db = AssessmentDB()
+    client = api.app.test_client()
+    results = {}
+    for size in sorted(sizes):
+        count = db.conn.execute("SELECT COUNT(*) FROM assessments").fetchone()[0]
+        rows = sample_rows(api, max(0, size - count), start=count)
+        while True:
+            chunk = [row for _, row in zip(range(50000), rows)]
+            if not chunk:
+                break
+            db.cursor.executemany(INSERT_SQL, chunk)
+            db.conn.commit()
+        last_id = db.conn.execute("SELECT MAX(id) FROM assessments").fetchone()[0]
+        for page, url in (("newest", "/get-logging-db/"), ("middle", f"/get-logging-db/?before_id={last_id // 2}")):
+            response = client.get(url)
+            assert response.status_code == 200 and response.get_data().count(b"<tr") > 100, url
+            seconds = best_time(lambda: client.get(url).get_data())
+            results[f"logging_db.{size}.{page}"] = result(seconds * 1000, "ms", False)
+    api.limiter.enabled = True
+    return results
+
+
+def bench_geocode(lookups=300):
+    # GISProxy.geocode_address() against a local stub of the ArcGIS geocode service (plain HTTP)
+    import GISProxy
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url, GISProxy.GEOCODE_URL = GISProxy.GEOCODE_URL, f"http://127.0.0.1:{server.server_address[1]}/findAddressCandidates"
+    try:
+        addresses = iter(f"{number} Stub Street, Albury NSW 2640" for number in range(REPEAT * lookups))
+        uncached = best_time(lambda: [GISProxy.geocode_address(next(addresses)) for _ in range(lookups)])
+        repeated = [f"{number} Stub Street, Albury NSW 2640" for number in range(lookups)]
+        cached = best_time(lambda: [GISProxy.geocode_address(address) for address in repeated])
+    finally:
+        GISProxy.GEOCODE_URL = url
+        server.shutdown()
+    return {"geocode.uncached": result(lookups / uncached, "lookups/s", True),
+            "geocode.cached": result(lookups / cached, "lookups/s", True)}
+
+
+def parse_thresholds(text):
+    # {"name prefix": threshold} from "prefix=0.5,prefix=0.3"
+    thresholds = {}
+    for item in text.split(","):
+        prefix, _, value = item.partition("=")
+        if prefix.strip() and value.strip():
+            thresholds[prefix.strip()] = float(value)
+    return thresholds
+
+
+def compare(results, baseline, threshold, thresholds):
+    # Print each result against its baseline, returning the names of the regressions
+    regressions = []
+    print(f"{'benchmark':<32}{'value':>14}  {'unit':<14}{'baseline':>14}{'change':>9}  status")
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None or not previous["value"]:
+            print(f"{name:<32}{current['value']:>14.2f}  {current['unit']:<14}{'-':>14}{'':>9}  new")
+            continue
+        change = (current["value"] - previous["value"]) / previous["value"]
+        worse = -change if current["higher_is_better"] else change
+        limit = next((value for prefix, value in sorted(thresholds.items(), key=lambda item: -len(item[0]))
+                      if name.startswith(prefix)), threshold)
+        status = "REGRESSION" if worse > limit else "ok"
+        if status != "ok":
+            regressions.append(name)
+        print(f"{name:<32}{current['value']:>14.2f}  {current['unit']:<14}{previous['value']:>14.2f}{change:>+9.1%}  {status}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the micro-benchmark suite and compare it with a baseline.")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON file (default benchmarks/baseline.json)")
+    parser.add_argument("--save", action="store_true", help="save the results as the baseline instead of comparing")
+    parser.add_argument("--only", help="comma-separated benchmark name prefixes to run (assess, db, logging_db, geocode)")
+    parser.add_argument("--rows", default=",".join(map(str, LOG_ROWS)),
+                        help="comma-separated log sizes for the /get-logging-db/ benchmark")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="fraction worse than the baseline counted as a regression (default 0.2)")
+    parser.add_argument("-o", "--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+    baseline_path = os.path.abspath(args.baseline)
+    output_path = os.path.abspath(args.output) if args.output else None
+    only = [prefix.strip() for prefix in args.only.split(",")] if args.only else None
+
+    # The application opens its databases in the working directory and logs each assessment, so run it in a
+    # scratch directory with the console log discarded
+    os.chdir(tempfile.mkdtemp())
+    from structured_logging import configure_logging
+    configure_logging(stream=open(os.devnull, "w"))
+    import ExemptAssessAPI as api
+
+    benchmarks = {
+        "assess": lambda: bench_assess(api),
+        "db": lambda: bench_database(api),
+        "logging_db": lambda: bench_logging_db(api, [int(rows) for rows in args.rows.split(",")]),
+        "geocode": bench_geocode,
+    }
+    results = {}
+    for name, benchmark in benchmarks.items():
+        if only is None or any(name.startswith(prefix) or prefix.startswith(name) for prefix in only):
+            start = time.perf_counter()
+            results.update(benchmark())
+            print(f"{name}: {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    if only is not None:
+        results = {name: value for name, value in results.items() if any(name.startswith(prefix) for prefix in only)}
+
+    document = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "results": results,
+    }
+    if output_path:
+        with open(output_path, "w") as f:
+            json.dump(document, f, indent=2)
+
+    if args.save:
+        # Keep the baselines of benchmarks that were not run this time
+        if os.path.exists(baseline_path):
+            with open(baseline_path) as f:
+                document["results"] = {**json.load(f)["results"], **results}
+        with open(baseline_path, "w") as f:
+            json.dump(document, f, indent=2)
+        compare(results, {}, args.threshold, {})
+        print(f"Saved the baseline to {baseline_path}")
+        return 0
+
+    baseline = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            baseline = json.load(f)["results"]
+    else:
+        print(f"No baseline at {baseline_path}; run with --save to create one")
+    regressions = compare(results, baseline, args.threshold, parse_thresholds(THRESHOLDS))
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+# Two-tier cache for ArcGIS geocode results
+#
+# Within the LGA the same few thousand addresses are geocoded again and again, and every ArcGIS call costs
+# latency and geocode credits.  Lookups go through:
+#   1. a bounded in-process LRU (per gunicorn worker) with a TTL, then
+#   2. the geocode_cache table in the SQLite database, shared by all workers, then
+#   3. ArcGIS, with the result written to both tiers.
+# Both tiers are keyed by a normalised address (case, punctuation, whitespace and street type
+# abbreviations such as St/Street), so "12 Smith St, Albury" and "12 smith street albury" share an entry.
+# "No candidates found" results are cached with a much shorter TTL; request errors are never cached.
+#
+# The cache can be warmed from the addresses already in the assessment log (from the repository root):
+#   python geocode_cache.py warm [--limit 500] [--db assessments.db]
+
+import argparse
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from assessment_db import get_connection
+from json_codec import dumps_text, loads
+
+log = logging.getLogger(__name__)
+
+# Cache settings
+GEOCODE_CACHE_SIZE = int(os.getenv("GEOCODE_CACHE_SIZE", 10000))
+GEOCODE_CACHE_TTL_SECONDS = float(os.getenv("GEOCODE_CACHE_TTL_SECONDS", 30 * 24 * 3600))
+GEOCODE_NEGATIVE_TTL_SECONDS = float(os.getenv("GEOCODE_NEGATIVE_TTL_SECONDS", 3600))
+GEOCODE_CACHE_DB = os.getenv("GEOCODE_CACHE_DB", "assessments.db")
+
+# The result returned by geocode_address() when ArcGIS has no match for the address
+NO_CANDIDATES = {"error": "No candidates found"}
+
+CREATE_GEOCODE_CACHE_SQL = """
+    CREATE TABLE IF NOT EXISTS geocode_cache (
+        address_key TEXT PRIMARY KEY,   -- normalised address
+        result_json TEXT NOT NULL,      -- geocode_address() result
+        expires_at REAL NOT NULL        -- Unix time the entry expires
+    ) WITHOUT ROWID
+"""
+SELECT_GEOCODE_SQL = "SELECT result_json, expires_at FROM geocode_cache WHERE address_key = ?"
+UPSERT_GEOCODE_SQL = "INSERT OR REPLACE INTO geocode_cache (address_key, result_json, expires_at) VALUES (?, ?, ?)"
+PURGE_GEOCODE_SQL = "DELETE FROM geocode_cache WHERE expires_at <= ?"
+
+# Street type and other common abbreviations, expanded so both spellings give the same key
+ABBREVIATIONS = {
+    "st": "street", "rd": "road", "ave": "avenue", "av": "avenue", "dr": "drive", "ct": "court",
+    "crt": "court", "pl": "place", "cres": "crescent", "cr": "crescent", "hwy": "highway", "pde": "parade",
+    "cl": "close", "tce": "terrace", "ln": "lane", "blvd": "boulevard", "cct": "circuit", "cir": "circuit",
+    "esp": "esplanade", "gr": "grove", "gdns": "gardens", "sq": "square", "wy": "way", "mt": "mount",
+    "nth": "north", "sth": "south", "e": "east", "w": "west", "n": "north", "s": "south",
+}
+_SEPARATORS = re.compile(r"[\s,.;]+")
+
+
+def normalise_address(address):
+    # Cache key for an address: lowercase words without punctuation, with abbreviations expanded
+    words = _SEPARATORS.split(address.lower().strip())
+    return " ".join(ABBREVIATIONS.get(word, word) for word in words if word)
+
+
+class GeocodeCache:
+    def __init__(self, db_path=GEOCODE_CACHE_DB, size=GEOCODE_CACHE_SIZE,
+                 ttl=GEOCODE_CACHE_TTL_SECONDS, negative_ttl=GEOCODE_NEGATIVE_TTL_SECONDS):
+        self.db_path = db_path
+        self.size = size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # address key -> (expires_at, result), least recently used first
+        self.entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._schema_ready = set()
+        # Counters reported by stats()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _connection(self):
+        # This thread's connection to the shared cache database, creating the table once per process
+        conn = get_connection(self.db_path)
+        if os.getpid() not in self._schema_ready:
+            conn.execute(CREATE_GEOCODE_CACHE_SQL)
+            conn.commit()
+            self._schema_ready.add(os.getpid())
+        return conn
+
+    def _remember(self, key, expires_at, result):
+        # Add an entry to the in-process LRU, evicting the least recently used entries beyond the size limit
+        with self._lock:
+            self.entries[key] = (expires_at, result)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, address):
+        # Return a copy of the cached result for an address, or None if neither tier has an unexpired entry
+        key = normalise_address(address)
+        now = time.time()
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self.entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return dict(entry[1])
+                del self.entries[key]
+                self.expirations += 1
+
+        try:
+            row = self._connection().execute(SELECT_GEOCODE_SQL, (key,)).fetchone()
+        except Exception as error:
+            # The disk tier is an optimisation, so a database problem is treated as a miss
+            log.warning("Geocode cache read failed: %s", error)
+            row = None
+        if row is not None and row[1] > now:
+            result = loads(row[0])
+            self._remember(key, row[1], result)
+            self.disk_hits += 1
+            return dict(result)
+
+        self.misses += 1
+        return None
+
+    def put(self, address, result):
+        # Cache a geocode result in both tiers; "No candidates found" gets the short negative TTL
+        key = normalise_address(address)
+        expires_at = time.time() + (self.negative_ttl if result == NO_CANDIDATES else self.ttl)
+        self._remember(key, expires_at, dict(result))
+        try:
+            conn = self._connection()
+            conn.execute(UPSERT_GEOCODE_SQL, (key, dumps_text(result), expires_at))
+            conn.commit()
+        except Exception as error:
+            log.warning("Geocode cache write failed: %s", error)
+
+    def get_or_fetch(self, address, fetch):
+        # Return the cached result for an address, or call fetch(address) and cache its result.  fetch raises
+        # on request errors, which are passed on to the caller and not cached
+        result = self.get(address)
+        if result is None:
+            result = fetch(address)
+            self.put(address, result)
+        return result
+
+    async def get_or_fetch_async(self, address, fetch):
+        # get_or_fetch() for the ASGI app, where fetch is a coroutine function.  The cache lookups run inline
+        # as they are an in-memory lookup or a local SQLite primary key read
+        result = self.get(address)
+        if result is None:
+            result = await fetch(address)
+            self.put(address, result)
+        return result
+
+    def purge_expired(self):
+        # Delete expired entries from the disk tier, returning the number deleted
+        conn = self._connection()
+        deleted = conn.execute(PURGE_GEOCODE_SQL, (time.time(),)).rowcount
+        conn.commit()
+        return deleted
+
+    def stats(self):
+        # Hit, miss and eviction counters for monitoring
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_entries": len(self.entries),
+            "memory_size": self.size,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else None,
+        }
+
+
+def logged_addresses(db_path="assessments.db"):
+    # Distinct addresses in the assessment log, most recently assessed first
+    conn = get_connection(db_path)
+    rows = conn.execute("""
+        SELECT json_extract(input_json, '$.address') AS address, MAX(id)
+        FROM assessments
+        WHERE json_valid(input_json) AND trim(ifnull(json_extract(input_json, '$.address'), '')) != ''
+        GROUP BY address
+        ORDER BY MAX(id) DESC
+    """).fetchall()
+    return [address for address, _ in rows if isinstance(address, str)]
+
+
+def warm_cache(cache, fetch, db_path="assessments.db", limit=None):
+    # Geocode the logged addresses that are not already cached (each normalised address once, up to limit
+    # ArcGIS calls), returning (addresses already cached, addresses fetched, addresses that failed)
+    cached = fetched = failed = 0
+    seen = set()
+    for address in logged_addresses(db_path):
+        key = normalise_address(address)
+        if key in seen:
+            continue
+        seen.add(key)
+        if cache.get(address) is not None:
+            cached += 1
+            continue
+        if limit is not None and fetched + failed >= limit:
+            break
+        try:
+            cache.put(address, fetch(address))
+            fetched += 1
+        except Exception as error:
+            print(f"⚠️ Could not geocode {address!r}: {error}")
+            failed += 1
+    return cached, fetched, failed
+
+
+def main(argv=None):
+    # Command line entry point for warming or purging the geocode cache
+    parser = argparse.ArgumentParser(description="Maintain the shared geocode cache.")
+    parser.add_argument("command", choices=("warm", "purge"),
+                        help="geocode the logged addresses that are not cached yet, or delete expired entries")
+    parser.add_argument("--db", default="assessments.db", help="path to the assessments database to read addresses from")
+    parser.add_argument("--limit", type=int, default=None, help="maximum number of ArcGIS calls when warming")
+    args = parser.parse_args(argv)
+
+    # Imported here as GISProxy imports this module
+    from GISProxy import GEOCODE_CACHE, query_arcgis
+
+    if args.command == "purge":
+        print(f"✅ Deleted {GEOCODE_CACHE.purge_expired()} expired geocode cache entries")
+        return
+    cached, fetched, failed = warm_cache(GEOCODE_CACHE, query_arcgis, args.db, args.limit)
+    print(f"✅ Geocode cache warmed: {cached} already cached, {fetched} fetched, {failed} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+# Gunicorn settings for ExemptAssessAPI
+# Usage: gunicorn -c gunicorn.conf.py ExemptAssessAPI:app
+
+
+def worker_exit(server, worker):
+    # Write any assessments still queued for the database, and any queued log records, before the worker exits
+    from assessment_logger import ASSESSMENT_LOGGER
+    from structured_logging import flush_logging
+    ASSESSMENT_LOGGER.close()
+    flush_logging()
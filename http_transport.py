@@ -0,0 +1,234 @@
+# Pooled keep-alive HTTP transport for the ArcGIS and NSW GIS services
+#
+# requests.get() opens (and closes) a new TCP + TLS connection for every call.  HttpTransport keeps a
+# urllib3 connection pool per host behind one mounted HTTPAdapter, so sequential lookups reuse a warm
+# connection, with separate connect and read timeouts and a bounded retry with jittered exponential
+# backoff on connection errors, 429 and 5xx responses (honouring Retry-After).  Inside work with a deadline the
+# backoff is capped to the time left, and a Retry-After longer than that gives up with DeadlineExceeded.
+#
+# The adapter (and so its connection pool, which is thread-safe) is shared by every thread, while each
+# thread gets its own requests.Session mounted on it, so the Flask request threads and worker threads never
+# share Session state.  Connections are not shared across a fork: each gunicorn worker builds its own pool.
+#
+# AsyncHttpTransport is the asyncio counterpart for the ASGI app (ExemptAssessASGI.py), built on aiohttp (an
+# optional dependency, only imported when it is used).  It keeps one aiohttp.ClientSession, and so one
+# keep-alive pool, per event loop, shared by every request on that loop, with the same timeout and retry
+# settings.  (httpx was measured too: its pool spends CPU time on every request in proportion to the
+# connections it holds, which made a 64 connection pool slower than a 16 connection one.)
+
+import asyncio
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from json_codec import loads
+from work_scheduler import DeadlineExceeded, current_deadline
+
+# Transport settings
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 16))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 3.05))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 10))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", 2))
+HTTP_BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", 0.3))
+HTTP_BACKOFF_JITTER = float(os.getenv("HTTP_BACKOFF_JITTER", 0.2))
+
+# Responses that are worth retrying: rate limiting and server or gateway errors
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class DeadlineRetry(Retry):
+    # Retry policy that gives up once the current work's deadline has passed and never backs off beyond it
+    def is_exhausted(self):
+        deadline = current_deadline()
+        return super().is_exhausted() or (deadline is not None and deadline.expired())
+
+    def get_backoff_time(self):
+        deadline = current_deadline()
+        backoff = super().get_backoff_time()
+        return min(backoff, deadline.remaining()) if deadline is not None else backoff
+
+    def sleep_for_retry(self, response):
+        # Wait as long as a 429 or 503 response's Retry-After asks, unless that is beyond the deadline: the retry
+        # could not be made in time, so give up straight away rather than sleep until the deadline
+        retry_after = self.get_retry_after(response)
+        if not retry_after:
+            return False
+        deadline = current_deadline()
+        if deadline is not None and retry_after >= deadline.remaining():
+            raise DeadlineExceeded("Deadline exceeded before the GIS service's Retry-After")
+        time.sleep(retry_after)
+        return True
+
+
+class HttpTransport:
+    def __init__(self, pool_size=HTTP_POOL_SIZE, connect_timeout=HTTP_CONNECT_TIMEOUT, read_timeout=HTTP_READ_TIMEOUT,
+                 retries=HTTP_RETRIES, backoff_factor=HTTP_BACKOFF_FACTOR, backoff_jitter=HTTP_BACKOFF_JITTER,
+                 verify=True):
+        self.timeout = (connect_timeout, read_timeout)
+        self.verify = verify
+        self.retry = DeadlineRetry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(["GET"]),
+            backoff_factor=backoff_factor,
+            backoff_jitter=backoff_jitter,
+            respect_retry_after_header=True,
+            # Return the last response once the retries are used up, so the caller's raise_for_status() reports it
+            raise_on_status=False,
+        )
+        self.pool_size = pool_size
+        self._local = threading.local()
+        self._adapter = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_adapter(self):
+        # The adapter for this process, created on first use (so each gunicorn worker has its own pool)
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    self._adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size,
+                                                max_retries=self.retry)
+                    self._pid = pid
+        return self._adapter
+
+    def session(self):
+        # This thread's Session, mounted on the shared adapter
+        adapter = self._get_adapter()
+        session = getattr(self._local, "session", None)
+        if session is None or getattr(self._local, "adapter", None) is not adapter:
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._local.session = session
+            self._local.adapter = adapter
+        return session
+
+    def get(self, url, params=None, timeout=None):
+        # GET a URL through the pool, returning the requests.Response.  Inside work with a deadline the timeouts
+        # are capped to the time left, and DeadlineExceeded is raised instead of starting a call once it has passed
+        # verify is passed per request, as a Session's own verify setting is overridden by REQUESTS_CA_BUNDLE
+        timeout = timeout or self.timeout
+        deadline = current_deadline()
+        if deadline is not None:
+            timeout = deadline.cap(timeout)
+        try:
+            return self.session().get(url, params=params, timeout=timeout, verify=self.verify)
+        except requests.RequestException as error:
+            if error.args and isinstance(error.args[0], DeadlineExceeded):
+                # DeadlineRetry gave up on a Retry-After beyond the deadline (DeadlineExceeded is a TimeoutError, so
+                # requests reports it as a ConnectionError)
+                raise error.args[0] from None
+            if deadline is not None and deadline.expired():
+                # Failed because the capped timeout hit the deadline (requests reports a read timeout under the
+                # retry policy as a ConnectionError), rather than because of the service
+                raise DeadlineExceeded("Deadline exceeded during a GIS request") from None
+            raise
+
+    def get_json(self, url, params=None, timeout=None):
+        # GET a URL and decode its JSON body, raising requests.HTTPError for an error status
+        resp = self.get(url, params=params, timeout=timeout)
+        resp.raise_for_status()
+        return loads(resp.content)
+
+    def close(self):
+        # Close the pooled connections of this process
+        if self._adapter is not None and self._pid == os.getpid():
+            self._adapter.close()
+
+
+class AsyncHttpTransport:
+    def __init__(self, pool_size=HTTP_POOL_SIZE, connect_timeout=HTTP_CONNECT_TIMEOUT, read_timeout=HTTP_READ_TIMEOUT,
+                 retries=HTTP_RETRIES, backoff_factor=HTTP_BACKOFF_FACTOR, backoff_jitter=HTTP_BACKOFF_JITTER,
+                 verify=True):
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.backoff_jitter = backoff_jitter
+        self.verify = verify
+        self._session = None
+        self._loop = None
+
+    def session(self):
+        # The aiohttp.ClientSession for the running event loop, created on first use
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            import aiohttp
+            # At most pool_size connections; further requests wait for a free one
+            connector = aiohttp.TCPConnector(limit=self.pool_size, ssl=None if self.verify else False)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._loop = loop
+        return self._session
+
+    def _backoff(self, attempt, retry_after=None):
+        # Seconds to wait before retry number attempt (from 1): Retry-After if the service sent one (raising
+        # DeadlineExceeded if that is beyond the current deadline), otherwise jittered exponential backoff like
+        # urllib3's Retry, never beyond the current deadline
+        deadline = current_deadline()
+        if retry_after is not None and retry_after.isdigit():
+            wait = float(retry_after)
+            if deadline is not None and wait >= deadline.remaining():
+                # As in DeadlineRetry, give up rather than wait out the deadline
+                raise DeadlineExceeded("Deadline exceeded before the GIS service's Retry-After")
+            return wait
+        wait = self.backoff_factor * 2 ** (attempt - 1) + random.uniform(0, self.backoff_jitter)
+        return min(wait, deadline.remaining()) if deadline is not None else wait
+
+    async def get(self, url, params=None, timeout=None):
+        # GET a URL through the pool, retrying connection errors, timeouts and RETRY_STATUSES responses, and
+        # returning the last aiohttp response with its body read.  Timeouts are capped to the current deadline
+        # as in HttpTransport
+        import aiohttp
+        session = self.session()
+        # Like requests, leave out parameters that are None
+        params = {name: value for name, value in (params or {}).items() if value is not None}
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+            deadline = current_deadline()
+            connect, read = deadline.cap(timeout or self.timeout) if deadline is not None else (timeout or self.timeout)
+            # The connect timeout includes the wait for a free connection in the pool
+            client_timeout = aiohttp.ClientTimeout(connect=connect, sock_read=read,
+                                                   total=deadline.remaining() if deadline is not None else None)
+            try:
+                async with session.get(url, params=params, timeout=client_timeout) as resp:
+                    await resp.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if deadline is not None and deadline.expired():
+                    raise DeadlineExceeded("Deadline exceeded during a GIS request") from None
+                if attempt == self.retries:
+                    raise
+                retry_after = None
+                continue
+            if resp.status not in RETRY_STATUSES or attempt == self.retries:
+                return resp
+            retry_after = resp.headers.get("Retry-After")
+
+    async def get_json(self, url, params=None, timeout=None):
+        # GET a URL and decode its JSON body, raising aiohttp.ClientResponseError for an error status
+        resp = await self.get(url, params=params, timeout=timeout)
+        resp.raise_for_status()
+        # ArcGIS sometimes labels JSON as text/plain, so the content type is not checked
+        return await resp.json(content_type=None, loads=loads)
+
+    async def close(self):
+        # Close the pooled connections of the running event loop's session
+        if self._session is not None and self._loop is asyncio.get_running_loop():
+            await self._session.close()
+            self._session = None
+            self._loop = None
+
+
+# Shared transports for the GIS services (blocking, and asyncio for the ASGI app)
+GIS_TRANSPORT = HttpTransport()
+GIS_ASYNC_TRANSPORT = AsyncHttpTransport()
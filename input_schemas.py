@@ -0,0 +1,324 @@
+# Compiled input schemas for the assessment endpoint, one per development type
+#
+# Assess() used to normalise whatever the client sent: every key was visited (however many there were), strings
+# were lowercased, numbers went through parse_float and empty values became "no", unknown keys were carried into
+# the log, and a missing or mistyped attribute only surfaced as an exception inside the rules, reported as a
+# generic "Missing or invalid input data".  Each development type now has a schema declaring its fields:
+#   Enum     a fixed set of values (a frozenset), matched after lowercasing and stripping
+#   Number   a JSON number in a unit (m, mm, m², m³ or degrees), within the bounds of that unit
+#   Text     a string of bounded length, stripped and lowercased (uppercased for zoning, as submitted for the address)
+# Each schema is compiled at import, like the rule tables, into one straight-line validate() function that looks
+# each field up in the payload once and stores it in a record with a __slots__ field per schema field.  A payload
+# with more than EXTRA_FIELDS keys beyond the schema's fields is rejected before it is read; otherwise unknown keys
+# and invalid values are reported per field, and strings are length-checked before they are lowercased.  The work per request is
+# bounded by the size of the schema, whatever the client sends.
+#
+# Empty values ("" or null) keep their old meaning: "no" for yes/no fields, and not submitted for the others.
+# Fields are not required up front, as the rules only read some of them (the roof fields only for a patio with a
+# roof); a field the rules need but which was not submitted is reported as missing by the assessment
+# (sepp_rules.evaluate_record).  The schemas are checked at import against the attributes the rules read.
+
+import math
+
+import sepp_rules
+
+YES_NO = frozenset(("yes", "no"))
+
+# Keys a payload may have beyond the fields of its schema, each reported as an unknown field, before the payload is
+# rejected as a whole (the frontend sends every field of the form, so one stray key would otherwise hit the limit)
+EXTRA_FIELDS = 16
+
+# Bounds of numeric values by unit: generous limits that reject negative sizes and nonsense magnitudes
+UNIT_BOUNDS = {
+    "mm": (0, 10_000_000),
+    "m": (0, 10_000),
+    "m²": (0, 100_000_000),
+    "m³": (0, 100_000_000),
+}
+
+# Stands in for an empty value of a field that is then left unset (not submitted)
+MISSING = object()
+
+
+class FieldError(ValueError):
+    # An invalid value, with its error code and message; validate() adds the field name
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def field_error(field, code, message):
+    # One field-level error as returned to the client
+    return {"field": field, "error": code, "message": message}
+
+
+class Enum:
+    __slots__ = ("values", "empty", "max_length", "message")
+
+    def __init__(self, values, empty=MISSING):
+        self.values = frozenset(values)
+        self.empty = empty
+        self.max_length = max(map(len, self.values))
+        self.message = f"must be one of {', '.join(sorted(self.values))}"
+
+    def convert(self, value):
+        if value is None:
+            return self.empty
+        # Length is checked first (allowing for surrounding whitespace), so a long string is never lowercased
+        if type(value) is str and len(value) <= self.max_length + 16:
+            value = value.lower().strip()
+            if value in self.values:
+                return value
+            if value == "":
+                return self.empty
+        raise FieldError("invalid_choice", self.message)
+
+
+class Number:
+    __slots__ = ("unit", "minimum", "maximum", "message")
+
+    def __init__(self, unit, minimum=None, maximum=None):
+        default_minimum, default_maximum = UNIT_BOUNDS.get(unit, (-math.inf, math.inf))
+        self.unit = unit
+        self.minimum = default_minimum if minimum is None else minimum
+        self.maximum = default_maximum if maximum is None else maximum
+        self.message = f"must be a number of {unit} from {self.minimum:,.15g} to {self.maximum:,.15g}"
+
+    def convert(self, value):
+        value_type = type(value)
+        if value_type is float or value_type is int:
+            value = float(value)
+            # NaN fails both comparisons
+            if self.minimum <= value <= self.maximum:
+                return value
+            raise FieldError("out_of_range", self.message)
+        if value is None or value == "":
+            return MISSING
+        raise FieldError("invalid_type", self.message)
+
+
+class Text:
+    __slots__ = ("max_length", "case", "values", "empty", "too_long", "message")
+
+    def __init__(self, max_length, case="lower", values=(), empty=MISSING, too_long=None):
+        # case is "lower", "upper" or None (kept as submitted); values are the usual normalised values, which
+        # validate() stores without converting them.  too_long, if given, is stored for a string longer than
+        # max_length instead of reporting it
+        self.max_length = max_length
+        self.case = case
+        self.values = frozenset(values)
+        self.empty = empty
+        self.too_long = too_long
+        self.message = f"must be text of at most {max_length} characters"
+
+    def convert(self, value):
+        if value is None:
+            return self.empty
+        if type(value) is str and len(value) <= self.max_length:
+            if self.case is None:
+                return value if value else self.empty
+            value = value.strip()
+            if value == "":
+                return self.empty
+            return value.upper() if self.case == "upper" else value.lower()
+        if type(value) is str and self.too_long is not None:
+            return self.too_long
+        raise FieldError("invalid_type" if type(value) is not str else "too_long", self.message)
+
+
+# Fields every form submission carries, whatever the development type
+COMMON_FIELDS = {
+    "development": Text(16, values=sepp_rules.RULE_SETS),
+    "address": Text(300, case=None),
+    "longitude": Number("degrees", -180, 180),
+    "latitude": Number("degrees", -90, 90),
+    # Any zone is accepted here; the rules answer an unsupported one (an empty zone was always "no"), and a zone
+    # too long to be a zone code is stored as one that is not supported
+    "zoning": Text(16, case="upper", values=sepp_rules.SUPPORTED_ZONES, empty="no", too_long="UNSUPPORTED"),
+    "heritage": Enum(YES_NO, empty="no"),
+    "foreshore": Enum(YES_NO, empty="no"),
+    "bushfire": Enum(YES_NO, empty="no"),
+    "sensitive_area": Enum(YES_NO, empty="no"),
+    "land_size": Number("m²"),
+}
+
+# Fields of each development type, with the units of the help pages
+PATIO_FIELDS = {
+    "structure_type": Enum(("new", "replacement"), empty="new"),
+    "height_existing": Number("mm"),
+    "material_quality": Enum(YES_NO, empty="no"),
+    "same_size": Enum(YES_NO, empty="no"),
+    "area": Number("m²"),
+    "total_structures_area": Number("m²"),
+    "wall_height": Enum(YES_NO, empty="no"),
+    "behind_building_line": Enum(YES_NO, empty="no"),
+    "boundary_distance": Number("mm"),
+    "metal": Enum(YES_NO, empty="no"),
+    "reflective": Enum(YES_NO, empty="no"),
+    "floor_height": Number("mm"),
+    "roof": Enum(YES_NO, empty="no"),
+    "overhang": Number("mm"),
+    "attached": Enum(YES_NO, empty="no"),
+    "above_gutter": Enum(YES_NO, empty="no"),
+    "roof_height": Number("m"),
+    "fascia_connection": Enum(YES_NO, empty="no"),
+    "engineer_spec": Enum(YES_NO, empty="no"),
+    "stormwater": Enum(YES_NO, empty="no"),
+    "drainage": Enum(YES_NO, empty="no"),
+    "distance_dwelling": Number("m"),
+    "non_combustible": Enum(YES_NO, empty="no"),
+}
+
+SHED_FIELDS = {
+    "heritage_conserv": Enum(YES_NO, empty="no"),
+    "rear_yard": Enum(YES_NO, empty="no"),
+    "area": Number("m²"),
+    "height": Number("m"),
+    "boundary_distance": Number("mm"),
+    "building_line": Enum(YES_NO, empty="no"),
+    "shipping_container": Enum(YES_NO, empty="no"),
+    "stormwater": Enum(YES_NO, empty="no"),
+    "metal": Enum(YES_NO, empty="no"),
+    "reflective": Enum(YES_NO, empty="no"),
+    "distance_dwelling": Number("m"),
+    "non_combustible": Enum(YES_NO, empty="no"),
+    "adjacent_building": Enum(YES_NO, empty="no"),
+    "interfere": Enum(YES_NO, empty="no"),
+    "habitable": Enum(YES_NO, empty="no"),
+    "easement": Enum(YES_NO, empty="no"),
+    "services": Enum(YES_NO, empty="no"),
+    "existing_structures": Enum(YES_NO, empty="no"),
+}
+
+RETAIN_FIELDS = {
+    "heritage_conserv": Enum(YES_NO, empty="no"),
+    "flood_control_lot": Enum(YES_NO, empty="no"),
+    "cut_or_fill": Number("mm"),
+    "boundary_distance": Number("mm"),
+    "rear_yard": Enum(YES_NO, empty="no"),
+    "waterbody_within_40m": Enum(YES_NO, empty="no"),
+    "sediment_transfer": Enum(YES_NO, empty="no"),
+    "height": Number("mm"),
+    "distance_other": Number("mm"),
+    "distance_easement": Number("mm"),
+    "stormwater": Enum(YES_NO, empty="no"),
+    "fill_depth": Number("mm"),
+    "fill_area": Number("m²"),
+    "fill_volume": Number("m³"),
+    "imported_fill": Enum(YES_NO, empty="no"),
+    "venm": Enum(YES_NO, empty="no"),
+}
+
+
+class InputRecord:
+    # Validated attributes of one assessment; subclasses have a slot per schema field, unset if not submitted
+    __slots__ = ()
+
+    def __contains__(self, name):
+        # Whether the field was submitted (the "has" rule comparator)
+        return hasattr(self, name)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__ if hasattr(self, name)}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.as_dict()!r})"
+
+
+class InputSchema:
+    def __init__(self, development, fields):
+        for name in fields:
+            if not name.isidentifier():
+                raise ValueError(f"Field name {name!r} of the {development} schema is not an identifier")
+        self.development = development
+        self.fields = fields
+        self.max_fields = len(fields) + EXTRA_FIELDS
+        self.record_type = type(f"{development.title()}Record", (InputRecord,), {"__slots__": tuple(fields)})
+        self._too_many = [field_error(None, "too_many_fields",
+                                      f"A {development} assessment has {len(fields)} attributes; at most "
+                                      f"{self.max_fields} keys are accepted.")]
+        self.validate = self._compile()
+
+    def _compile(self):
+        # Compile validate(payload) -> (record, errors) into one straight-line function that looks up each schema
+        # field in turn.  A value already in its normalised form ("yes", "R2", a float in range) is stored directly;
+        # anything else goes through the field's converter.  Keys that are not fields are only looked for when
+        # the number of fields found falls short of the size of the payload
+        namespace = {"MISSING": MISSING, "Record": self.record_type, "convert": self._convert,
+                     "unknown": self._unknown, "too_many": self._too_many}
+        lines = ["def validate(payload):",
+                 f"    if len(payload) > {self.max_fields}:",
+                 "        return None, too_many",
+                 "    record = Record()",
+                 "    errors = []",
+                 "    get = payload.get",
+                 "    found = 0"]
+        for index, (name, spec) in enumerate(self.fields.items()):
+            lines += [f"    value = get({name!r}, MISSING)",
+                      "    if value is not MISSING:",
+                      "        found += 1"]
+            if isinstance(spec, Enum):
+                namespace[f"values_{index}"] = spec.values
+                lines += [f"        if type(value) is str and value in values_{index}:",
+                          f"            record.{name} = value",
+                          "        else:",
+                          f"            convert(record, errors, {name!r}, value)"]
+            elif isinstance(spec, Number):
+                namespace[f"bounds_{index}"] = (spec.minimum, spec.maximum)
+                lines += [f"        if (type(value) is float or type(value) is int) and "
+                          f"bounds_{index}[0] <= value <= bounds_{index}[1]:",
+                          f"            record.{name} = float(value)",
+                          "        else:",
+                          f"            convert(record, errors, {name!r}, value)"]
+            elif spec.case is None:
+                lines += [f"        if type(value) is str and 0 < len(value) <= {spec.max_length}:",
+                          f"            record.{name} = value",
+                          "        else:",
+                          f"            convert(record, errors, {name!r}, value)"]
+            else:
+                namespace[f"values_{index}"] = spec.values
+                lines += [f"        if type(value) is str and value in values_{index}:",
+                          f"            record.{name} = value",
+                          "        else:",
+                          f"            convert(record, errors, {name!r}, value)"]
+        lines += ["    if found != len(payload):",
+                  "        unknown(payload, errors)",
+                  "    return record, errors"]
+        exec(compile("\n".join(lines), f"<input_schemas:{self.development}>", "exec"), namespace)
+        return namespace["validate"]
+
+    def _convert(self, record, errors, name, value):
+        # Convert a value that is not already in its normalised form, storing it or recording its error
+        try:
+            value = self.fields[name].convert(value)
+        except FieldError as error:
+            errors.append(field_error(name, error.code, error.message))
+            return
+        if value is not MISSING:
+            setattr(record, name, value)
+
+    def _unknown(self, payload, errors):
+        for name in payload:
+            if name not in self.fields:
+                errors.append(field_error(name, "unknown_field", f"is not an attribute of a {self.development} assessment"))
+
+
+def _build_schemas():
+    schemas = {}
+    for development, fields in (("patio", PATIO_FIELDS), ("shed", SHED_FIELDS), ("retain", RETAIN_FIELDS)):
+        fields = {**COMMON_FIELDS, **fields}
+        undeclared = set(sepp_rules.RULE_INPUTS[development]) - set(fields)
+        if undeclared:
+            raise ValueError(f"The {development} rules read attributes missing from its schema: {sorted(undeclared)}")
+        schemas[development] = InputSchema(development, fields)
+    return schemas
+
+
+# Schemas by development type, compiled once at import
+SCHEMAS = _build_schemas()
+
+
+def missing_field_error(field):
+    # The error for a field the rules needed that was not submitted
+    return field_error(field, "missing", "is required for this assessment")
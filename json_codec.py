@@ -0,0 +1,84 @@
+# JSON encoding and decoding with the fastest available library
+#
+# One assessment used to be encoded three times: jsonify for the HTTP response, then json.dumps of the input and
+# of {"result": ...} for the log row.  Assess() now encodes the response body once and the log row reuses the same
+# bytes.  The assessment requests and responses, the database readers, console logging and the geocode cache read
+# and write JSON through this module (the other Flask routes keep jsonify), which uses orjson or msgspec when one
+# is installed:
+#   JSON_BACKEND=auto      orjson, else msgspec, else the standard library (default)
+#   JSON_BACKEND=orjson | msgspec | json
+# All backends write compact UTF-8 JSON (no spaces and no \u escapes), as Starlette responses are.  Values the
+# fast backends cannot encode (integers beyond 64 bits, non-string keys) and text they refuse to decode (NaN,
+# which Python's json accepts and used to write) fall back to the standard library, so the result is the same
+# whichever backend is installed.
+
+import json
+import os
+
+JSON_BACKEND = os.getenv("JSON_BACKEND", "auto").lower()
+
+
+# Built once: json.dumps with any options builds a new encoder on every call
+_STDLIB_ENCODER = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
+
+
+def _stdlib_dumps(value, default=None):
+    if default is None:
+        return _STDLIB_ENCODER.encode(value).encode()
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=default).encode()
+
+
+def _load_backend(name):
+    # (name, encode, decode, decode errors) of a backend, or None if it is not installed
+    if name == "orjson":
+        try:
+            import orjson
+        except ImportError:
+            return None
+        return name, orjson.dumps, orjson.loads, (orjson.JSONDecodeError,)
+    if name == "msgspec":
+        try:
+            import msgspec
+        except ImportError:
+            return None
+        encoder, decoder = msgspec.json.Encoder(), msgspec.json.Decoder()
+
+        def encode(value, default=None):
+            if default is None:
+                return encoder.encode(value)
+            return msgspec.json.encode(value, enc_hook=default)
+
+        return name, encode, decoder.decode, (msgspec.DecodeError,)
+    return "json", _stdlib_dumps, json.loads, ()
+
+
+def _select_backend(setting):
+    for name in (("orjson", "msgspec") if setting == "auto" else (setting,)):
+        backend = _load_backend(name)
+        if backend is not None:
+            return backend
+    return _load_backend("json")
+
+
+BACKEND, _encode, _decode, _DECODE_ERRORS = _select_backend(JSON_BACKEND)
+
+
+def dumps(value, default=None):
+    # Encode a value as compact UTF-8 JSON bytes; default is called for objects JSON has no type for
+    try:
+        return _encode(value) if default is None else _encode(value, default=default)
+    except (TypeError, ValueError, OverflowError):
+        return _stdlib_dumps(value, default)
+
+
+def dumps_text(value, default=None):
+    # Encode a value as a JSON string (for SQLite TEXT columns and log lines)
+    return dumps(value, default).decode()
+
+
+def loads(data):
+    # Decode JSON text or UTF-8 bytes, raising ValueError if it is not valid JSON
+    try:
+        return _decode(data)
+    except _DECODE_ERRORS:
+        return json.loads(data)
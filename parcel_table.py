@@ -0,0 +1,210 @@
+# Materialised property attributes for known parcels
+#
+# Most assessments are for a bounded set of parcels, so the zoning SYM_CODE, the heritage, bushfire,
+# foreshore and biodiversity flags and the computed lot size of each known parcel are kept in the
+# parcel_attributes table, keyed by normalised address (the same key as the geocode cache).  /property-profile
+# serves a known address with a single primary key lookup and no geocode or GIS call, and only goes to the
+# live services on a miss (or when the row is older than PARCEL_MAX_AGE_SECONDS); complete live profiles are
+# written back.  Every row carries the time it was refreshed, which is returned with the profile.
+#
+# The refresh job materialises the table for a list of addresses, run nightly or on demand (from the
+# repository root):
+#   python parcel_table.py refresh --from-log                 (addresses in the assessment log)
+#   python parcel_table.py refresh --file addresses.txt       (one address per line)
+#   python parcel_table.py refresh --from-log --max-age 86400 (only rows older than a day)
+#   python parcel_table.py info
+
+import argparse
+import logging
+import os
+import threading
+import time
+
+from assessment_db import aest_now, get_connection
+from geocode_cache import normalise_address
+
+log = logging.getLogger(__name__)
+
+# Table settings
+PARCEL_DB = os.getenv("PARCEL_DB", "assessments.db")
+PARCEL_MAX_AGE_SECONDS = float(os.getenv("PARCEL_MAX_AGE_SECONDS", 30 * 24 * 3600))
+
+# Profile fields stored for each parcel, in column order
+PARCEL_FIELDS = ("address", "score", "x", "y", "zoning", "heritage", "foreshore", "bushfire", "sensitive_area", "land_size")
+
+CREATE_PARCELS_SQL = """
+    CREATE TABLE IF NOT EXISTS parcel_attributes (
+        address_key TEXT PRIMARY KEY,   -- normalised address
+        address TEXT,                   -- matched address from the geocoder
+        score REAL,
+        x REAL,
+        y REAL,
+        zoning TEXT,                    -- SYM_CODE
+        heritage TEXT,                  -- 'Yes' / 'No'
+        foreshore TEXT,
+        bushfire TEXT,
+        sensitive_area TEXT,
+        land_size INTEGER,              -- m², computed from LOT_SIZE / AREA_SQM / Shape__Area / area_total
+        refreshed_at TEXT,              -- AEST time the row was refreshed (ISO 8601)
+        refreshed_epoch REAL            -- the same time as a Unix timestamp, for the age check
+    ) WITHOUT ROWID
+"""
+SELECT_PARCEL_SQL = f"SELECT {', '.join(PARCEL_FIELDS)}, refreshed_at, refreshed_epoch FROM parcel_attributes WHERE address_key = ?"
+UPSERT_PARCEL_SQL = f"""
+    INSERT OR REPLACE INTO parcel_attributes (address_key, {', '.join(PARCEL_FIELDS)}, refreshed_at, refreshed_epoch)
+    VALUES ({', '.join('?' * (len(PARCEL_FIELDS) + 3))})
+"""
+
+
+class ParcelTable:
+    def __init__(self, db_path=PARCEL_DB, max_age=PARCEL_MAX_AGE_SECONDS):
+        self.db_path = db_path
+        self.max_age = max_age
+        self._schema_ready = set()
+        self._lock = threading.Lock()
+        # Counters reported by stats()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def _connection(self):
+        # This thread's connection to the parcel table's database, creating the table once per process
+        conn = get_connection(self.db_path)
+        if os.getpid() not in self._schema_ready:
+            with self._lock:
+                conn.execute(CREATE_PARCELS_SQL)
+                conn.commit()
+                self._schema_ready.add(os.getpid())
+        return conn
+
+    def get(self, address):
+        # Profile of a known parcel with its refreshed_at time, or None if the address is unknown or its row is too old
+        try:
+            row = self._connection().execute(SELECT_PARCEL_SQL, (normalise_address(address),)).fetchone()
+        except Exception as error:
+            # The table is an optimisation, so a database problem is treated as a miss
+            log.warning("Parcel table read failed: %s", error)
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        if time.time() - row[-1] > self.max_age:
+            self.stale += 1
+            return None
+        self.hits += 1
+        profile = dict(zip(PARCEL_FIELDS, row))
+        profile["refreshed_at"] = row[-2]
+        return profile
+
+    def put_many(self, profiles):
+        # Write complete (address, profile) pairs in one transaction, stamped with the current time
+        refreshed_at, refreshed_epoch = aest_now(), time.time()
+        conn = self._connection()
+        conn.executemany(UPSERT_PARCEL_SQL, [
+            (normalise_address(address),) + tuple(profile.get(field) for field in PARCEL_FIELDS) + (refreshed_at, refreshed_epoch)
+            for address, profile in profiles
+        ])
+        conn.commit()
+
+    def put(self, address, profile):
+        # Write one complete profile, ignoring database problems (the live result has already been served)
+        try:
+            self.put_many([(address, profile)])
+        except Exception as error:
+            log.warning("Parcel table write failed: %s", error)
+
+    def ages(self, addresses):
+        # Seconds since each address was refreshed (None if it has no row), keyed by normalised address
+        conn = self._connection()
+        now = time.time()
+        ages = {}
+        for address in addresses:
+            key = normalise_address(address)
+            row = conn.execute("SELECT refreshed_epoch FROM parcel_attributes WHERE address_key = ?", (key,)).fetchone()
+            ages[key] = now - row[0] if row else None
+        return ages
+
+    def stats(self):
+        # Row count, lookup counters and the oldest and newest refresh times for monitoring
+        count, oldest, newest = self._connection().execute(
+            "SELECT COUNT(*), MIN(refreshed_at), MAX(refreshed_at) FROM parcel_attributes").fetchone()
+        return {"parcels": count, "oldest_refresh": oldest, "newest_refresh": newest,
+                "hits": self.hits, "misses": self.misses, "stale": self.stale}
+
+
+def refresh(table, addresses, build, max_age=None, batch_size=100, progress=None):
+    # Materialise the table for a list of addresses: each distinct normalised address whose row is missing or
+    # older than max_age seconds (all of them when max_age is None) is rebuilt with build(address), a function
+    # returning a live profile.  Returns (refreshed, skipped, failed)
+    unique = {}
+    for address in addresses:
+        unique.setdefault(normalise_address(address), address)
+    ages = table.ages(unique.values()) if max_age is not None else {}
+
+    refreshed = skipped = failed = 0
+    pending = []
+    for key, address in unique.items():
+        age = ages.get(key)
+        if max_age is not None and age is not None and age <= max_age:
+            skipped += 1
+            continue
+        profile = build(address)
+        if "error" in profile or profile.get("errors"):
+            print(f"⚠️ Could not refresh {address!r}: {profile.get('error') or profile.get('errors')}")
+            failed += 1
+            continue
+        pending.append((address, profile))
+        if len(pending) >= batch_size:
+            table.put_many(pending)
+            refreshed += len(pending)
+            pending = []
+            if progress is not None:
+                progress(refreshed)
+    if pending:
+        table.put_many(pending)
+        refreshed += len(pending)
+    return refreshed, skipped, failed
+
+
+# Shared parcel table for the application
+PARCEL_TABLE = ParcelTable()
+
+
+def main(argv=None):
+    # Command line entry point for refreshing or inspecting the parcel table
+    parser = argparse.ArgumentParser(description="Materialise the property attributes of known parcels.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    refresh_parser = commands.add_parser("refresh", help="rebuild rows from the live geocoder and GIS layers")
+    refresh_parser.add_argument("--from-log", action="store_true", help="refresh the addresses in the assessment log")
+    refresh_parser.add_argument("--file", help="refresh the addresses in a text file (one per line)")
+    refresh_parser.add_argument("--db", default="assessments.db", help="assessments database to read logged addresses from")
+    refresh_parser.add_argument("--max-age", type=float, default=None,
+                                help="only refresh rows older than this many seconds (default: refresh every row)")
+    commands.add_parser("info", help="show the number of parcels and refresh times")
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        for name, value in PARCEL_TABLE.stats().items():
+            print(f"{name:<16}{value}")
+        return
+
+    addresses = []
+    if args.from_log:
+        from geocode_cache import logged_addresses
+        addresses.extend(logged_addresses(args.db))
+    if args.file:
+        with open(args.file, "r") as f:
+            addresses.extend(line.strip() for line in f if line.strip())
+    if not addresses:
+        parser.error("nothing to refresh: use --from-log and/or --file")
+
+    # Imported here as property_profile imports this module
+    from property_profile import live_profile
+
+    refreshed, skipped, failed = refresh(PARCEL_TABLE, addresses, live_profile, args.max_age,
+                                         progress=lambda total: print(f"  {total} parcels refreshed"))
+    print(f"✅ Parcel table: {refreshed} refreshed, {skipped} still fresh, {failed} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+# Server-side property profile: geocode plus the six GIS layer queries in one request
+#
+# When an address is confirmed the browser used to make seven high-latency round trips (geocode, then
+# boundary, zoning, heritage, foreshore, bushfire and biodiversity).  PropertyProfiles.get() does the same
+# work on the server: the address is geocoded through the geocode cache, then the six layers are queried
+# concurrently over the pooled GIS transport, and the answers the form needs are returned as one compact
+# profile.  The layer URLs are read from static/js/conf/js.conf, so the browser and server stay in step.
+# Layers that have been ingested into the offline store (see spatial_index.py) are answered locally.
+# Every lookup has an asyncio twin (the *_async functions) used by the ASGI app, ExemptAssessASGI.py.
+#
+# Known parcels are served from the materialised parcel table (see parcel_table.py) without any GIS call.
+# Identical lookups that arrive while one is in flight wait for it instead of repeating it, and complete
+# profiles are cached per parcel (the geocoded location), so different spellings of an address share one
+# entry, and written to the parcel table.  Profiles with a failed layer query are returned but not cached.
+
+import asyncio
+import contextvars
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from GISProxy import geocode_address, geocode_address_async
+from geocode_cache import normalise_address
+from http_transport import GIS_TRANSPORT, GIS_ASYNC_TRANSPORT
+from parcel_table import PARCEL_TABLE
+from spatial_index import SPATIAL_INDEX
+from work_scheduler import DeadlineExceeded, current_deadline
+
+log = logging.getLogger(__name__)
+
+# Profile settings
+PROFILE_WORKERS = int(os.getenv("PROFILE_WORKERS", 12))
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", 5000))
+PROFILE_CACHE_TTL_SECONDS = float(os.getenv("PROFILE_CACHE_TTL_SECONDS", 24 * 3600))
+
+# Layer URLs shared with the frontend
+JS_CONF_PATH = os.path.join(os.path.dirname(__file__), "static", "js", "conf", "js.conf")
+
+
+def load_layer_urls(path=JS_CONF_PATH):
+    # Read the *_URL entries from the frontend configuration (a JavaScript object literal), skipping comments
+    with open(path, "r") as f:
+        text = "\n".join(line for line in f if not line.strip().startswith("//"))
+    return dict(re.findall(r'(\w+_URL)\s*:\s*"([^"]+)"', text))
+
+
+LAYER_URLS = load_layer_urls()
+# A layer URL can be overridden with an environment variable of the same name (e.g. ZONING_URL), to point the
+# server at a mirror of the service or a local stub
+LAYER_URLS.update({name: os.environ[name] for name in LAYER_URLS if os.environ.get(name)})
+
+
+def feature_params(x, y, out_fields):
+    # Query parameters for the features of a layer at a point (longitude x, latitude y)
+    return {
+        "f": "json",
+        "geometry": f"{x},{y}",
+        "geometryType": "esriGeometryPoint",
+        "inSR": "4326",
+        "spatialRel": "esriSpatialRelIntersects",
+        "outFields": out_fields,
+        "returnGeometry": "false",
+    }
+
+
+def first_feature(data):
+    # First feature of a layer query response, or None if there is none
+    if "error" in data:
+        # ArcGIS reports query errors in a 200 response
+        raise RuntimeError(f"Layer query failed: {data['error']}")
+    features = data.get("features") or []
+    return features[0] if features else None
+
+
+def query_feature(url, x, y, out_fields="*"):
+    # First feature of a GIS layer at a point, or None if there is none
+    return first_feature(GIS_TRANSPORT.get_json(url, params=feature_params(x, y, out_fields)))
+
+
+async def query_feature_async(url, x, y, out_fields="*"):
+    # query_feature() over the asyncio transport, for the ASGI app
+    return first_feature(await GIS_ASYNC_TRANSPORT.get_json(url, params=feature_params(x, y, out_fields)))
+
+
+def local_feature(layer, x, y):
+    # The feature of an ingested layer at a point from the offline index, in the shape of a layer query feature
+    properties = SPATIAL_INDEX.find(layer, x, y)
+    return {"attributes": properties} if properties is not None else None
+
+
+def find_feature(layer, x, y, out_fields="*"):
+    # First feature of a layer at a point, from the local index when the layer has been ingested and covers
+    # the point (see spatial_index.LAYERS), otherwise from the live service at the layer's js.conf URL
+    if SPATIAL_INDEX.covers(layer, x, y):
+        return local_feature(layer, x, y)
+    return query_feature(LAYER_URLS[f"{layer.upper()}_URL"], x, y, out_fields)
+
+
+async def find_feature_async(layer, x, y, out_fields="*"):
+    # find_feature() for the ASGI app
+    if SPATIAL_INDEX.covers(layer, x, y):
+        return local_feature(layer, x, y)
+    return await query_feature_async(LAYER_URLS[f"{layer.upper()}_URL"], x, y, out_fields)
+
+
+def attribute(feature, field):
+    # Value of one attribute of a feature, or None if there is no feature (like queryLayer() in APIQuery.js)
+    return feature.get("attributes", {}).get(field) if feature else None
+
+
+def lot_size(attributes):
+    # Lot size in m² from the cadastre attributes, with the same precedence as queryBoundary() in APIQuery.js
+    size = None
+    if attributes.get("LOT_SIZE") and attributes.get("LOT_SIZE_UOM"):
+        uom = str(attributes["LOT_SIZE_UOM"]).lower()
+        if "ha" in uom:
+            size = float(attributes["LOT_SIZE"]) * 10000   # hectares → m²
+        elif "sqm" in uom or "m2" in uom:
+            size = float(attributes["LOT_SIZE"])
+    elif attributes.get("AREA_SQM"):
+        size = float(attributes["AREA_SQM"])
+    elif attributes.get("Shape__Area"):
+        size = float(attributes["Shape__Area"])
+    elif attributes.get("area_total"):
+        size = float(attributes["area_total"])
+    return round(size) if size else None
+
+
+def yes_no(value):
+    return "Yes" if value else "No"
+
+
+def bushfire_prone(feature):
+    # Bushfire prone land is any category of 1 or more
+    category = attribute(feature, "Category")
+    return yes_no(category is not None and category >= 1)
+
+
+# Profile fields, named after the form fields they fill in: the layer queried (its *_URL key in js.conf), the
+# outFields requested, and the value taken from the feature at the point (None when there is no feature)
+LAYER_FIELDS = {
+    "land_size": ("featureserver", "*", lambda feature: lot_size(feature.get("attributes") or {}) if feature else None),
+    "zoning": ("zoning", "SYM_CODE", lambda feature: attribute(feature, "SYM_CODE")),
+    "heritage": ("heritage", "*", yes_no),
+    "foreshore": ("fbl", "MAP_TYPE", lambda feature: yes_no(attribute(feature, "MAP_TYPE"))),
+    "bushfire": ("bushfire", "Category", bushfire_prone),
+    "sensitive_area": ("biodiversity", "BV_Category", lambda feature: yes_no(attribute(feature, "BV_Category"))),
+}
+
+
+def query_field(name, x, y):
+    # Value of one profile field at a point
+    layer, out_fields, value = LAYER_FIELDS[name]
+    return value(find_feature(layer, x, y, out_fields))
+
+
+async def query_field_async(name, x, y):
+    # query_field() for the ASGI app
+    layer, out_fields, value = LAYER_FIELDS[name]
+    return value(await find_feature_async(layer, x, y, out_fields))
+
+
+# Threads for the concurrent layer queries, separate from the assessment scheduler so a slow GIS service
+# cannot hold up assessments
+LAYER_EXECUTOR = ThreadPoolExecutor(max_workers=PROFILE_WORKERS, thread_name_prefix="gis-layer")
+
+
+def query_layers(x, y):
+    # Run the six layer queries for a point concurrently, returning (layers, names of the layers that failed).
+    # Each query runs in a copy of the caller's context, so it sees the caller's deadline (see work_scheduler),
+    # and a query still running when the deadline passes is counted as failed
+    futures = {name: LAYER_EXECUTOR.submit(contextvars.copy_context().run, query_field, name, x, y)
+               for name in LAYER_FIELDS}
+    deadline = current_deadline()
+    layers = {}
+    errors = []
+    for name, future in futures.items():
+        try:
+            layers[name] = future.result(timeout=deadline.remaining() if deadline is not None else None)
+        except Exception as error:
+            future.cancel()
+            log.warning("layer_query_failed", extra={"layer": name, "error": repr(error)})
+            layers[name] = None
+            errors.append(name)
+    return layers, errors
+
+
+async def query_layers_async(x, y):
+    # query_layers() for the ASGI app: the six queries run concurrently as tasks on the event loop, and those
+    # still running when the deadline passes are cancelled and counted as failed
+    tasks = {name: asyncio.ensure_future(query_field_async(name, x, y)) for name in LAYER_FIELDS}
+    deadline = current_deadline()
+    done, pending = await asyncio.wait(tasks.values(), timeout=deadline.remaining() if deadline is not None else None)
+    for task in pending:
+        task.cancel()
+    layers = {}
+    errors = []
+    for name, task in tasks.items():
+        error = task.exception() if task in done else DeadlineExceeded("Deadline exceeded")
+        if error is None:
+            layers[name] = task.result()
+        else:
+            log.warning("layer_query_failed", extra={"layer": name, "error": repr(error)})
+            layers[name] = None
+            errors.append(name)
+    return layers, errors
+
+
+def live_profile(address):
+    # Profile for an address straight from the geocoder and GIS layers, bypassing every cache but the geocode cache
+    location = geocode_address(address)
+    if "error" in location:
+        return location
+    profile = {"address": location.get("address"), "score": location.get("score"), "x": location["x"], "y": location["y"]}
+    layers, errors = query_layers(location["x"], location["y"])
+    profile.update(layers)
+    if errors:
+        profile["errors"] = errors
+    return profile
+
+
+class PropertyProfiles:
+    def __init__(self, size=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL_SECONDS):
+        self.size = size
+        self.ttl = ttl
+        # parcel key -> (expires_at, profile layers), least recently used first
+        self.parcels = OrderedDict()
+        # normalised address -> Future of the lookup in progress (concurrent.futures for threads, asyncio for
+        # the ASGI app's event loop)
+        self.in_flight = {}
+        self.in_flight_async = {}
+        self._lock = threading.Lock()
+        # Counters reported by stats()
+        self.parcel_hits = 0
+        self.coalesced = 0
+        self.lookups = 0
+
+    def get(self, address):
+        # Profile for an address, joining an identical lookup that is already in progress
+        key = normalise_address(address)
+        with self._lock:
+            future = self.in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                owner = False
+            else:
+                future = Future()
+                self.in_flight[key] = future
+                owner = True
+        if not owner:
+            # Wait for the lookup in progress, but no longer than this request's own deadline
+            deadline = current_deadline()
+            return dict(future.result(timeout=deadline.remaining() if deadline is not None else None))
+
+        try:
+            profile = self._build(address)
+            future.set_result(profile)
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        finally:
+            with self._lock:
+                self.in_flight.pop(key, None)
+        return dict(profile)
+
+    async def get_async(self, address):
+        # get() for the ASGI app, joining an identical lookup in progress on the event loop
+        key = normalise_address(address)
+        future = self.in_flight_async.get(key)
+        if future is not None:
+            self.coalesced += 1
+            deadline = current_deadline()
+            return dict(await asyncio.wait_for(asyncio.shield(future), deadline.remaining() if deadline is not None else None))
+
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight_async[key] = future
+        try:
+            profile = await self._build_async(address)
+            future.set_result(profile)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as error:
+            future.set_exception(error)
+            # Mark the exception as retrieved, so asyncio does not report it when nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            self.in_flight_async.pop(key, None)
+        return dict(profile)
+
+    def _build(self, address):
+        # Serve a known parcel from the materialised parcel table; otherwise geocode the address, then use the
+        # cached layers for its parcel or query the six layers concurrently
+        known = PARCEL_TABLE.get(address)
+        if known is not None:
+            return known
+
+        location = geocode_address(address)
+        if "error" in location:
+            return location
+        profile, parcel = self._located(location)
+        if self._add_cached_layers(profile, parcel):
+            return profile
+
+        self.lookups += 1
+        layers, errors = query_layers(profile["x"], profile["y"])
+        return self._complete(address, profile, parcel, layers, errors)
+
+    async def _build_async(self, address):
+        # _build() for the ASGI app.  The parcel table and cache lookups run inline, as they are local
+        known = PARCEL_TABLE.get(address)
+        if known is not None:
+            return known
+
+        location = await geocode_address_async(address)
+        if "error" in location:
+            return location
+        profile, parcel = self._located(location)
+        if self._add_cached_layers(profile, parcel):
+            return profile
+
+        self.lookups += 1
+        layers, errors = await query_layers_async(profile["x"], profile["y"])
+        return self._complete(address, profile, parcel, layers, errors)
+
+    @staticmethod
+    def _located(location):
+        # The start of a profile from a geocoded location, and the key of its parcel.  The geocoder returns the
+        # same point for every spelling of an address, so the rounded location (about 0.1 m) identifies the parcel
+        x, y = location["x"], location["y"]
+        profile = {"address": location.get("address"), "score": location.get("score"), "x": x, "y": y}
+        return profile, (round(x, 6), round(y, 6))
+
+    def _add_cached_layers(self, profile, parcel):
+        # Add the cached layers of a parcel to a profile, returning False if they are not cached
+        with self._lock:
+            entry = self.parcels.get(parcel)
+            if entry is None or entry[0] <= time.time():
+                return False
+            self.parcels.move_to_end(parcel)
+            self.parcel_hits += 1
+        profile.update(entry[1])
+        return True
+
+    def _complete(self, address, profile, parcel, layers, errors):
+        # Add the queried layers to a profile and cache it if every query succeeded
+        profile.update(layers)
+        if errors:
+            # Partial profiles are not cached, so the next lookup tries the failed layers again
+            profile["errors"] = errors
+            return profile
+
+        # Keep the complete profile in the materialised parcel table, then in the in-process cache
+        PARCEL_TABLE.put(address, profile)
+        with self._lock:
+            self.parcels[parcel] = (time.time() + self.ttl, layers)
+            self.parcels.move_to_end(parcel)
+            while len(self.parcels) > self.size:
+                self.parcels.popitem(last=False)
+        return profile
+
+    def stats(self):
+        # Cache and coalescing counters for monitoring
+        return {
+            "parcels_cached": len(self.parcels),
+            "parcel_hits": self.parcel_hits,
+            "coalesced": self.coalesced,
+            "layer_lookups": self.lookups,
+            "in_flight": len(self.in_flight) + len(self.in_flight_async),
+        }
+
+
+# Shared property profiles for the application
+PROPERTY_PROFILES = PropertyProfiles()
@@ -0,0 +1,154 @@
+# Rate limit counters shared by the worker processes of one host, in a SQLite database
+#
+# With LIMITER_STORAGE_URI=memory:// every gunicorn or uvicorn worker keeps its own counters, so a client gets
+# each limit once per worker (4 workers: 40 assessments per 30 seconds instead of 10) and whichever worker a
+# request lands on decides it.  Redis shares the counters but is another service to run.  Importing this module
+# registers a limits storage backend for
+#   LIMITER_STORAGE_URI=sqlite:///var/tmp/exempt-rate-limits.db     (sqlite:// alone uses the temp directory)
+# which keeps the counters in a small SQLite database in WAL mode that every worker on the host opens.
+#
+# Flask-Limiter's default fixed-window strategy, which the RATE_LIMIT_* windows use, needs three operations per
+# limit: incr when a request is counted, and get and get_expiry for the X-RateLimit headers.  incr is a single
+# UPSERT ... RETURNING statement, so the increment, the start of a new window once the old one has expired and
+# reading back the count happen in one atomic write however many processes share the file.  The counters can be
+# rebuilt from nothing (a lost window only lets a client start afresh), so synchronous=OFF skips fsync entirely.
+# Expired windows are deleted about once a minute.
+#
+# The ASGI app (ExemptAssessASGI) uses the async+sqlite:// variant of the same URI: it runs the same statements
+# inline on the event loop, as each takes microseconds.
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import urllib.parse
+
+from limits.aio.storage import Storage as AsyncStorage
+from limits.storage import Storage
+
+# Database used by sqlite:// without a path
+DEFAULT_PATH = os.path.join(tempfile.gettempdir(), "exempt-rate-limits.db")
+# How long a worker waits for another worker's write before giving up (a limit check then fails with an error)
+BUSY_TIMEOUT_MS = int(os.getenv("RATE_LIMIT_BUSY_TIMEOUT_MS", 1000))
+# Seconds between deletions of expired windows
+PURGE_INTERVAL = 60
+
+CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS rate_limits (
+        key TEXT PRIMARY KEY,
+        count INTEGER NOT NULL,
+        expires REAL NOT NULL     -- end of the window, in seconds since the epoch
+    ) WITHOUT ROWID
+"""
+# Add to the window's count, or start a new window if there is none or it has expired, returning the new count
+INCR_SQL = """
+    INSERT INTO rate_limits (key, count, expires) VALUES (:key, :amount, :now + :expiry)
+    ON CONFLICT (key) DO UPDATE SET
+        count = CASE WHEN expires <= :now THEN :amount ELSE count + :amount END,
+        expires = CASE WHEN expires <= :now THEN :now + :expiry ELSE expires END
+    RETURNING count
+"""
+GET_SQL = "SELECT count FROM rate_limits WHERE key = ? AND expires > ?"
+GET_EXPIRY_SQL = "SELECT expires FROM rate_limits WHERE key = ? AND expires > ?"
+CLEAR_SQL = "DELETE FROM rate_limits WHERE key = ?"
+PURGE_SQL = "DELETE FROM rate_limits WHERE expires <= ?"
+RESET_SQL = "DELETE FROM rate_limits"
+
+
+def storage_path(uri):
+    # The database path of a sqlite:// URI: sqlite:///abs/path.db, sqlite://relative.db or sqlite:// (default)
+    parsed = urllib.parse.urlparse(uri or "")
+    return urllib.parse.unquote(parsed.netloc + parsed.path) or DEFAULT_PATH
+
+
+class SQLiteStorage(Storage):
+    # Fixed-window counters in a SQLite database shared by the processes on a host
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri=None, wrap_exceptions=False, **options):
+        self.path = storage_path(uri)
+        # One connection per thread, and new ones in a forked worker (connections must not be shared across a fork)
+        self._local = threading.local()
+        self._next_purge = 0.0
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self._connection()
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connection(self):
+        pid = os.getpid()
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != pid:
+            # Autocommit: each statement is its own transaction
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(CREATE_TABLE_SQL)
+            self._local.conn = conn
+            self._local.pid = pid
+        return conn
+
+    def incr(self, key, expiry, amount=1):
+        now = time.time()
+        conn = self._connection()
+        if now >= self._next_purge:
+            self._next_purge = now + PURGE_INTERVAL
+            conn.execute(PURGE_SQL, (now,))
+        return conn.execute(INCR_SQL, {"key": key, "amount": amount, "now": now, "expiry": expiry}).fetchone()[0]
+
+    def get(self, key):
+        row = self._connection().execute(GET_SQL, (key, time.time())).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key):
+        now = time.time()
+        row = self._connection().execute(GET_EXPIRY_SQL, (key, now)).fetchone()
+        return row[0] if row else now
+
+    def check(self):
+        try:
+            self._connection().execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        return self._connection().execute(RESET_SQL).rowcount
+
+    def clear(self, key):
+        self._connection().execute(CLEAR_SQL, (key,))
+
+
+class AsyncSQLiteStorage(AsyncStorage):
+    # async+sqlite:// for the limits asyncio strategies, running the SQLiteStorage statements inline
+    STORAGE_SCHEME = ["async+sqlite"]
+
+    def __init__(self, uri=None, wrap_exceptions=False, **options):
+        self.storage = SQLiteStorage(uri.replace("async+", "", 1) if uri else None, wrap_exceptions, **options)
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    async def incr(self, key, expiry, amount=1):
+        return self.storage.incr(key, expiry, amount)
+
+    async def get(self, key):
+        return self.storage.get(key)
+
+    async def get_expiry(self, key):
+        return self.storage.get_expiry(key)
+
+    async def check(self):
+        return self.storage.check()
+
+    async def reset(self):
+        return self.storage.reset()
+
+    async def clear(self, key):
+        self.storage.clear(key)
@@ -0,0 +1,161 @@
+# Per-stage request latency metrics, served at /metrics and in Server-Timing headers
+#
+# A slow /get-assessment-result/ or /geocode call could not be traced to the stage that was slow: the scheduler
+# queue, attribute normalisation, rule evaluation, the database write or ArcGIS.  Code times each stage with
+#   with METRICS.stage("rules"):
+#       ...
+# which records the duration in a histogram for the stage (work_scheduler.Histogram, with buckets down to 10 us,
+# as the rules take microseconds) and adds it to the timings of the current request, if it is being timed
+# (begin_request()).  end_request() records the request's duration and returns its stage timings as a
+# Server-Timing header value, so they show in the browser's network panel.
+#
+# The timings of a request are held in a context variable, so stages run on a scheduler worker thread (jobs run
+# in a copy of the submitting context), in another executor with contextvars.copy_context() or in an asyncio task
+# are added to the request that started them.  Stages run outside a request (the write-behind database writer)
+# only feed the histograms.
+#
+# render() writes the histograms and the counters (assessments by outcome, responses by status, rate-limited
+# requests) in the Prometheus text format.  Like the other stats, the metrics are kept per worker process.
+
+import contextvars
+import threading
+from time import perf_counter
+
+from work_scheduler import Histogram
+
+# Histogram bucket upper bounds in seconds for stages and requests
+STAGE_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Timed stages and what they cover
+STAGES = {
+    "queue": "Waiting in the assessment scheduler queue",
+    "assess": "Assessment: input validation, the result cache lookup and the rules on a miss",
+    "normalise": "Input schema validation and normalisation",
+    "rules": "Rule evaluation and result formatting",
+    "encode": "JSON encoding of the assessment response, reused for its log row",
+    "log": "Queueing the assessment for the database writer",
+    "db_write": "Database transaction of the write-behind assessment logger (one per batch of rows)",
+    "geocode": "Geocode lookup, from the geocode cache or ArcGIS",
+    "arcgis": "ArcGIS geocode request",
+}
+
+# Counters with their label names and what they count
+COUNTERS = {
+    "assessments": (("context",), "Assessments by outcome"),
+    "responses": (("endpoint", "status"), "Responses by route and status code"),
+    "rate_limited": (("endpoint",), "Requests rejected by the rate limiter"),
+}
+
+# Metric name prefix
+PREFIX = "exempt"
+
+# Stage timings of the request being handled in this context: a list of (stage, seconds), or None
+_REQUEST_TIMINGS = contextvars.ContextVar("request_timings", default=None)
+
+
+class _StageTimer:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.metrics.record(self.name, perf_counter() - self.start)
+
+
+def _label_value(value):
+    # A label value escaped for the Prometheus text format
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    return ",".join(f'{name}="{_label_value(value)}"' for name, value in zip(names, values))
+
+
+class RequestMetrics:
+    def __init__(self, stages=STAGES, counters=COUNTERS, buckets=STAGE_BUCKETS):
+        self.buckets = buckets
+        self.stages = {name: Histogram(buckets) for name in stages}
+        # route -> Histogram of request durations
+        self.requests = {}
+        # counter name -> {label values: count}
+        self.counter_labels = {name: labels for name, (labels, _) in counters.items()}
+        self.counter_descriptions = {name: description for name, (_, description) in counters.items()}
+        self.counters = {name: {} for name in counters}
+        self._lock = threading.Lock()
+
+    def _add_histogram(self, histograms, name):
+        # The histogram for a stage or route seen for the first time
+        with self._lock:
+            return histograms.setdefault(name, Histogram(self.buckets))
+
+    def stage(self, name):
+        # Context manager timing one stage
+        return _StageTimer(self, name)
+
+    def record(self, name, seconds):
+        # Record the duration of a stage, in its histogram and the current request's timings
+        (self.stages.get(name) or self._add_histogram(self.stages, name)).observe(seconds)
+        timings = _REQUEST_TIMINGS.get()
+        if timings is not None:
+            timings.append((name, seconds))
+
+    def count(self, name, *labels):
+        # Add one to a counter for the given label values
+        values = self.counters[name]
+        with self._lock:
+            values[labels] = values.get(labels, 0) + 1
+
+    def begin_request(self):
+        # Start collecting the stage timings of a request in this context, returning its start time
+        _REQUEST_TIMINGS.set([])
+        return perf_counter()
+
+    def end_request(self, route, started):
+        # Record the duration of the request and return its Server-Timing header value
+        total = perf_counter() - started
+        (self.requests.get(route) or self._add_histogram(self.requests, route)).observe(total)
+        timings = _REQUEST_TIMINGS.get() or ()
+        _REQUEST_TIMINGS.set(None)
+        return "".join(["%s;dur=%.3f, " % (name, seconds * 1000) for name, seconds in timings]) \
+            + "total;dur=%.3f" % (total * 1000)
+
+    def render(self):
+        # The histograms and counters in the Prometheus text exposition format
+        lines = []
+        self._render_histograms(lines, "stage_duration_seconds", "Time spent in each stage of a request",
+                                "stage", self.stages)
+        self._render_histograms(lines, "request_duration_seconds", "Request duration by route", "route",
+                                self.requests)
+        for name, values in self.counters.items():
+            metric = f"{PREFIX}_{name}_total"
+            lines.append(f"# HELP {metric} {self.counter_descriptions[name]}")
+            lines.append(f"# TYPE {metric} counter")
+            with self._lock:
+                values = sorted(values.items())
+            for labels, value in values:
+                lines.append(f"{metric}{{{_labels(self.counter_labels[name], labels)}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _render_histograms(lines, name, description, label, histograms):
+        metric = f"{PREFIX}_{name}"
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} histogram")
+        for key, histogram in sorted(histograms.items()):
+            snapshot = histogram.snapshot()
+            series = _labels((label,), (key,))
+            for bound, count in snapshot["buckets"].items():
+                lines.append(f'{metric}_bucket{{{series},le="{bound}"}} {count}')
+            lines.append(f"{metric}_sum{{{series}}} {snapshot['sum']}")
+            lines.append(f"{metric}_count{{{series}}} {snapshot['count']}")
+
+
+# Shared metrics of the application (one set per worker process)
+METRICS = RequestMetrics()
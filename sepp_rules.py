@@ -0,0 +1,411 @@
+# Table-driven SEPP rule engine for shed, patio and retaining wall assessments
+#
+# Each SEPP clause is expressed as data: a reason code, the clause anchor used to build the
+# legislation link, the message shown to the user and a list of conditions.  A condition is
+# (attribute, comparator, threshold) and the rule fires when every condition holds.  Conditions are
+# checked in order and stop at the first one that fails, so an attribute is only read when the
+# original hand-written branch would have read it (this keeps the "Missing or invalid input data"
+# behaviour identical).  A threshold can also be (other_attribute, factor), meaning factor * other.
+#
+# The tables are compiled once at import into one straight-line Python function per development
+# type, so an assessment is a single pass of plain comparisons that appends reason codes.
+
+import hashlib
+import sys
+
+# SEPP legislation page; a clause anchor appended to it links to the clause
+SEPP_URL = "https://legislation.nsw.gov.au/view/html/inforce/current/epi-2008-0572#"
+
+# Zone groups used across the SEPP clauses
+SUPPORTED_ZONES = ("R1", "R2", "R3", "R4", "R5", "RU1", "RU2", "RU3", "RU4", "RU6")
+RESIDENTIAL_ZONES = ("R1", "R2", "R3", "R4")
+LARGE_LOT_ZONES = ("R5", "RU1", "RU2", "RU3", "RU4", "RU6")
+RURAL_ZONES = ("RU1", "RU2", "RU3", "RU4", "RU6")
+
+# Reason code and messages for a zone type the tool does not support (assessment stops here)
+UNSUPPORTED_ZONE = "ZONE_UNSUPPORTED"
+UNSUPPORTED_ZONE_MESSAGE = "This tool does not currently support your zone type.  Please contact Albury City Council for further assistance."
+
+# Common header/footer messages for the assessment output
+NOT_EXEMPT_HEADER = "The proposed structure DOES NOT qualify for exempt development for the following reasons:"
+EXEMPT_MESSAGE = "The proposed structure qualifies for exempt development. For more information, please refer to the State Environmental Planning Policy legislation:"
+INVALID_INPUT_MESSAGE = "Missing or invalid input data. Please check all required fields are provided and valid."
+
+# Output for a development type that has no rule-set
+UNSUPPORTED_DEVELOPMENT = (["The development type is not supported."], ["Please use 'shed' or 'patio' as the development type."], "Invalid")
+
+# Comparators available to rule conditions, as Python expression templates
+COMPARATORS = {
+    "==": "{value} == {threshold}",
+    "!=": "{value} != {threshold}",
+    ">": "{value} > {threshold}",
+    "<": "{value} < {threshold}",
+    "not >": "not {value} > {threshold}",
+    "in": "{value} in {threshold}",
+    "not in": "{value} not in {threshold}",
+    "has": "{attribute} in attributes",
+}
+
+
+# Clause 2.11 and 2.12 - Balconies, decks, patios, pergolas, terraces and verandahs
+PATIO_RULES = [
+    {"code": UNSUPPORTED_ZONE, "clause": "", "stop": True,
+     "when": [("zoning", "not in", SUPPORTED_ZONES)],
+     "message": UNSUPPORTED_ZONE_MESSAGE},
+    {"code": "PATIO_REPLACEMENT_HEIGHT", "clause": "sec.2.11 (b)",
+     "when": [("structure_type", "==", "replacement"), ("height_existing", ">", 1000)],
+     "message": "The proposed structure cannot replace an existing structure that is higher than 1m above ground level. Please refer to the State Environmental Planning Policy legislation for height restrictions:"},
+    {"code": "PATIO_REPLACEMENT_MATERIAL", "clause": "sec.2.12 (2)(a)",
+     "when": [("structure_type", "==", "replacement"), ("material_quality", "==", "no")],
+     "message": "The replacement must use materials of equal or better quality. Please refer to the State Environmental Planning Policy legislation for material quality restrictions:"},
+    {"code": "PATIO_REPLACEMENT_SIZE", "clause": "sec.2.12 (2)(b)",
+     "when": [("structure_type", "==", "replacement"), ("same_size", "==", "no")],
+     "message": "The replacement must be the same size and height as the existing structure. Please refer to the State Environmental Planning Policy legislation for size and height restrictions:"},
+    {"code": "PATIO_HERITAGE", "clause": "sec.2.11 (a)",
+     "when": [("heritage", "==", "yes")],
+     "message": "The property is a heritage item. Please refer to the State Environmental Planning Policy legislation for heritage item restrictions:"},
+    {"code": "PATIO_FORESHORE", "clause": "sec.2.11 (b)",
+     "when": [("foreshore", "==", "yes")],
+     "message": "The property is located in a foreshore area. Please refer to the State Environmental Planning Policylegislation for foreshore area restrictions:"},
+    {"code": "PATIO_AREA", "clause": "sec.2.12 (1)(b)",
+     "when": [("area", ">", 25)],
+     "message": "The structure floor area is more than 25 m². Please refer to the State Environmental Planning Policy legislation for floor area restrictions:"},
+    {"code": "PATIO_TOTAL_AREA_LARGE_LOT", "clause": "sec.2.12 (1)(c)(i)",
+     "when": [("area", "not >", 25), ("land_size", ">", 300), ("total_structures_area", ">", ("land_size", 0.15))],
+     "message": "The combined floor area of similar structures is over the limit for this lot size. Please refer to the State Environmental Planning Policy legislation for total floor area restrictions:"},
+    {"code": "PATIO_TOTAL_AREA_SMALL_LOT", "clause": "sec.2.12 (1)(c)(ii)",
+     "when": [("area", "not >", 25), ("land_size", "not >", 300), ("total_structures_area", ">", 25)],
+     "message": "The combined floor area of similar structures is over the limit for this lot size. Please refer to the State Environmental Planning Policy legislation for total floor area restrictions:"},
+    {"code": "PATIO_WALL_HEIGHT", "clause": "sec.2.12 (1)(d)",
+     "when": [("wall_height", "==", "yes")],
+     "message": "The wall height exceeds 1.4m. Please refer to the State Environmental Planning Policy legislation for wall height restrictions:"},
+    {"code": "PATIO_BUILDING_LINE", "clause": "sec.2.12 (1)(e)",
+     "when": [("behind_building_line", "==", "no")],
+     "message": "The structure must be behind the front building line of road frontage. Please refer to the State Environmental Planning Policy legislation for building line restrictions:"},
+    {"code": "PATIO_BOUNDARY_RESIDENTIAL", "clause": "sec.2.12 (1)(f)(ii)",
+     "when": [("zoning", "in", RESIDENTIAL_ZONES), ("boundary_distance", "<", 900)],
+     "message": "The structure must be at least 900mm from any lot boundary for this zone type. Please refer to the State Environmental Planning Policy legislation for boundary distance restrictions:"},
+    {"code": "PATIO_BOUNDARY_LARGE_LOT", "clause": "sec.2.12 (1)(f)(i)",
+     "when": [("zoning", "in", LARGE_LOT_ZONES), ("boundary_distance", "<", 5000)],
+     "message": "The structure must be at least 5000mm from any lot boundary for this zone type. Please refer to the State Environmental Planning Policy legislation for boundary distance restrictions:"},
+    {"code": "PATIO_METAL", "clause": "sec.2.12 (1)(h)",
+     "when": [("metal", "==", "yes"), ("reflective", "==", "no")],
+     "message": "The metal components must be low-reflective and factory pre-coloured. Please refer to the State Environmental Planning Policy legislation for metal component restrictions:"},
+    {"code": "PATIO_FLOOR_HEIGHT", "clause": "sec.2.12 (1)(i)",
+     "when": [("floor_height", ">", 1000)],
+     "message": "The floor height exceeds 1m above ground level. Please refer to the State Environmental Planning Policy legislation for floor height restrictions:"},
+    {"code": "PATIO_OVERHANG", "clause": "sec.2.12 (1)(i1)",
+     "when": [("roof", "==", "yes"), ("overhang", ">", 600)],
+     "message": "The roof overhang exceeds 600mm. Please refer to the State Environmental Planning Policy legislation for roof overhang restrictions:"},
+    {"code": "PATIO_ABOVE_GUTTER", "clause": "sec.2.12 (1)(j)",
+     "when": [("roof", "==", "yes"), ("attached", "==", "yes"), ("above_gutter", "==", "yes")],
+     "message": "The roof must not extend above the dwelling’s gutter line. Please refer to the State Environmental Planning Policy legislation for roof height restrictions:"},
+    {"code": "PATIO_FASCIA", "clause": "sec.2.12 (1)(k)",
+     "when": [("roof", "==", "yes"), ("attached", "==", "yes"), ("fascia_connection", "==", "yes"), ("engineer_spec", "==", "no")],
+     "message": "The fascia connection is not compliant with professional specifications. Please refer to the State Environmental Planning Policy legislation for fascia connection restrictions:"},
+    # Roof height based on https://www.planningportal.nsw.gov.au/development-and-assessment/planning-approval-pathways/exempt-development/balconies-decks-and-patios
+    {"code": "PATIO_ROOF_HEIGHT", "clause": "sec.2.12 (1)(j1)",
+     "when": [("roof", "==", "yes"), ("roof_height", ">", 3)],
+     "message": "The roof’s highest point is over 3m above ground level. Please refer to the State Environmental Planning Policy legislation for roof height restrictions:"},
+    {"code": "PATIO_STORMWATER", "clause": "sec.2.12 (1)(l)",
+     "when": [("roof", "==", "yes"), ("stormwater", "==", "no")],
+     "message": "The roofwater does not dispose into an stormwater drainage system. Please refer to the State Environmental Planning Policy legislation for stormwater disposal restrictions:"},
+    {"code": "PATIO_DRAINAGE", "clause": "sec.2.12 (1)(m)",
+     "when": [("drainage", "==", "yes")],
+     "message": "The proposed development interferes with existing drainage fixtures or flow paths. Please refer to the State Environmental Planning Policy legislation for drainage restrictions:"},
+    {"code": "PATIO_BUSHFIRE", "clause": "sec.2.12 (1)(n)",
+     "when": [("bushfire", "==", "yes"), ("distance_dwelling", "<", 5), ("non_combustible", "==", "no")],
+     "message": "The bushfire material standards are not met. Please refer to the State Environmental Planning Policy legislation for bushfire restrictions:"},
+]
+
+
+# Clause 2.17 and 2.18 - Cabanas, cubby houses, ferneries, garden sheds, gazebos and greenhouses
+SHED_RULES = [
+    {"code": UNSUPPORTED_ZONE, "clause": "", "stop": True,
+     "when": [("zoning", "not in", SUPPORTED_ZONES)],
+     "message": UNSUPPORTED_ZONE_MESSAGE},
+    {"code": "SHED_HERITAGE", "clause": "sec.2.17 (a)",
+     "when": [("heritage", "==", "yes")],
+     "message": "The property is a heritage item. Please refer to the State Environmental Planning Policy legislation for heritage item restrictions:"},
+    {"code": "SHED_FORESHORE", "clause": "sec.2.17 (b)",
+     "when": [("foreshore", "==", "yes")],
+     "message": "The property is located in a foreshore area. Please refer to the State Environmental Planning Policy legislation for foreshore area restrictions:"},
+    {"code": "SHED_SENSITIVE_AREA", "clause": "sec.2.17 (b)",
+     "when": [("sensitive_area", "==", "yes")],
+     "message": "The property is located in an environmentally sensitive area. Please refer to the State Environmental Planning Policy legislation for environmentally sensitive area restrictions:"},
+    {"code": "SHED_AREA_RESIDENTIAL", "clause": "sec.2.18 (1)(b)(ii)",
+     "when": [("zoning", "in", RESIDENTIAL_ZONES), ("area", ">", 20)],
+     "message": "The proposed structure's floor area exceeds the limit of 20m². Please refer to the State Environmental Planning Policy legislation for floor area restrictions:"},
+    {"code": "SHED_AREA_LARGE_LOT", "clause": "sec.2.18 (1)(b)(i)",
+     "when": [("zoning", "in", LARGE_LOT_ZONES), ("area", ">", 50)],
+     "message": "The proposed structure's floor area exceeds the limit of 50m². Please refer to the State Environmental Planning Policy legislation for floor area restrictions:"},
+    {"code": "SHED_HEIGHT", "clause": "sec.2.18 (1)(c)",
+     "when": [("height", ">", 3)],
+     "message": "The proposed structure is higher than 3m above ground level. Please refer to the State Environmental Planning Policy legislation for height restrictions:"},
+    {"code": "SHED_BOUNDARY_RESIDENTIAL", "clause": "sec.2.18 (1)(d)(ii)",
+     "when": [("zoning", "in", RESIDENTIAL_ZONES), ("boundary_distance", "<", 900)],
+     "message": "The structure must be at least 900mm from any lot boundary. Please refer to the State Environmental Planning Policy legislation for boundary distance restrictions:"},
+    {"code": "SHED_BOUNDARY_LARGE_LOT", "clause": "sec.2.18 (1)(d)(i)",
+     "when": [("zoning", "in", LARGE_LOT_ZONES), ("boundary_distance", "<", 5000)],
+     "message": "The structure must be at least 5000mm from any lot boundary. Please refer to the State Environmental Planning Policy legislation for boundary distance restrictions:"},
+    {"code": "SHED_BUILDING_LINE", "clause": "sec.2.18 (1)(e)",
+     "when": [("building_line", "==", "no"), ("zoning", "not in", RURAL_ZONES)],
+     "message": "The structure must be behind the building line of road frontage. Please refer to the State Environmental Planning Policy legislation for building line restrictions:"},
+    {"code": "SHED_SHIPPING_CONTAINER", "clause": "sec.2.18 (1)(f)",
+     "when": [("shipping_container", "==", "yes")],
+     "message": "Shipping containers are not allowed. Please refer to the State Environmental Planning Policy legislation for shipping container restrictions:"},
+    {"code": "SHED_STORMWATER", "clause": "sec.2.18 (1)(g)",
+     "when": [("stormwater", "==", "no")],
+     "message": "The roofwater disposal may affect your neighbours. Please refer to the State Environmental Planning Policy legislation for stormwater disposal restrictions:"},
+    {"code": "SHED_METAL", "clause": "sec.2.18 (1)(h)",
+     "when": [("metal", "==", "yes"), ("reflective", "==", "no")],
+     "message": "The metal components are not compliant. Please refer to the State Environmental Planning Policy legislation for metal component restrictions:"},
+    {"code": "SHED_BUSHFIRE", "clause": "sec.2.18 (1)(i)",
+     "when": [("bushfire", "==", "yes"), ("distance_dwelling", "<", 5), ("non_combustible", "==", "no")],
+     "message": "The bushfire material standards are not met. Please refer to the State Environmental Planning Policy legislation for bushfire restrictions:"},
+    # heritage_conserv and rear_yard are optional for backward compatibility with older clients
+    {"code": "SHED_HERITAGE_CONSERVATION", "clause": "sec.2.18 (1)(j)",
+     "when": [("heritage_conserv", "has", None), ("rear_yard", "has", None),
+              ("heritage_conserv", "==", "yes"), ("rear_yard", "==", "no")],
+     "message": "The structure must be in the rear yard if in a heritage conservation area. Please refer to the State Environmental Planning Policy legislation for heritage conservation area restrictions:"},
+    {"code": "SHED_ADJACENT_BUILDING", "clause": "sec.2.18 (1)(k)",
+     "when": [("adjacent_building", "==", "yes"), ("interfere", "==", "yes")],
+     "message": "The structure interferes with building access or safety. Please refer to the State Environmental Planning Policy legislation for adjacent building restrictions:"},
+    {"code": "SHED_HABITABLE", "clause": "sec.2.18 (1)(l)",
+     "when": [("habitable", "==", "yes")],
+     "message": "The proposed structure cannot be used as habitable buildings. Please refer to the State Environmental Planning Policy legislation for habitable building restrictions:"},
+    {"code": "SHED_EASEMENT", "clause": "sec.2.18 (1)(m)",
+     "when": [("easement", "==", "yes")],
+     "message": "The proposed structure must be at least 1m from any easement. Please refer to the State Environmental Planning Policy legislation for easement restrictions:"},
+    {"code": "SHED_SERVICES", "clause": "sec.2.18 (1)(n) ",
+     "when": [("services", "==", "yes")],
+     "message": "Service connections are not allowed. Please refer to the State Environmental Planning Policy legislation for service connection restrictions:"},
+    {"code": "SHED_EXISTING_STRUCTURES", "clause": "sec.2.18 (2)",
+     "when": [("existing_structures", "==", "yes")],
+     "message": "More than two similar structures already exist on the property. Please refer to the State Environmental Planning Policy legislation for existing structure restrictions:"},
+]
+
+
+# Clause 2.29 and 2.30 - Earthworks, retaining walls and structural support
+RETAIN_WALL_RULES = [
+    {"code": UNSUPPORTED_ZONE, "clause": "", "stop": True,
+     "when": [("zoning", "not in", SUPPORTED_ZONES)],
+     "message": UNSUPPORTED_ZONE_MESSAGE},
+    {"code": "RETAIN_HERITAGE", "clause": "sec.2.29",
+     "when": [("heritage", "==", "yes")],
+     "message": "The property is a heritage item. Please refer to the State Environmental Planning Policy legislation for heritage item restrictions:"},
+    {"code": "RETAIN_FORESHORE", "clause": "sec.2.29",
+     "when": [("foreshore", "==", "yes")],
+     "message": "The property is located in a foreshore area. Please refer to the State Environmental Planning Policy legislation for foreshore area restrictions:"},
+    {"code": "RETAIN_FLOOD_CONTROL", "clause": "sec.2.29",
+     "when": [("flood_control_lot", "==", "yes")],
+     "message": "The property is located in an flood control lot. Please refer to the State Environmental Planning Policy legislation for flood control lot restrictions:"},
+    {"code": "RETAIN_CUT_FILL", "clause": "sec.2.30 (a)",
+     "when": [("cut_or_fill", ">", 600)],
+     "message": "Cut or Fill of Retaining Wall exceeds 600mm.  Please refer to the State Environmental Planning Policy legislation for cut and fill restrictions:"},
+    {"code": "RETAIN_BOUNDARY", "clause": "sec.2.30 (b)",
+     "when": [("boundary_distance", "<", 1000)],
+     "message": "The Retaining Wall must be at least 1000mm from any lot boundary. Please refer to the State Environmental Planning Policy legislation for boundary distance restrictions:"},
+    {"code": "RETAIN_HERITAGE_CONSERVATION", "clause": "sec.2.30 (c)",
+     "when": [("heritage_conserv", "==", "yes"), ("rear_yard", "==", "no")],
+     "message": "For a property in a heritage conservation area, development must be in rear yard. Please refer to the State Environmental Planning Policy legislation for heritage conservation area restrictions:"},
+    {"code": "RETAIN_WATERBODY", "clause": "sec.2.30 (d)",
+     "when": [("waterbody_within_40m", "==", "yes")],
+     "message": "The retaining wall is less than 40m from a natural waterbody. Please refer to the State Environmental Planning Policy legislation for natural waterbody restrictions:"},
+    {"code": "RETAIN_SEDIMENT", "clause": "sec.2.30 (e)",
+     "when": [("sediment_transfer", "==", "yes")],
+     "message": "The retaining wall may causes sediment transfer to adjoining property. Please refer to the State Environmental Planning Policy legislation for water flow restrictions:"},
+    {"code": "RETAIN_HEIGHT", "clause": "sec.2.30 (f)(i)",
+     "when": [("height", ">", 600)],
+     "message": "The retaining wall exceeds 600mm in height. Please refer to the State Environmental Planning Policy legislation for retaining wall height restrictions:"},
+    {"code": "RETAIN_DISTANCE_OTHER", "clause": "sec.2.30 (f)(ii)",
+     "when": [("distance_other", "<", 2000)],
+     "message": "The retaining wall is less than 2000mm from another structural support. Please refer to the State Environmental Planning Policy legislation for structural support distance restrictions:"},
+    {"code": "RETAIN_DISTANCE_EASEMENT", "clause": "sec.2.30 (f)(iii)",
+     "when": [("distance_easement", "<", 1000)],
+     "message": "The retaining wall is less than 1000mm from a registered easement or services main. Please refer to the State Environmental Planning Policy legislation for easement and services main distance restrictions:"},
+    {"code": "RETAIN_STORMWATER", "clause": "sec.2.30 (f)(iv)",
+     "when": [("stormwater", "==", "no")],
+     "message": "The retaining wall does not dispose of stormwater adequately. Please refer to the State Environmental Planning Policy legislation for stormwater disposal restrictions:"},
+    {"code": "RETAIN_FILL_AREA", "clause": "sec.2.30 (g)",
+     "when": [("fill_depth", ">", 150), ("fill_area", ">", ("land_size", 0.25))],
+     "message": "The fill exceeds 150mm and occupies more than 25% of the lot area. Please refer to the State Environmental Planning Policy legislation for fill restrictions:"},
+    {"code": "RETAIN_IMPORTED_FILL", "clause": "sec.2.30 (h)",
+     "when": [("imported_fill", "==", "yes"), ("venm", "==", "no")],
+     "message": "Imported fill must be VENM (virgin excavated natural material. Please refer to the State Environmental Planning Policy legislation for imported fill restrictions:"},
+    # Only the rural zones are checked here; the heritage conservation area part of this rule has never been applied
+    {"code": "RETAIN_FILL_VOLUME", "clause": "sec.2.30 (i)",
+     "when": [("zoning", "in", RURAL_ZONES), ("fill_volume", ">", 100)],
+     "message": "The fill volume exceeds 100m³ for rural zones or heritage conservation areas. Please refer to the State Environmental Planning Policy legislation for fill volume restrictions:"},
+]
+
+
+# Rule sets by development type: (label for console output, rules, SEPP anchor for an exempt result)
+RULE_SETS = {
+    "patio": ("Patio", PATIO_RULES, "pt.2-div.1-sdiv.6"),
+    "shed": ("Shed", SHED_RULES, "pt.2-div.1-sdiv.9"),
+    "retain": ("Retaining Wall", RETAIN_WALL_RULES, "pt.2-div.1-sdiv.15"),
+}
+
+
+def _compile_condition(condition):
+    """ Compile a single (attribute, comparator, threshold) condition into a Python expression reading the
+        attributes of a validated input record (input_schemas).  Attribute names and thresholds are plain
+        strings, numbers or tuples, so they are embedded as literals """
+    attribute, comparator, threshold = condition
+    value = f"attributes.{attribute}"
+
+    if isinstance(threshold, tuple) and comparator not in ("in", "not in"):
+        # Threshold relative to another attribute, e.g. 15% of the land size
+        other, factor = threshold
+        threshold_expression = f"{factor!r} * attributes.{other}"
+    else:
+        threshold_expression = repr(threshold)
+
+    return "(" + COMPARATORS[comparator].format(value=value, threshold=threshold_expression, attribute=repr(attribute)) + ")"
+
+
+# Comparators that are the exact opposite of each other
+NEGATED_COMPARATORS = {"==": "!=", "!=": "==", ">": "not >", "not >": ">", "in": "not in", "not in": "in"}
+
+
+def _negates(condition, other):
+    """ True if other holds exactly when condition does not (same attribute and threshold, opposite comparator) """
+    attribute, comparator, threshold = condition
+    return other == (attribute, NEGATED_COMPARATORS.get(comparator), threshold)
+
+
+def _emit_rules(pending, indent, lines):
+    """ Emit nested if statements for a list of (rule, remaining_conditions).  Consecutive rules that share
+        the same next condition are grouped under one if statement, so a shared guard such as roof == "yes"
+        is tested once, as the hand-written branches did """
+    index = 0
+    previous = None  # guard of the if statement just emitted at this level, while it can still take an else
+    while index < len(pending):
+        rule, conditions = pending[index]
+        if not conditions:
+            lines.append(f"{indent}add({rule['code']!r})")
+            if rule.get("stop", False):
+                lines.append(f"{indent}return")
+            previous = None
+            index += 1
+            continue
+
+        group_end = index + 1
+        while group_end < len(pending) and pending[group_end][1][:1] == conditions[:1]:
+            group_end += 1
+        if previous is not None and _negates(previous, conditions[0]):
+            # Guarded by the opposite of the previous if (area > 25, then not area > 25): emit its else branch,
+            # so the condition is tested once, as the hand-written branches did
+            lines.append(f"{indent}else:")
+            previous = None
+        else:
+            lines.append(f"{indent}if {_compile_condition(conditions[0])}:")
+            previous = conditions[0]
+        _emit_rules([(grouped_rule, grouped_conditions[1:]) for grouped_rule, grouped_conditions in pending[index:group_end]],
+                    indent + "    ", lines)
+        index = group_end
+
+
+def _compile_rules(development, rules):
+    """ Compile a rule table into a single flat function that appends the reason code of every rule that
+        fires to a list, reading the attributes of a validated input record.  Conditions are tested in table
+        order and stop at the first that fails, exactly like the nested if statements they replace """
+    name = f"_evaluate_{development}"
+    lines = [f"def {name}(attributes, codes):", "    add = codes.append"]
+    _emit_rules([(rule, rule["when"]) for rule in rules], "    ", lines)
+
+    namespace = {}
+    exec(compile("\n".join(lines), f"<sepp_rules:{development}>", "exec"), namespace)
+    return namespace[name]
+
+
+# Compiled evaluators and reason code lookups, built once at import
+COMPILED_RECORD_RULES = {development: _compile_rules(development, rules) for development, (_, rules, _) in RULE_SETS.items()}
+REASONS = {development: {rule["code"]: (rule["message"], rule["clause"]) for rule in rules}
+           for development, (_, rules, _) in RULE_SETS.items()}
+# Reverse lookup from an output (message, section) pair to its reason code, used to index results logged
+# without their codes (assessment_migrate.py)
+REASON_CODES = {development: {reason: code for code, reason in reasons.items()} for development, reasons in REASONS.items()}
+
+
+def _rule_inputs(rules):
+    """ Names of the attributes a rule table reads, including those scaled by a relative threshold """
+    names = set()
+    for rule in rules:
+        for attribute, comparator, threshold in rule["when"]:
+            names.add(attribute)
+            if isinstance(threshold, tuple) and comparator not in ("in", "not in"):
+                names.add(threshold[0])
+    return tuple(sorted(names))
+
+
+# Attributes read by each development type's rules, so results can be memoised on just those inputs
+RULE_INPUTS = {development: _rule_inputs(rules) for development, (_, rules, _) in RULE_SETS.items()}
+# Fingerprint of the rule tables (conditions, messages and clauses); it changes whenever a rule changes,
+# so memoised results from an earlier rule set are never served
+RULES_VERSION = hashlib.sha256(repr(sorted(RULE_SETS.items())).encode()).hexdigest()[:16]
+
+
+def _build_catalog():
+    """ Reason code -> (message, clause anchor, SEPP URL) for every rule, with the strings interned and the
+        URLs built once (a rule without a clause, such as an unsupported zone, has no URL) """
+    catalog = {}
+    for _, rules, _ in RULE_SETS.values():
+        for rule in rules:
+            url = sys.intern(SEPP_URL + rule["clause"]) if rule["clause"] else ""
+            catalog[rule["code"]] = (sys.intern(rule["message"]), rule["clause"], url)
+    return catalog
+
+
+# Reason code catalog, shared by every response.  The codes are stable (they are also stored in the
+# assessment_reasons table), so a client holding the catalog can expand a compact response itself
+CATALOG = _build_catalog()
+# Link shown with an Exempt result for each development type
+EXEMPT_URLS = {development: SEPP_URL + anchor for development, (_, _, anchor) in RULE_SETS.items()}
+
+
+def evaluate_record(development, record):
+    """ Run the compiled rules for a development type over a validated input record, returning
+        (reason_codes, missing) where missing is the name of the first attribute the rules needed that was
+        not submitted, or None.  The record's values already have the right types, so that is the only
+        way the rules can fail """
+    codes = []
+    try:
+        COMPILED_RECORD_RULES[development](record, codes)
+    except AttributeError as error:
+        return codes, error.name
+    return codes, None
+
+
+def outcome(codes):
+    """ The assessment context ("Exempt" or "Non-Exempt") for the reason codes of an assessment """
+    return "Non-Exempt" if codes else "Exempt"
+
+
+def expand(development, codes):
+    """ Build the verbose output of an assessment from the catalog: each message followed by its SEPP link,
+        under the Non-Exempt header, or the Exempt message and link """
+    if not codes:
+        return [EXEMPT_MESSAGE, EXEMPT_URLS[development]]
+    full_result = [NOT_EXEMPT_HEADER]
+    for code in codes:
+        message, _, url = CATALOG[code]
+        full_result.append(message)
+        if url:
+            full_result.append(url)
+    return full_result
+
+
+def catalog_document():
+    """ The reason catalog as served to clients that expand compact (?format=codes) responses themselves """
+    return {
+        "version": RULES_VERSION,
+        "reasons": {code: {"message": message, "clause": clause, "url": url}
+                    for code, (message, clause, url) in CATALOG.items()},
+        "exempt": {"message": EXEMPT_MESSAGE, "urls": EXEMPT_URLS},
+        "not_exempt_header": NOT_EXEMPT_HEADER,
+        "invalid_input": INVALID_INPUT_MESSAGE,
+        "unsupported_development": UNSUPPORTED_DEVELOPMENT[0] + UNSUPPORTED_DEVELOPMENT[1],
+    }
+
@@ -0,0 +1,302 @@
+# Offline GIS layers: local store and in-process spatial index
+#
+# The zoning, heritage, bushfire, foreshore building line and biodiversity layers come from the NSW mapprod
+# ArcGIS MapServers, which are slow and sometimes down.  The ingest command loads a layer for the LGA from
+# an exported GeoJSON file (WGS84 longitude/latitude, e.g. a MapServer query with f=geojson&outSR=4326) into
+# the local SQLite store.  Each worker builds an in-process index from the store: an STR-packed R-tree over
+# the polygon bounding boxes, then an exact point-in-polygon test (holes and multipolygons included) on the
+# candidates, so a property lookup is a local query with no network call.
+#
+# A layer is only used for points inside the bounding box of its ingested features; anything outside (or
+# a layer that has not been ingested) falls back to the live MapServer.  Workers reload the index within
+# GIS_RELOAD_CHECK_SECONDS of a new ingest, without a restart.
+#
+# Usage (from the repository root):
+#   python spatial_index.py ingest zoning zoning.geojson [--db gis_layers.db]
+#   python spatial_index.py info [--db gis_layers.db]
+#   python spatial_index.py lookup 146.9135 -36.0804 [--db gis_layers.db]
+
+import argparse
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from json_codec import dumps_text, loads
+
+# Store settings
+GIS_LAYERS_DB = os.getenv("GIS_LAYERS_DB", "gis_layers.db")
+GIS_RELOAD_CHECK_SECONDS = float(os.getenv("GIS_RELOAD_CHECK_SECONDS", 30))
+
+# Layers that can be ingested, named after their *_URL key in js.conf
+LAYERS = ("zoning", "heritage", "bushfire", "fbl", "biodiversity")
+
+# Children per R-tree node
+NODE_CAPACITY = 16
+
+CREATE_FEATURES_SQL = """
+    CREATE TABLE IF NOT EXISTS gis_features (
+        layer TEXT NOT NULL,
+        feature_id INTEGER NOT NULL,
+        min_x REAL, min_y REAL, max_x REAL, max_y REAL,   -- bounding box
+        properties_json TEXT,                             -- GeoJSON properties (the layer attributes)
+        geometry_json TEXT,                               -- GeoJSON Polygon or MultiPolygon
+        PRIMARY KEY (layer, feature_id)
+    ) WITHOUT ROWID
+"""
+CREATE_LAYERS_SQL = """
+    CREATE TABLE IF NOT EXISTS gis_layers (
+        layer TEXT PRIMARY KEY,
+        source TEXT,                -- file the layer was ingested from
+        feature_count INTEGER,
+        ingested_at TEXT,
+        version REAL                -- changes on every ingest, so workers know to reload
+    )
+"""
+
+
+def connect(db_path=GIS_LAYERS_DB):
+    # Connection to the layer store, creating the tables if needed
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(CREATE_FEATURES_SQL)
+    conn.execute(CREATE_LAYERS_SQL)
+    return conn
+
+
+def _polygons(geometry):
+    # A GeoJSON Polygon or MultiPolygon as a list of polygons, each a list of rings of (x, y) tuples
+    if geometry is None:
+        return []
+    if geometry["type"] == "Polygon":
+        polygons = [geometry["coordinates"]]
+    elif geometry["type"] == "MultiPolygon":
+        polygons = geometry["coordinates"]
+    else:
+        raise ValueError(f"Unsupported geometry type {geometry['type']!r}; only Polygon and MultiPolygon are supported")
+    return [[[(float(point[0]), float(point[1])) for point in ring] for ring in polygon] for polygon in polygons]
+
+
+def _bounds(polygons):
+    # Bounding box (min_x, min_y, max_x, max_y) of the outer rings of a list of polygons
+    xs = [x for polygon in polygons for x, _ in polygon[0]]
+    ys = [y for polygon in polygons for _, y in polygon[0]]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def ingest(layer, geojson_path, db_path=GIS_LAYERS_DB):
+    # Replace a layer in the store with the polygon features of a GeoJSON FeatureCollection, returning the count
+    if layer not in LAYERS:
+        raise ValueError(f"Unknown layer {layer!r}, expected one of {', '.join(LAYERS)}")
+    with open(geojson_path, "r") as f:
+        collection = loads(f.read())
+    if collection.get("type") != "FeatureCollection":
+        raise ValueError("The GeoJSON file must contain a FeatureCollection")
+
+    rows = []
+    for feature_id, feature in enumerate(collection.get("features", [])):
+        polygons = _polygons(feature.get("geometry"))
+        if not polygons:
+            continue
+        min_x, min_y, max_x, max_y = _bounds(polygons)
+        if not (-180 <= min_x <= max_x <= 180 and -90 <= min_y <= max_y <= 90):
+            raise ValueError(f"Feature {feature_id} is not in longitude/latitude; export the layer with outSR=4326")
+        rows.append((layer, feature_id, min_x, min_y, max_x, max_y,
+                     dumps_text(feature.get("properties") or {}), dumps_text(feature["geometry"])))
+
+    conn = connect(db_path)
+    try:
+        with conn:
+            conn.execute("DELETE FROM gis_features WHERE layer = ?", (layer,))
+            conn.executemany("INSERT INTO gis_features VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.execute("INSERT OR REPLACE INTO gis_layers VALUES (?, ?, ?, datetime('now'), ?)",
+                         (layer, os.path.abspath(geojson_path), len(rows), time.time()))
+    finally:
+        conn.close()
+    return len(rows)
+
+
+def _ring_contains(ring, x, y):
+    # Ray casting test for a point in one ring
+    inside = False
+    x1, y1 = ring[-1]
+    for x2, y2 in ring:
+        if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+            inside = not inside
+        x1, y1 = x2, y2
+    return inside
+
+
+def polygons_contain(polygons, x, y):
+    # Exact point-in-polygon test: inside an outer ring and not inside any of its holes
+    for polygon in polygons:
+        if _ring_contains(polygon[0], x, y) and not any(_ring_contains(hole, x, y) for hole in polygon[1:]):
+            return True
+    return False
+
+
+def _pack(entries, capacity):
+    # One level of Sort-Tile-Recursive packing: group (min_x, min_y, max_x, max_y, item) entries into nodes
+    # of up to capacity entries that are close together, returning the parent entries
+    slices = max(1, math.ceil(math.sqrt(math.ceil(len(entries) / capacity))))
+    per_slice = slices * capacity
+    entries = sorted(entries, key=lambda entry: entry[0] + entry[2])
+    parents = []
+    for start in range(0, len(entries), per_slice):
+        column = sorted(entries[start:start + per_slice], key=lambda entry: entry[1] + entry[3])
+        for node_start in range(0, len(column), capacity):
+            children = column[node_start:node_start + capacity]
+            parents.append((min(child[0] for child in children), min(child[1] for child in children),
+                            max(child[2] for child in children), max(child[3] for child in children), children))
+    return parents
+
+
+class LayerIndex:
+    # STR-packed R-tree over the bounding boxes of one layer's features
+    def __init__(self, features, capacity=NODE_CAPACITY):
+        # features is a list of (min_x, min_y, max_x, max_y, (properties, polygons))
+        self.count = len(features)
+        level = [(min_x, min_y, max_x, max_y, payload) for min_x, min_y, max_x, max_y, payload in features]
+        self.leaf_count = len(level)
+        self.height = 0
+        while len(level) > 1:
+            level = _pack(level, capacity)
+            self.height += 1
+        self.root = level[0] if level else None
+
+    def bounds(self):
+        return self.root[:4] if self.root else None
+
+    def covers(self, x, y):
+        # Whether a point is inside the extent of the ingested features
+        return self.root is not None and self.root[0] <= x <= self.root[2] and self.root[1] <= y <= self.root[3]
+
+    def find(self, x, y):
+        # Properties of the first feature containing the point, or None
+        if self.root is None:
+            return None
+        stack = [(self.root, self.height)]
+        while stack:
+            (min_x, min_y, max_x, max_y, item), depth = stack.pop()
+            if not (min_x <= x <= max_x and min_y <= y <= max_y):
+                continue
+            if depth == 0:
+                properties, polygons = item
+                if polygons_contain(polygons, x, y):
+                    return properties
+            else:
+                stack.extend((child, depth - 1) for child in item)
+        return None
+
+
+class SpatialIndex:
+    def __init__(self, db_path=GIS_LAYERS_DB, check_seconds=GIS_RELOAD_CHECK_SECONDS):
+        self.db_path = db_path
+        self.check_seconds = check_seconds
+        self.layers = {}
+        self.versions = {}
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _store_versions(self):
+        # Version of each layer in the store (empty if the store has not been created)
+        if not os.path.exists(self.db_path):
+            return {}
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            return dict(conn.execute("SELECT layer, version FROM gis_layers").fetchall())
+        except sqlite3.OperationalError:
+            return {}
+        finally:
+            conn.close()
+
+    def reload(self):
+        # Build a new index from the store and swap it in (lookups in progress keep using the old one)
+        versions = self._store_versions()
+        layers = {}
+        if versions:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            try:
+                for layer in versions:
+                    rows = conn.execute("""
+                        SELECT min_x, min_y, max_x, max_y, properties_json, geometry_json
+                        FROM gis_features WHERE layer = ? ORDER BY feature_id
+                    """, (layer,))
+                    layers[layer] = LayerIndex([
+                        (min_x, min_y, max_x, max_y, (loads(properties), _polygons(loads(geometry))))
+                        for min_x, min_y, max_x, max_y, properties, geometry in rows
+                    ])
+            finally:
+                conn.close()
+        self.layers = layers
+        self.versions = versions
+        self._checked_at = time.monotonic()
+
+    def _refresh(self):
+        # Reload if another process has ingested a layer since the index was built (checked at most every
+        # check_seconds, so lookups do not touch the database)
+        if time.monotonic() - self._checked_at < self.check_seconds:
+            return
+        with self._lock:
+            if time.monotonic() - self._checked_at < self.check_seconds:
+                return
+            if self._store_versions() != self.versions:
+                self.reload()
+            self._checked_at = time.monotonic()
+
+    def covers(self, layer, x, y):
+        # Whether the layer has been ingested and the point is inside its extent
+        self._refresh()
+        index = self.layers.get(layer)
+        return index is not None and index.covers(x, y)
+
+    def find(self, layer, x, y):
+        # Properties of the layer's feature containing the point, or None (only meaningful when covers() is true)
+        index = self.layers.get(layer)
+        return index.find(x, y) if index is not None else None
+
+    def stats(self):
+        return {layer: {"features": index.count, "height": index.height, "bounds": index.bounds(),
+                        "version": self.versions.get(layer)}
+                for layer, index in self.layers.items()}
+
+
+# Shared index for the application, loaded on first use
+SPATIAL_INDEX = SpatialIndex()
+
+
+def main(argv=None):
+    # Command line entry point for ingesting and inspecting the offline GIS layers
+    parser = argparse.ArgumentParser(description="Load GIS layers into the local store and query them.")
+    parser.add_argument("--db", default=GIS_LAYERS_DB, help="path to the GIS layer store")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = commands.add_parser("ingest", help="load a layer from a GeoJSON file (replaces the layer)")
+    ingest_parser.add_argument("layer", choices=LAYERS)
+    ingest_parser.add_argument("geojson", help="GeoJSON FeatureCollection in longitude/latitude")
+    commands.add_parser("info", help="list the ingested layers")
+    lookup_parser = commands.add_parser("lookup", help="look up a point in every ingested layer")
+    lookup_parser.add_argument("x", type=float, help="longitude")
+    lookup_parser.add_argument("y", type=float, help="latitude")
+    args = parser.parse_args(argv)
+
+    if args.command == "ingest":
+        count = ingest(args.layer, args.geojson, args.db)
+        print(f"✅ Ingested {count} features into the {args.layer} layer of {args.db}")
+        return
+
+    index = SpatialIndex(args.db)
+    index.reload()
+    if args.command == "info":
+        for layer, info in index.stats().items():
+            print(f"{layer:<14}{info['features']:>8} features  bounds {info['bounds']}")
+        return
+    for layer in index.layers:
+        if index.covers(layer, args.x, args.y):
+            print(f"{layer:<14}{index.find(layer, args.x, args.y)}")
+        else:
+            print(f"{layer:<14}(outside the ingested extent)")
+
+
+if __name__ == "__main__":
+    main()
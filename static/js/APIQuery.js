@@ -1,8 +1,9 @@
 // ========================== Address and GIS API Utilities ==========================
 // This ES6 module provides reusable functions to work with NSW Planning APIs.
 // It includes:
-//   - Address autocomplete and filtering by postcode/suburb
+//   - Address autocomplete from the backend address index, or the NSW Planning API filtered by postcode/suburb
 //   - Geocoding addresses to coordinates
+//   - Property profile (geocode + all GIS layers) from the backend in one request
 //   - Generic GIS layer query function
 //   - Specific queries: zone code, heritage, bushfire, foreshore, biodiversity
 //   - Boundary query with geometry and lot size extraction
@@ -73,13 +74,48 @@ export async function validateAddressList(data) {
 }
 
 
+// Set to false when the backend has no address file, so later keystrokes go straight to the NSW Planning API
+let addressIndexAvailable = true;
+
+/**
+ * Fetches address suggestions from the backend address index (/address-suggest), which holds the in-area
+ * addresses already filtered by postcode/suburb. Falls back to the NSW Planning API when the backend
+ * has no address file loaded.
+ * @param {string} query - User input address string
+ * @returns {Array} Address suggestions ({ address })
+ */
+
+export async function fetchAndFilterAddresses(query) {
+  if (!query || query.length < 3) return [];
+  if (!addressIndexAvailable) return fetchAndFilterApiAddresses(query);
+
+  try {
+    const res = await fetch(`/address-suggest?q=${encodeURIComponent(query)}&limit=5`);
+    if (res.status === 503) {
+      console.warn("Address index unavailable; using the NSW Planning address API.");
+      addressIndexAvailable = false;
+      return fetchAndFilterApiAddresses(query);
+    }
+    if (!res.ok) {
+      console.warn(`Address suggest responded ${res.status}: ${res.statusText}`);
+      return [];
+    }
+    const data = await res.json();
+    return data.suggestions || [];
+  } catch (err) {
+    console.error("Address suggest failed:", err);
+    return [];
+  }
+}
+
+
 /**
  * Fetches address suggestions from NSW Planning API and applies postcode/suburb filtering.
  * @param {string} query - User input address string
  * @returns {Array} Filtered address suggestions
  */
 
-export async function fetchAndFilterAddresses(query) {
+export async function fetchAndFilterApiAddresses(query) {
   try {
     if (!window.CONFIG?.ADDRESS_API) {
       console.warn("CONFIG.ADDRESS_API missing; waiting for configuration...");
@@ -164,6 +200,49 @@ export async function geocodeAddress(address) {
   }
 }
 
+/**
+ * Fetches the property profile for an address from the backend in one request: the geocoded
+ * coordinates plus zoning, heritage, foreshore, bushfire, sensitive area and land size, which the
+ * backend queries from the GIS layers concurrently (replaces geocodeAddress + six layer queries).
+ * @param {string} address - Input address string
+ * @returns {Object|null} {address, score, x, y, zoning, heritage, foreshore, bushfire, sensitive_area, land_size} or null
+ */
+export async function fetchPropertyProfile(address) {
+  try {
+    if (!address || address.trim().length === 0) {
+      throw new Error("No address provided.");
+    }
+
+    const response = await fetch(`/property-profile?address=${encodeURIComponent(address)}`);
+    const data = await response.json();
+    if (!response.ok || !data || !data.x || !data.y) {
+      throw new Error(data?.error || `Backend property profile error: ${response.status}`);
+    }
+    if (data.errors?.length) {
+      console.warn("Some GIS layers could not be queried:", data.errors);
+      alert("Error: Failed to query GIS layer.");
+    }
+    return data;
+  } catch (err) {
+    console.error("Property profile via backend failed:", err);
+    alert("Error: Failed to convert address to coordinates.");
+    return null;
+  }
+}
+
+/**
+ * Fills in the form fields from a property profile.
+ * @param {Object} profile - Result of fetchPropertyProfile
+ */
+function applyPropertyProfile(profile) {
+  document.getElementById("zoning").value = profile.zoning || "";
+  document.getElementById("heritage").value = profile.heritage || "No";
+  document.getElementById("foreshore").value = profile.foreshore || "No";
+  document.getElementById("bushfire").value = profile.bushfire || "No";
+  document.getElementById("sensitive_area").value = profile.sensitive_area || "No";
+  document.getElementById("land_size").value = profile.land_size || "";
+}
+
 // =======================================================================
 // =============== Generic GIS Layer Query ===============================
 // =======================================================================
@@ -538,44 +617,23 @@ input.addEventListener("keydown", (e) => {
       refreshPermission = false;
 
       try {
-        const coords = await geocodeAddress(address);
-        if (!coords) {
+        // Geocode and all GIS queries in one backend request
+        const profile = await fetchPropertyProfile(address);
+        if (!profile) {
           alert("Geocoding failed. Please check the address.");
           return;
         }
 
-        const { x, y } = coords;
+        const { x, y } = profile;
         window.latestCoords = { x, y };
 
-        // all GIS queries in parallel
-        const [boundary, zone, heritage, foreshore, bushfireVal, esa] = await Promise.all([
-          queryBoundary(x, y),
-          queryZoneCode(x, y),
-          queryHeritage(x, y),
-          queryForeshore(x, y),
-          queryBushfire(x, y),
-          queryBiodiversity(x, y)
-        ]);
-
-        // Extract relevant values
-        const lotSize = boundary?.lotSize || "";
-        const heritageVal = heritage || "No";
-        const foreshoreVal = foreshore || "No";
-        const bushfireLower = bushfireVal || "No";
-        const esaVal = esa || "No";
-
         // 
         refreshPermission = true;
 
         // --- Populate fields ---
-        document.getElementById("zoning").value = zone || "";
-        document.getElementById("heritage").value = heritageVal;
-        document.getElementById("foreshore").value = foreshoreVal;
-        document.getElementById("bushfire").value = bushfireLower;
-        document.getElementById("sensitive_area").value = esaVal;
-        document.getElementById("land_size").value = lotSize;
-
-        console.log(" Confirm completed successfully:", { address, x, y, zone, heritageVal, foreshoreVal, bushfireLower, esaVal, lotSize });
+        applyPropertyProfile(profile);
+
+        console.log(" Confirm completed successfully:", { address, ...profile });
       } catch (err) {
         console.error("Confirm address failed:", err);
         alert("Error confirming address. See console for details.");
@@ -743,36 +801,16 @@ async function selectAddress(address) {
   try {
     input.value = address;
     resultsDiv.innerHTML = '';
-    const coords = await geocodeAddress(address);
-    if (!coords) return;
+    // Geocode and all GIS queries in one backend request
+    const profile = await fetchPropertyProfile(address);
+    if (!profile) return;
 
-    const { x, y } = coords;
+    const { x, y } = profile;
     window.latestCoords = { x, y };
 
-    // 
-    const [boundary, zone, heritage, foreshore, bushfireVal, esa] = await Promise.all([
-      queryBoundary(x, y),
-      queryZoneCode(x, y),
-      queryHeritage(x, y),
-      queryForeshore(x, y),
-      queryBushfire(x, y),
-      queryBiodiversity(x, y)
-    ]);
-
-    const lotSize = boundary?.lotSize || "";
-    const heritageVal = heritage || "No";
-    const foreshoreVal = foreshore || "No";
-    const bushfireLower = bushfireVal || "No";
-    const esaVal = esa || "No";
-
     refreshPermission = true; // 
 
-    document.getElementById("zoning").value = zone || "";
-    document.getElementById("heritage").value = heritageVal;
-    document.getElementById("foreshore").value = foreshoreVal;
-    document.getElementById("bushfire").value = bushfireLower;
-    document.getElementById("sensitive_area").value = esaVal;
-    document.getElementById("land_size").value = lotSize;
+    applyPropertyProfile(profile);
   } catch (err) {
     console.error("selectAddress failed:", err);
   } finally {
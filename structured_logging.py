@@ -0,0 +1,180 @@
+# Structured, non-blocking application logging
+#
+# Assess() used to print banners, the address and every result line to stdout on each request: synchronous
+# I/O on the request path (a slow journald pipe stalls the worker) that also put addresses in plain console
+# logs.  configure_logging() sends every logger through a logging.QueueHandler instead, so a log call only
+# checks its level, merges the message and enqueues the record.  A QueueListener thread writes each record
+# as one JSON line (or plain text) to stdout:
+#   LOG_LEVEL               level of the root logger (default INFO)
+#   LOG_LEVELS              per-module levels, e.g. "geocode_cache=DEBUG,property_profile=WARNING"
+#   LOG_SAMPLE_RATES        fraction of the INFO events with a given name that are kept, e.g. "assessment=0.1"
+#                           (kept records carry the rate, so counts can be scaled back up)
+#   LOG_FORMAT              "json" (default) or "text"
+#   CONSOLE_LOG_QUEUE_SIZE  records buffered for the writer thread (default 10000); when it is full, records
+#                           are dropped and counted rather than blocking the request
+#
+# Events are logged as logger.info("event_name", extra={...}); the extra fields become keys of the JSON line.
+
+import atexit
+import copy
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from json_codec import dumps_text
+
+# Logging settings
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+CONSOLE_LOG_QUEUE_SIZE = int(os.getenv("CONSOLE_LOG_QUEUE_SIZE", 10000))
+
+# Attributes every LogRecord has; any others were passed in extra and are written as fields
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+
+def parse_settings(text, convert):
+    # {"name": convert(value)} from "name=value,name=value"
+    settings = {}
+    for item in text.split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip():
+            settings[name.strip()] = convert(value.strip())
+    return settings
+
+
+class JsonFormatter(logging.Formatter):
+    # One JSON object per record: time, level, logger, event (the message) and the extra fields
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        entry.update((name, value) for name, value in vars(record).items() if name not in _RECORD_ATTRIBUTES)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return dumps_text(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    # Keeps the given fraction of INFO (and DEBUG) events by event name; other records all pass
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        rate = self.rates.get(record.msg) if record.levelno <= logging.INFO else None
+        if rate is None:
+            return True
+        if random.random() >= rate:
+            return False
+        record.sample_rate = rate
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    # QueueHandler that never waits: when queue_size records are waiting the record is dropped and counted.
+    # The queue is an unbounded SimpleQueue (no lock or condition variable on put), so the bound is checked here
+    def __init__(self, log_queue, queue_size):
+        super().__init__(log_queue)
+        self.queue_size = queue_size
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Merge the arguments into the message and render any traceback now, so the record no longer refers
+        # to objects the caller may change; the extra fields are kept for the formatter.  An event with neither
+        # (the usual case) is queued as it is
+        if not record.args and not record.exc_info and isinstance(record.msg, str):
+            return record
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self.queue.qsize() >= self.queue_size:
+            self.dropped += 1
+        else:
+            self.queue.put(record)
+
+
+class LogPipeline:
+    # The queue handler installed on the root logger and the listener thread writing its records
+    def __init__(self, stream=None, queue_size=CONSOLE_LOG_QUEUE_SIZE, log_format=LOG_FORMAT, sample_rates=None):
+        self.stream = stream
+        self.queue_size = queue_size
+        self.handler = NonBlockingQueueHandler(queue.SimpleQueue(), queue_size)
+        self.handler.addFilter(SamplingFilter(sample_rates or {}))
+        self.output = logging.StreamHandler(stream or sys.stdout)
+        self.output.setFormatter(JsonFormatter() if log_format == "json"
+                                 else logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+        self.listener = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self.listener is None:
+                self.listener = QueueListener(self.handler.queue, self.output, respect_handler_level=True)
+                self.listener.start()
+
+    def stop(self):
+        # Write the queued records and stop the listener thread
+        with self._lock:
+            if self.listener is not None:
+                self.listener.stop()
+                self.listener = None
+                self.output.flush()
+
+    def _after_fork(self):
+        # The listener thread does not survive a fork (e.g. gunicorn --preload): start a new one on a fresh queue
+        self.handler.queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self.listener = None
+        self.start()
+
+    def stats(self):
+        return {"queued": self.handler.queue.qsize(), "dropped": self.handler.dropped}
+
+
+_PIPELINE = None
+
+
+def configure_logging(stream=None, level=LOG_LEVEL, levels=LOG_LEVELS, sample_rates=LOG_SAMPLE_RATES,
+                      log_format=LOG_FORMAT):
+    # Route the root logger through the non-blocking pipeline (once per process) and apply the levels
+    global _PIPELINE
+    if _PIPELINE is not None:
+        return _PIPELINE
+    pipeline = LogPipeline(stream, log_format=log_format, sample_rates=parse_settings(sample_rates, float))
+    root = logging.getLogger()
+    root.addHandler(pipeline.handler)
+    root.setLevel(level)
+    for name, module_level in parse_settings(levels, str.upper).items():
+        logging.getLogger(name).setLevel(module_level)
+    pipeline.start()
+    atexit.register(pipeline.stop)
+    os.register_at_fork(after_in_child=pipeline._after_fork)
+    _PIPELINE = pipeline
+    return pipeline
+
+
+def flush_logging():
+    # Write any queued records (used when a worker exits)
+    if _PIPELINE is not None:
+        _PIPELINE.stop()
+
+
+def logging_stats():
+    # Queue depth and dropped records of the pipeline, or None if logging has not been configured
+    return _PIPELINE.stats() if _PIPELINE is not None else None
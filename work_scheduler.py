@@ -0,0 +1,262 @@
+# Bounded work scheduler with admission control and deadlines
+#
+# Assessments used to go to a ThreadPoolExecutor(max_workers=4) with an unbounded queue: when a request
+# timed out, fut.cancel() could not stop a task that was already running, so slow work piled up behind the
+# four threads while more requests queued behind it.  WorkScheduler runs work on SCHEDULER_WORKERS threads
+# from a queue of at most SCHEDULER_QUEUE_DEPTH jobs:
+#   - when the queue is full, submit() raises Overloaded straight away (the API answers 503 with Retry-After),
+#   - every job carries a Deadline; a job whose deadline passes while it is queued is never started, and a
+#     running job sees its deadline through current_deadline(), so GIS calls (http_transport caps its
+#     timeouts to the time left) and assessment logging stop cooperatively with DeadlineExceeded,
+#   - the time each job waited in the queue and spent running are recorded in histograms for monitoring.
+#
+# The deadline is held in a context variable, so it follows the work into asyncio tasks and, with
+# contextvars.copy_context(), into other executors (see property_profile.query_layers).
+
+import bisect
+import contextvars
+import math
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FuturesTimeout
+from contextlib import contextmanager
+
+# Scheduler settings
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", 4))
+SCHEDULER_QUEUE_DEPTH = int(os.getenv("SCHEDULER_QUEUE_DEPTH", 32))
+
+# Histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class DeadlineExceeded(FuturesTimeout):
+    # The work's deadline has passed (a TimeoutError, so existing timeout handlers catch it)
+    pass
+
+
+class Overloaded(Exception):
+    # The scheduler queue is full; retry_after is a suggested wait in whole seconds
+    def __init__(self, retry_after):
+        super().__init__(f"Work queue full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Deadline:
+    def __init__(self, seconds):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        # Seconds left (0 once expired)
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def check(self):
+        # Raise DeadlineExceeded if the deadline has passed
+        if self.expired():
+            raise DeadlineExceeded("Deadline exceeded")
+
+    def cap(self, timeout):
+        # A timeout (a number or a (connect, read) tuple) limited to the time left, raising if none is left
+        self.check()
+        left = self.remaining()
+        if isinstance(timeout, tuple):
+            return tuple(min(part, left) for part in timeout)
+        return min(timeout, left) if timeout is not None else left
+
+
+_CURRENT_DEADLINE = contextvars.ContextVar("deadline", default=None)
+
+
+def current_deadline():
+    # Deadline of the work running in this context, or None if it has none
+    return _CURRENT_DEADLINE.get()
+
+
+def check_deadline():
+    # Raise DeadlineExceeded if the current work's deadline has passed (a no-op outside scheduled work)
+    deadline = _CURRENT_DEADLINE.get()
+    if deadline is not None:
+        deadline.check()
+
+
+@contextmanager
+def deadline_scope(deadline):
+    # Make a Deadline the current deadline for the code in the with block
+    token = _CURRENT_DEADLINE.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _CURRENT_DEADLINE.reset(token)
+
+
+class Histogram:
+    # Cumulative bucket counts, count and sum of observed durations (the Prometheus histogram layout).  Each update
+    # is made under a lock: histograms are fed from the request threads, the scheduler workers and the database
+    # writer at once, and an unlocked increment can be lost to a thread switch
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        # Index of the first bucket whose upper bound is at least the value (len(bounds) for +Inf)
+        position = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[position] += 1
+            self.sum += value
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def mean(self):
+        count = self.count
+        return self.sum / count if count else None
+
+    def snapshot(self):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        cumulative, buckets = 0, {}
+        for bound, bucket_count in zip(self.bounds + ("+Inf",), counts):
+            cumulative += bucket_count
+            buckets[str(bound)] = cumulative
+        return {"buckets": buckets, "count": cumulative, "sum": round(total, 6)}
+
+
+class _Job:
+    __slots__ = ("fn", "args", "deadline", "context", "future", "queued_at")
+
+    def __init__(self, fn, args, deadline, context):
+        self.fn = fn
+        self.args = args
+        self.deadline = deadline
+        self.context = context
+        self.future = Future()
+        self.queued_at = time.monotonic()
+
+
+class WorkScheduler:
+    def __init__(self, workers=SCHEDULER_WORKERS, queue_depth=SCHEDULER_QUEUE_DEPTH, name="work"):
+        self.workers = workers
+        self.name = name
+        self.queue = queue.Queue(maxsize=queue_depth)
+        self.queue_wait = Histogram()
+        self.execution = Histogram()
+        # Counters reported by stats(), updated under _counter_lock by the workers and the submitting threads
+        self._counter_lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.expired_in_queue = 0
+        self.timed_out = 0
+        self.running = 0
+        # Worker threads are started on first use, so they are created in each gunicorn worker after fork
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        # Start the worker threads if they are not running in this process
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._threads = [threading.Thread(target=self._run, name=f"{self.name}-{number}", daemon=True)
+                                 for number in range(self.workers)]
+                for thread in self._threads:
+                    thread.start()
+                self._pid = os.getpid()
+
+    def retry_after(self):
+        # Seconds until the queue should have room: the queued jobs at the mean execution time per worker
+        mean = self.execution.mean() or 1.0
+        return max(1, math.ceil(self.queue.qsize() * mean / self.workers))
+
+    def submit(self, fn, *args, timeout):
+        # Queue fn(*args) with a deadline timeout seconds from now, returning its Future; raises Overloaded
+        # if the queue is full
+        self._ensure_started()
+        deadline = Deadline(timeout)
+        job = _Job(fn, args, deadline, contextvars.copy_context())
+        try:
+            self.queue.put_nowait(job)
+        except queue.Full:
+            with self._counter_lock:
+                self.rejected += 1
+            raise Overloaded(self.retry_after())
+        return job.future, deadline
+
+    def run(self, fn, *args, timeout):
+        # Run fn(*args) on a worker and wait for its result; raises Overloaded if the queue is full and
+        # DeadlineExceeded if the result is not ready within timeout seconds
+        future, deadline = self.submit(fn, *args, timeout=timeout)
+        try:
+            return future.result(timeout=deadline.remaining())
+        except FuturesTimeout:
+            if future.done():
+                # The work itself stopped at a deadline check (or raised a timeout of its own)
+                raise
+            # Not started yet: it is never run.  Running: it stops at its next deadline check
+            future.cancel()
+            with self._counter_lock:
+                self.timed_out += 1
+            raise DeadlineExceeded(f"Work did not finish within {timeout}s")
+
+    def _run(self):
+        # Worker thread: run queued jobs that are still wanted, each with its deadline as the current deadline
+        while True:
+            job = self.queue.get()
+            started = time.monotonic()
+            self.queue_wait.observe(started - job.queued_at)
+            if job.deadline.expired():
+                # The caller has given up: skip the work
+                with self._counter_lock:
+                    self.expired_in_queue += 1
+                if job.future.set_running_or_notify_cancel():
+                    job.future.set_exception(DeadlineExceeded("Deadline passed while queued"))
+                continue
+            if not job.future.set_running_or_notify_cancel():
+                with self._counter_lock:
+                    self.expired_in_queue += 1
+                continue
+            with self._counter_lock:
+                self.running += 1
+            try:
+                result = job.context.run(self._call, job)
+            except BaseException as error:
+                with self._counter_lock:
+                    self.running -= 1
+                    self.failed += 1
+                job.future.set_exception(error)
+            else:
+                with self._counter_lock:
+                    self.running -= 1
+                    self.completed += 1
+                job.future.set_result(result)
+            finally:
+                self.execution.observe(time.monotonic() - started)
+
+    @staticmethod
+    def _call(job):
+        _CURRENT_DEADLINE.set(job.deadline)
+        return job.fn(*job.args)
+
+    def stats(self):
+        # Queue depth, counters and latency histograms for monitoring
+        with self._counter_lock:
+            counters = {"running": self.running, "completed": self.completed, "failed": self.failed,
+                        "rejected": self.rejected, "expired_in_queue": self.expired_in_queue,
+                        "timed_out": self.timed_out}
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            **counters,
+            "queue_wait_seconds": self.queue_wait.snapshot(),
+            "execution_seconds": self.execution.snapshot(),
+        }